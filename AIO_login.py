@@ -1,24 +1,37 @@
-import argparse
-import calendar
+import sys
+
+if __name__ == "__main__":
+    # 守护进程在运行时只转发命令，不必导入 requests 或初始化日志
+    import daemon
+    daemon.forward_cli(sys.argv[1:])
+
+import codecs
 import hmac
 import json
-import math
 import os
 import re
-import sys
+import socket
+import struct
+import threading
+import time
 from base64 import b64encode
 from datetime import datetime
 from enum import Enum
-from getpass import getpass
 from hashlib import sha1
-from html.parser import HTMLParser
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional
 from urllib.parse import parse_qs, urlparse
 
-import requests
-from requests import Session
-
+import breaker
+import config
 import log
+import metrics
+import singleflight
+
+if TYPE_CHECKING:
+    from requests import Response
+
+# requests、asyncio、HTMLParser 等较重的模块只在用到的代码路径中导入，
+# 使 -a clear/chkjson 以及守护进程转发等路径不必为它们付出启动时间
 
 logger = log.setup_logger()
 
@@ -53,6 +66,12 @@ class WrongUserInfo(Exception):
     pass
 
 
+class PortalTimeout(TimeoutError):
+    """门户请求超时或登录总时限用尽
+    """
+    pass
+
+
 class UnreachableError(SyntaxError):
     """Branch that should not be reached
     """
@@ -69,9 +88,6 @@ def report_time() -> str:
     return datetime.now().strftime(TLF)
 
 
-CONFIG_PATH = "./BITer.json"
-
-
 def read_config() -> tuple[str, str]:
     """从脚本所在文件夹读取用户信息
 
@@ -79,39 +95,40 @@ def read_config() -> tuple[str, str]:
         - tuple[str, str]: (username, password)
     """
     try:
-        with open(CONFIG_PATH, "r", encoding="utf8") as config_file:
-            config = json.load(config_file)
-            return config["username"], config["password"]
+        settings = config.load()
+        return settings.username, settings.password
 
     except FileNotFoundError:
         logger.warning("未找到配置文件，正在创建...")
         return write_config()
 
-    except json.decoder.JSONDecodeError:
-        logger.warning("文件错误，正在重写...")
-        return write_config()
+    except config.ConfigError as e:
+        try:
+            credentials = config.read_credentials()
+        except config.ConfigError:
+            logger.warning(f"文件错误({e})，正在重写...")
+            return write_config()
+        logger.warning(f"其他设置无效({e})，账号密码照常使用")
+        return credentials
 
 
 def write_config() -> tuple[str, str]:
-    """写入登录配置文件
+    """写入登录配置文件，其余设置保持不变
 
     Return:
         - tuple[str, str]: (username, password)
     """
-    with open(CONFIG_PATH, "w", encoding="utf8") as config_file:
-        username = input(f" - 请输入账号:")
-        password = getpass(f" - 请输入密码(你不会看到输入的内容):",)
-        config_file.write(
-            f"{{\"username\":\"{username}\",\"password\":\"{password}\"}}"
-        )
+    from getpass import getpass
+
+    username = input(f" - 请输入账号:")
+    password = getpass(f" - 请输入密码(你不会看到输入的内容):",)
+    if config.save_credentials(username, password) is None:
+        logger.warning("其他设置无效，已保存账号密码，其余设置保持原样")
     return username, password
 
 
 def clear_config() -> None:
-    with open(CONFIG_PATH, "w", encoding="utf8") as config_file:
-        config_file.write(
-            f"{{\"username\":\"\",\"password\":\"\"}}"
-        )
+    config.save_credentials("", "")
     return
 
 
@@ -119,20 +136,253 @@ API_BASE = "http://10.0.0.55"
 TYPE_CONST = 1
 N_CONST = 200
 TLF = "%H:%M:%S"
+DEFAULT_TIMEOUT = 5.0
+POOL_SIZE = 4
+IDENTITY_TTL = 600.0
+LOGIN_BUDGET = 10.0
+PREARM_TTL = 45.0  # 预备参数的使用期限(秒)，应短于门户 challenge 的有效期
+PREARM_REFRESH = 30.0  # 预备参数准备多久后重新准备(秒)
+PREARM_TIMEOUT = 1.0  # 在线时准备参数的总时限(秒)
+
+# 每一步请求的超时上限占登录总时限的比例，实际超时不超过剩余时间
+STEP_SHARES: dict[str, float] = {
+    "homepage": 0.4,
+    "rad_user_info": 0.3,
+    "get_challenge": 0.3,
+    "srun_portal": 0.4,
+}
+
+
+class Deadline:
+    """整个登录流程共用的时间预算
+
+    各步骤按 STEP_SHARES 分得超时上限，且不会超过剩余时间，
+    预算用尽后任何请求都会立即抛出 PortalTimeout。
+    """
+
+    def __init__(self, budget: float = LOGIN_BUDGET) -> None:
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def timeout(self, step: str) -> float:
+        """获取某一步可用的超时
+
+        Args:
+            step: 步骤名，见 STEP_SHARES
+
+        Raises:
+            PortalTimeout: 预算已用尽
+
+        Returns:
+            float: 超时(秒)
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise PortalTimeout(
+                f"[WARN][{report_time()}] 登录总时限{self.budget:g}s已用尽({step})")
+        return min(remaining, self.budget * STEP_SHARES.get(step, 1.0))
+
+
+def local_address(base: str = API_BASE) -> Optional[str]:
+    """获取通往门户的本机接口地址
+
+    通过未连接的UDP套接字让系统选路，不会真正发包。
+
+    Returns:
+        Optional[str]: 本机地址，无路由时为None
+    """
+    host = urlparse(base).hostname or ""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect((host, 80))
+            return str(sock.getsockname()[0])
+    except OSError:
+        return None
+
+
+class IdentityCache:
+    """门户身份(ip, ac_id)缓存
+
+    以下情况会重新解析首页：
+        - 超过 ttl 秒
+        - 本机接口地址发生变化
+        - 调用 invalidate()（例如门户拒绝了该ip）
+        - get(refresh=True) 强制刷新
+    """
+
+    def __init__(self, ttl: float = IDENTITY_TTL) -> None:
+        self.ttl = ttl
+        self._identity: Optional[tuple[str, str]] = None
+        self._local_ip: Optional[str] = None
+        self._fetched_at = 0.0
+
+    def get(self, client: "PortalClient", refresh: bool = False,
+            deadline: Optional[Deadline] = None) -> tuple[str, str]:
+        """获取(ip, ac_id)，必要时重新解析首页
+
+        Args:
+            client: 用于解析首页的门户客户端
+            refresh: 是否忽略缓存强制刷新
+            deadline: 登录总时限
+
+        Returns:
+            tuple[str, str]: (ip, ac_id)
+        """
+        local_ip = local_address(client.base)
+        if (
+            refresh
+            or self._identity is None
+            or local_ip != self._local_ip
+            or time.monotonic() - self._fetched_at > self.ttl
+        ):
+            self._identity = parse_homepage(client, deadline)
+            self._local_ip = local_ip
+            self._fetched_at = time.monotonic()
+            logger.debug(f"门户身份已刷新: {self._identity}")
+        return self._identity
+
+    def invalidate(self) -> None:
+        self._identity = None
+
+
+class PortalClient:
+    """常驻的门户HTTP客户端
+
+    所有对门户的请求共用同一个 Session，借助连接池与 keep-alive
+    复用到 10.0.0.55 的TCP连接，避免每次登录/登出重新握手。
+    """
+
+    def __init__(self, base: str = API_BASE, timeout: float = DEFAULT_TIMEOUT,
+                 pool_size: int = POOL_SIZE) -> None:
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+
+        self.base = base
+        self.timeout = timeout
+        self.session = Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Connection"] = "keep-alive"
+        self.identity = IdentityCache()
+        self.breaker = breaker.CircuitBreaker()
+        self.breaker.on_change = _report_breaker
+        self.limiter: Optional[Callable[[], object]] = None  # 每个请求前调用，用于限速
+
+    def get(self, path: str, timeout: Optional[float] = None,
+            deadline: Optional[Deadline] = None, **kwargs: Any) -> "Response":
+        """向门户发送GET请求
+
+        Args:
+            path: 以"/"开头的路径，空字符串表示首页
+            timeout: 本次请求的超时(秒)，缺省使用客户端默认值
+            deadline: 登录总时限，给出时超时取其分配给该步骤的份额
+
+        Raises:
+            PortalTimeout: 请求超时或总时限用尽
+            breaker.PortalUnavailable: 门户连续失败，熔断器打开期间不发送请求
+
+        Returns:
+            Response: 响应对象
+        """
+        from requests.exceptions import RequestException, Timeout
+
+        step = path.rsplit("/", 1)[-1] or "homepage"
+        if self.limiter is not None:
+            self.limiter()
+        if deadline is not None:
+            timeout = deadline.timeout(step)
+        self.breaker.before_request()
+        start = time.monotonic()
+        try:
+            response = self.session.get(
+                self.base + path,
+                timeout=self.timeout if timeout is None else timeout,
+                **kwargs
+            )
+        except Timeout as e:
+            self.breaker.record_failure()
+            raise PortalTimeout(f"[WARN][{report_time()}] 门户请求超时({step})") from e
+        except RequestException:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        finally:
+            metrics.observe("bit_portal_request_seconds", time.monotonic() - start, step=step)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_BREAKER_GAUGE = {breaker.BreakerState.CLOSED: 0, breaker.BreakerState.HALF_OPEN: 1,
+                  breaker.BreakerState.OPEN: 2}
+
+
+def _report_breaker(state: breaker.BreakerState) -> None:
+    metrics.gauge("bit_portal_breaker_state", _BREAKER_GAUGE[state])
+    metrics.inc("bit_portal_breaker_transitions_total", state=state.value)
+    if state is breaker.BreakerState.OPEN:
+        logger.warning("门户请求连续失败，暂停访问门户")
+    elif state is breaker.BreakerState.CLOSED:
+        logger.info("门户已恢复响应")
+
+
+_client: Optional[PortalClient] = None
+
+
+def get_client() -> PortalClient:
+    """获取进程内共享的门户客户端，首次调用时创建
+
+    Returns:
+        PortalClient: 共享客户端
+    """
+    global _client
+    if _client is None:
+        _client = PortalClient()
+    return _client
 
 
 class User:
-    def __init__(self, username: str, password: str) -> None:
+    def __init__(self, username: str, password: str,
+                 client: Optional[PortalClient] = None,
+                 refresh_identity: bool = False,
+                 deadline: Optional[Deadline] = None,
+                 identity: Optional[tuple[str, str]] = None) -> None:
         """初始化变量
+
+        Args:
+            refresh_identity: 是否忽略缓存重新解析首页获取ip与acid
+            deadline: 本次操作所有请求共用的总时限
+            identity: 显式给出的(ip, ac_id)，用于替其他主机操作；
+                给出时不解析首页，状态查询也针对该ip
         """
         self.username = username
         self.password = password
+        self.client = client or get_client()
+        self.deadline = deadline
 
-        self.ip, self.acid = parse_homepage()
-        self.session = Session()
+        if identity is not None:
+            self.ip, self.acid = identity
+            self.target_ip: Optional[str] = self.ip
+        else:
+            self.ip, self.acid = self.client.identity.get(
+                self.client, refresh=refresh_identity, deadline=deadline)
+            self.target_ip = None  # 本机
 
     def operation(self, action: Action) -> dict[str, str]:
-        """检查当前登录情况
+        """检查当前登录情况并执行操作
 
         Raises:
             - AlreadyOnlineException: 重复登录
@@ -142,8 +392,26 @@ class User:
         Returns:
             - json: response
         """
-        is_logged_in, username = get_user_info()
+        is_logged_in, username = get_user_info(
+            self.client, deadline=self.deadline, ip=self.target_ip)
+
+        if (res := self._check_state(action, is_logged_in, username)) is not None:
+            return res
+
+        return self._submit(self._make_params(action))
 
+    def _check_state(self, action: Action, is_logged_in: bool,
+                     username: Optional[str]) -> Optional[dict[str, str]]:
+        """根据当前在线状态判断操作能否继续
+
+        Raises:
+            - AlreadyOnlineException: 重复登录
+            - AlreadyLoggedOutException: 重复登出
+            - UsernameUnmatchedException: 登出用户名错误
+
+        Returns:
+            - Optional[dict]: 查询类操作的结果，需要继续请求门户时为None
+        """
         if username and username != self.username:
             raise UsernameUnmatchedException(
                 f"[WARN][{report_time()}] 当前在线用户:{username:1s}与尝试操作用户{self.username:1s}账号不同，使用-a mkjson参数重新填写"
@@ -159,9 +427,9 @@ class User:
                     raise AlreadyOnlineException(
                         f"[WARN][{report_time()}] 重复登录")
             elif action is Action.VERIFY:
-                return traffic_query()
+                return traffic_query(self.client, self.deadline)
             elif action is Action.QUERY:
-                return traffic_query()
+                return traffic_query(self.client, self.deadline)
 
         elif not is_logged_in:
             if action is Action.LOGOUT:
@@ -175,14 +443,30 @@ class User:
             raise UnreachableError(
                 f"[WARN][{report_time()}] {action} is not supported.")
 
-        if params := self._make_params(action):
+        return None
 
-            response = self.session.get(
-                API_BASE + "/cgi-bin/srun_portal",
-                params=params
+    def _submit(self, params: dict[str, Any]) -> dict[str, str]:
+        """发送 srun_portal 请求
+
+        Raises:
+            - WrongUserInfo: 参数为空
+
+        Returns:
+            - json: response
+        """
+        if params:
+
+            response = self.client.get(
+                "/cgi-bin/srun_portal",
+                params=params,
+                deadline=self.deadline
             )
             res = dict(json.loads(
                 response.text[6:-1])) if response.text.startswith("jsonp") else {}
+            if self.target_ip is None and (
+                    res.get("error", "ok") != "ok" or res.get("online_ip", self.ip) != self.ip):
+                # 门户拒绝或返回了不同的ip，下次重新解析首页
+                self.client.identity.invalidate()
             res["username"] = self.username
             return res
         else:
@@ -202,8 +486,8 @@ class User:
             "ip": self.ip
         }
 
-        response = self.session.get(
-            API_BASE + "/cgi-bin/get_challenge", params=params
+        response = self.client.get(
+            "/cgi-bin/get_challenge", params=params, deadline=self.deadline
         )
         result = dict(json.loads(response.text[6:-1]))
 
@@ -212,16 +496,18 @@ class User:
         else:
             return ""
 
-    def _make_params(self, action: Action) -> dict[str, Any]:
+    def _make_params(self, action: Action, token: Optional[str] = None) -> dict[str, Any]:
         """制作请求参数
 
         Args:
             action: Action enum specifying operation type
+            token: 已获取的challenge，缺省时现场获取
 
         Returns:
             dict[str, str]: Request parameters
         """
-        token = self._get_token()
+        if token is None:
+            token = self._get_token()
 
         params = {
             "callback": "jsonp",
@@ -261,9 +547,147 @@ class User:
         return params
 
 
-def parse_homepage() -> tuple[str, str]:
+class AsyncUser(User):
+    """User 的异步版本，重叠互不依赖的门户请求
+
+    阻塞的门户请求放在线程中执行，共用同一个连接池：
+    登录/登出时状态查询(rad_user_info)与challenge获取同时进行。
+    熔断器未关闭时半开状态只放行一个试探请求，两者改为依次发送，
+    challenge 在 _make_params 中获取。
+    """
+
+    async def operation_async(self, action: Action) -> dict[str, str]:
+        """异步检查当前登录情况并执行操作
+
+        Raises:
+            - AlreadyOnlineException: 重复登录
+            - AlreadyLoggedOutException: 重复登出
+            - UsernameUnmatchedException: 登出用户名错误
+
+        Returns:
+            - json: response
+        """
+        import asyncio
+
+        token: Optional[str] = None
+        if action in (Action.LOGIN, Action.LOGOUT) and self.client.breaker.state is breaker.BreakerState.CLOSED:
+            (is_logged_in, username), token = await asyncio.gather(
+                asyncio.to_thread(get_user_info, self.client, None, self.deadline, self.target_ip),
+                asyncio.to_thread(self._get_token),
+            )
+        else:
+            is_logged_in, username = await asyncio.to_thread(
+                get_user_info, self.client, None, self.deadline, self.target_ip)
+
+        res = await asyncio.to_thread(self._check_state, action, is_logged_in, username)
+        if res is not None:
+            return res
+
+        params = await asyncio.to_thread(self._make_params, action, token)
+        return await asyncio.to_thread(self._submit, params)
+
+
+class PreArmedLogin:
+    """在线时预先获取的 challenge 与据此算好的登录参数
+
+    掉线后登录只需发送一次 srun_portal，省去 get_challenge 往返与
+    xencode/HMAC/SHA1 计算。challenge 只能使用一次且会过期，
+    因此参数取出即作废，准备超过 ttl 秒或门户身份(ip)变化后不再使用。
+    """
+
+    def __init__(self, ttl: float = PREARM_TTL, refresh: float = PREARM_REFRESH) -> None:
+        self.ttl = ttl
+        self.refresh = refresh
+        self._params: Optional[dict[str, Any]] = None
+        self._ip: Optional[str] = None
+        self._armed_at = 0.0
+        self._lock = threading.Lock()
+
+    def due(self) -> bool:
+        """是否需要(重新)准备"""
+        with self._lock:
+            return self._params is None or time.monotonic() - self._armed_at > self.refresh
+
+    def arm(self, user: User) -> bool:
+        """获取 challenge 并生成登录参数
+
+        Raises:
+            PortalTimeout: 超出 user 的总时限
+
+        Returns:
+            bool: 是否准备成功
+        """
+        token = user._get_token()
+        if not token:
+            self.clear()
+            return False
+        params = user._make_params(Action.LOGIN, token)
+        with self._lock:
+            self._params, self._ip, self._armed_at = params, user.ip, time.monotonic()
+        return True
+
+    def take(self, ip: str) -> Optional[dict[str, Any]]:
+        """取出仍可使用的参数，取出后即作废
+
+        Args:
+            ip: 当前的门户身份ip
+
+        Returns:
+            Optional[dict[str, Any]]: 没有可用参数时为None
+        """
+        with self._lock:
+            params, self._params = self._params, None
+            if params is None or self._ip != ip or time.monotonic() - self._armed_at > self.ttl:
+                return None
+            return params
+
+    def clear(self) -> None:
+        with self._lock:
+            self._params = None
+
+
+HOMEPAGE_CHUNK = 2048
+_INPUT_TAG = re.compile(r"<input\b[^>]*>", re.IGNORECASE)
+_TAG_ATTR = re.compile(r"""([\w-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+
+
+def scan_user_ip(chunks: Iterable[str]) -> tuple[Optional[str], str]:
+    """逐块扫描首页，找到 user_ip 输入框后立即停止
+
+    Args:
+        chunks: 逐块到达的页面文本
+
+    Returns:
+        tuple[Optional[str], str]: (ip, 已读取的文本)，未找到时ip为None
+    """
+    buffer = ""
+    pos = 0
+    for chunk in chunks:
+        buffer += chunk
+        for match in _INPUT_TAG.finditer(buffer, pos):
+            pos = match.end()
+            attrs = {
+                key.lower(): dq or sq or bare
+                for key, dq, sq, bare in _TAG_ATTR.findall(match.group())
+            }
+            if attrs.get("name") == "user_ip":
+                return attrs.get("value") or None, buffer
+        # 跳过已扫描部分，仅保留可能被截断的最后一个标签
+        pos = max(pos, buffer.rfind("<", pos))
+    return None, buffer
+
+
+def parse_homepage(client: Optional[PortalClient] = None,
+                   deadline: Optional[Deadline] = None) -> tuple[str, str]:
     """解析并获取ip与acid
 
+    首页以流的形式读取，找到 user_ip 后立即断开；
+    快速扫描失败时才对完整页面使用 HTMLParser。
+
+    Args:
+        client: 门户客户端，缺省使用共享客户端
+        deadline: 登录总时限，读取每个分块前检查
+
     Raises:
         Exception: If acid not in redirected URL or IP not in response
 
@@ -271,33 +695,47 @@ def parse_homepage() -> tuple[str, str]:
         tuple[str, str]: (ip, ac_id)
     """
 
-    res = requests.get(API_BASE)
+    with (client or get_client()).get("", deadline=deadline, stream=True) as res:
 
-    # ac_id appears in the url query parameter of the redirected URL
-    query = parse_qs(urlparse(res.url).query)
-    ac_id = query.get("ac_id")
+        # ac_id appears in the url query parameter of the redirected URL
+        query = parse_qs(urlparse(res.url).query)
+        ac_id = query.get("ac_id")
 
-    if not ac_id:
-        raise Exception("failed to get acid")
+        if not ac_id:
+            raise Exception("failed to get acid")
 
-    # ip appears in the response HTML
-    class IPParser(HTMLParser):
-        def __init__(self, *args:str, **kwargs:dict[str, list[str]]):
-            super().__init__(*args, **kwargs)
-            self.ip = None
+        # ip appears in the response HTML
+        decoder = codecs.getincrementaldecoder(res.encoding or "utf-8")("replace")
 
-        def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
-                if tag == "input":
-                    attr_dict: dict[str, Optional[str]] = dict(attrs)
-                    if attr_dict.get("name") == "user_ip":
-                        self.ip = attr_dict.get("value")
+        def chunks() -> Iterator[str]:
+            for chunk in res.iter_content(chunk_size=HOMEPAGE_CHUNK):
+                if deadline is not None:
+                    deadline.timeout("homepage")
+                yield decoder.decode(chunk)
 
-        def get_ip(self, *args:str, **kwargs:dict[str, list[str]])->Optional[str]:
-            super().feed(*args, **kwargs)
-            return self.ip or None
+        ip, page = scan_user_ip(chunks())
 
-    parser = IPParser()
-    ip = parser.get_ip(res.text)
+    if not ip:
+        logger.debug("首页快速扫描未找到ip，使用完整解析")
+        from html.parser import HTMLParser
+
+        class IPParser(HTMLParser):
+            def __init__(self, *args:str, **kwargs:dict[str, list[str]]):
+                super().__init__(*args, **kwargs)
+                self.ip = None
+
+            def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]) -> None:
+                    if tag == "input":
+                        attr_dict: dict[str, Optional[str]] = dict(attrs)
+                        if attr_dict.get("name") == "user_ip":
+                            self.ip = attr_dict.get("value")
+
+            def get_ip(self, *args:str, **kwargs:dict[str, list[str]])->Optional[str]:
+                super().feed(*args, **kwargs)
+                return self.ip or None
+
+        parser = IPParser()
+        ip = parser.get_ip(page)
 
     if not ip:
         raise Exception("failed to get ip")
@@ -305,9 +743,18 @@ def parse_homepage() -> tuple[str, str]:
     return ip, ac_id[0]
 
 
-def get_user_info() -> tuple[bool, str | None]:
+def get_user_info(client: Optional[PortalClient] = None,
+                  timeout: Optional[float] = None,
+                  deadline: Optional[Deadline] = None,
+                  ip: Optional[str] = None) -> tuple[bool, str | None]:
     """获取当前登录用户信息
 
+    Args:
+        client: 门户客户端，缺省使用共享客户端
+        timeout: 本次请求的超时(秒)，缺省使用客户端默认值
+        deadline: 登录总时限
+        ip: 查询指定ip的在线状态，缺省为本机
+
     Returns:
         tuple[bool, str | None]: (is_logged_in, username)
     """
@@ -315,7 +762,9 @@ def get_user_info() -> tuple[bool, str | None]:
     is_logged_in = True
     username = None
 
-    resp = requests.get(API_BASE + "/cgi-bin/rad_user_info")
+    resp = (client or get_client()).get(
+        "/cgi-bin/rad_user_info", timeout=timeout, deadline=deadline,
+        params={"ip": ip} if ip else None)
     data = resp.text
 
     if data == "not_online_error":
@@ -326,26 +775,55 @@ def get_user_info() -> tuple[bool, str | None]:
     return is_logged_in, username
 
 
+FKBASE64_ALPHABET = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/",
+    b"LVoJPiCN2R8G90yg+hmFHuacZ1OWMnrsSTXkYpUq/3dlbfKwv6xztjI7DeBE45QA",
+)
+XXTEA_DELTA = 0x9E3779B9
+MASK32 = 0xFFFFFFFF
+
+
+def _latin1(raw_s: str) -> bytes:
+    """把每个字符截断为低8位后转为bytes"""
+    try:
+        return raw_s.encode("latin-1")
+    except UnicodeEncodeError:
+        return bytes(ord(i) & 0xFF for i in raw_s)
+
+
 def fkbase64(raw_s: str) -> str:
     """base64掩码加密
 
     Returns:
         - str: encoded string
     """
-    trans = str.maketrans(
-        "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/",
-        "LVoJPiCN2R8G90yg+hmFHuacZ1OWMnrsSTXkYpUq/3dlbfKwv6xztjI7DeBE45QA",
-    )
-    ret = b64encode(bytes(ord(i) & 0xFF for i in raw_s))
-    return ret.decode().translate(trans)
+    return b64encode(_latin1(raw_s)).translate(FKBASE64_ALPHABET).decode()
+
+
+def _pack_words(msg: str) -> list[int]:
+    """按小端序把字符串每4个字符打包成一个32位整数
+
+    Returns:
+        list[int]: 整数数组
+    """
+    try:
+        raw = msg.encode("latin-1")
+    except UnicodeEncodeError:
+        # 超出单字节的字符按原算法逐字符移位合并
+        codes = [ord(i) for i in msg] + [0, 0, 0]
+        return [
+            codes[i] | codes[i + 1] << 8 | codes[i + 2] << 16 | codes[i + 3] << 24
+            for i in range(0, len(msg), 4)
+        ]
+    raw += b"\0" * (-len(raw) % 4)
+    return list(struct.unpack(f"<{len(raw) >> 2}I", raw))
 
 
 def xencode(msg:str, key:str):
     """加密算法，用于网络认证过程中的数据加密
 
-    该函数包含两个内部函数：
-    - sencode: 将消息和密钥转换为32位整数数组
-    - lencode: 将加密后的整数数组转换回字符串
+    消息与密钥按小端序批量打包为32位整数数组，
+    加密后再整体打包回字符串(每个字符对应一个字节)。
 
     Args:
         msg (str): 需要加密的消息
@@ -354,87 +832,47 @@ def xencode(msg:str, key:str):
     Returns:
         str: 加密后的字符串
     """
-    def sencode(msg:str, key:bool):
-        def ordat(msg:str, idx:int):
-            if len(msg) > idx:
-                return ord(msg[idx])
-            return 0
-
-        msg_len = len(msg)
-        pwd:list[int] = []
-        for i in range(0, msg_len, 4):
-            pwd.append(ordat(msg, i) | ordat(msg, i + 1) << 8 |
-                       ordat(msg, i + 2) << 16 | ordat(msg, i + 3) << 24)
-        if key:
-            pwd.append(msg_len)
-        return pwd
-
-    def lencode(msg: list[int], key: bool) -> str:
-        msg_len: int = len(msg)
-        ll: int = (msg_len - 1) << 2
-        if key:
-            m: int = msg[msg_len - 1]
-            if m < ll - 3 or m > ll:
-                return ""
-            ll = m
-        str_parts: list[str] = []
-        for num in msg:
-            byte0: str = chr(num & 0xFF)
-            byte1: str = chr((num >> 8) & 0xFF)
-            byte2: str = chr((num >> 16) & 0xFF)
-            byte3: str = chr((num >> 24) & 0xFF)
-            str_parts.append(byte0 + byte1 + byte2 + byte3)
-        full_str: str = "".join(str_parts)
-        if key:
-            return full_str[0:ll]
-        return full_str
-
     if msg == "":
         return ""
-    pwd = sencode(msg, True)
-    pwdk = sencode(key, False)
+    pwd = _pack_words(msg)
+    pwd.append(len(msg))
+    pwdk = _pack_words(key)
     if len(pwdk) < 4:
         pwdk = pwdk + [0] * (4 - len(pwdk))
     n = len(pwd) - 1
     z = pwd[n]
-    y = pwd[0]
-    c = 0x86014019 | 0x183639A0
-    m = 0
-    e = 0
     d = 0
-    p = 0
-    q = math.floor(6 + 52 / (n + 1))
-    while 0 < q:
-        d = d + c & (0x8CE0D9BF | 0x731F2640)
+    q = 6 + 52 // (n + 1)
+    while q > 0:
+        d = (d + XXTEA_DELTA) & MASK32
         e = d >> 2 & 3
-        p = 0
-        while p < n:
-            y = pwd[p + 1]
-            m = z >> 5 ^ y << 2
-            m = m + ((y >> 3 ^ z << 4) ^ (d ^ y))
-            m = m + (pwdk[(p & 3) ^ e] ^ z)
-            pwd[p] = pwd[p] + m & (0xEFB8D130 | 0x10472ECF)
-            z = pwd[p]
-            p = p + 1
-        y = pwd[0]
-        m = z >> 5 ^ y << 2
-        m = m + ((y >> 3 ^ z << 4) ^ (d ^ y))
-        m = m + (pwdk[(p & 3) ^ e] ^ z)
-        pwd[n] = pwd[n] + m & (0xBB390742 | 0x44C6F8BD)
-        z = pwd[n]
-        q = q - 1
-    return lencode(pwd, False)
-
-
-def traffic_query() -> dict[str, str]:
+        for p in range(n + 1):
+            y = pwd[p + 1] if p < n else pwd[0]
+            m = (z >> 5 ^ y << 2) + ((y >> 3 ^ z << 4) ^ (d ^ y)) + (pwdk[(p & 3) ^ e] ^ z)
+            z = pwd[p] = (pwd[p] + m) & MASK32
+        q -= 1
+    return struct.pack(f"<{len(pwd)}I", *pwd).decode("latin-1")
+
+
+def traffic_query(client: Optional[PortalClient] = None,
+                  deadline: Optional[Deadline] = None) -> dict[str, str]:
     """当且仅当登陆成功后请求此jQuery来获取详细信息
 
+    Args:
+        client: 门户客户端，缺省使用共享客户端
+        deadline: 登录总时限
+
     Returns:
         dict[str, str]: Query result with traffic and balance details
     """
-    query_url = f"{API_BASE}/cgi-bin/rad_user_info?callback=1677774013868"
+    import calendar
+
+    response = (client or get_client()).get(
+        "/cgi-bin/rad_user_info", params={"callback": "1677774013868"},
+        deadline=deadline
+    )
     user_detail: dict[str, str] = dict(json.loads(re.findall(
-        r"\{[\s\S]*\}", requests.get(url=query_url).text)[0]))
+        r"\{[\s\S]*\}", response.text)[0]))
 
     query_result: dict[str, str] = {}
     query_result['time_online'] = user_detail.get('sum_seconds', "")
@@ -447,7 +885,9 @@ def traffic_query() -> dict[str, str]:
     month_days = calendar.monthrange(today.year, today.month)[1]
     passed_days = today.day - 1
 
-    balance = 200*1024*1024*1024*passed_days / \
+    from traffic import MONTHLY_QUOTA
+
+    balance = MONTHLY_QUOTA*passed_days / \
         month_days-int(query_result['traffic_used'])
 
     query_result['traffic_balance'] = str(balance == abs(balance))
@@ -460,32 +900,165 @@ def traffic_query() -> dict[str, str]:
 
 
 class Operation:
-    def __init__(self):
-        self.username, self.password = read_config()
+    def __init__(self, client: Optional[PortalClient] = None,
+                 budget: float = LOGIN_BUDGET,
+                 credentials: Optional[tuple[str, str]] = None,
+                 interactive: bool = True):
+        """
+        Args:
+            client: 门户客户端，缺省使用共享客户端
+            budget: 每次登录/登出的总时限(秒)
+            credentials: (username, password)，缺省从配置文件读取
+            interactive: 密码错误时是否提示重新输入，为 False 时抛出 WrongUserInfo
+        """
+        self.username, self.password = credentials or read_config()
+        self.client = client or get_client()
+        self.budget = budget
+        self.interactive = interactive
+        self.armed = PreArmedLogin()
 
-    def login(self) -> None:
-        while True:
-            user = User(self.username, self.password)
-            res = user.operation(Action.LOGIN)
-            if res.get('error_msg') == "Password is error.":
-                logger.warning("密码错误，请重新输入账号密码")
-                write_config()
-                self.username, self.password = read_config()
-            else:
-                break
+    def prearm(self, timeout: float = PREARM_TIMEOUT) -> bool:
+        """在线时调用，预备参数将要过期时重新准备
+
+        失败不影响之后的登录，掉线时照常走完整流程。
+
+        Args:
+            timeout: 本次准备的总时限(秒)
+
+        Returns:
+            bool: 本次是否重新准备了参数
+        """
+        if not self.armed.due():
+            return False
+        try:
+            user = User(self.username, self.password, self.client, False, Deadline(timeout))
+            return self.armed.arm(user)
+        except Exception as e:
+            logger.debug(f"预备登录参数失败: {type(e).__name__}: {e}")
+            return False
+
+    def login(self, budget: Optional[float] = None) -> dict[str, str]:
+        """登录
+
+        同一进程内并发的登录共享一次执行；已持有跨进程登录锁的线程
+        (如恢复状态机)直接执行，避免等待自己。
+        """
+        lock = singleflight.shared_lock()
+        if lock is not None and lock.owned():
+            return self._exclusive(Action.LOGIN, budget, lock)
+        return _login_flight.do(self.username, lambda: self._exclusive(Action.LOGIN, budget, lock))
+
+    def logout(self, budget: Optional[float] = None) -> dict[str, str]:
+        return self._exclusive(Action.LOGOUT, budget, singleflight.shared_lock())
+
+    def _exclusive(self, action: Action, budget: Optional[float],
+                   lock: Optional[singleflight.ProcessLock]) -> dict[str, str]:
+        """持有跨进程登录锁执行登录/登出并记录结果
+
+        等锁期间其他进程成功完成的登录直接复用；等锁的时间计入总时限。
+
+        Raises:
+            PortalTimeout: 等待其他进程超出总时限，或操作本身超时
+
+        Returns:
+            dict[str, str]: 门户响应
+        """
+        import asyncio
+
+        perform = self.login_async if action is Action.LOGIN else self.logout_async
+        if lock is None:
+            return asyncio.run(perform(budget))
+        budget = self.budget if budget is None else budget
+        requested_at = time.time()
+        start = time.monotonic()
+        if not lock.acquire(budget):
+            raise PortalTimeout(
+                f"[WARN][{report_time()}] 等待其他进程的{action.value}超过{budget:g}s")
+        try:
+            if action is Action.LOGIN and (last := lock.reusable_login(self.username, requested_at)):
+                logger.info(f"复用进程{last.pid}刚完成的登录")
+                return dict(last.response)
+            try:
+                res = asyncio.run(perform(budget - (time.monotonic() - start)))
+            except BaseException:
+                lock.record(action.value, self.username, False)
+                raise
+            lock.record(action.value, self.username, res.get("error") == "ok", res)
+            return res
+        finally:
+            lock.release()
+
+    async def login_async(self, budget: Optional[float] = None) -> dict[str, str]:
+        res = await self._perform(Action.LOGIN, budget)
         logger.info(f"用户{res.get('username')} IP({res.get('online_ip')}) 登录成功")
+        return res
+
+    async def logout_async(self, budget: Optional[float] = None) -> dict[str, str]:
+        res = await self._perform(Action.LOGOUT, budget)
+        logger.info(f"用户{res.get('username')} IP({res.get('online_ip')}) 现已登出")
+        return res
+
+    async def _perform(self, action: Action, budget: Optional[float] = None) -> dict[str, str]:
+        """执行登录/登出，密码错误时重新填写后重试
+
+        Args:
+            action: 登录或登出
+            budget: 本次操作的总时限(秒)，缺省使用 self.budget
+
+        Raises:
+            PortalTimeout: 超出总时限
+            WrongUserInfo: 密码错误且不可交互
+
+        Returns:
+            dict[str, str]: 门户响应
+        """
+        import asyncio
 
-    def logout(self) -> None:
         while True:
-            user = User(self.username, self.password)
-            res = user.operation(Action.LOGOUT)
+            deadline = Deadline(self.budget if budget is None else budget)
+            if action is Action.LOGIN:
+                res = await asyncio.to_thread(self._login_armed, deadline)
+                if res is not None:
+                    return res
+            # 完整流程会获取新的 challenge，预备的参数随之失效
+            self.armed.clear()
+            user = await asyncio.to_thread(
+                AsyncUser, self.username, self.password, self.client, False, deadline)
+            res = await user.operation_async(action)
             if res.get('error_msg') == "Password is error.":
+                if not self.interactive:
+                    raise WrongUserInfo(
+                        f"[WARN][{report_time()}] 密码错误，使用-a mkjson参数重新填写")
                 logger.warning("密码错误，请重新输入账号密码")
                 write_config()
                 self.username, self.password = read_config()
             else:
-                break
-        logger.info(f"用户{res.get('username')} IP({res.get('online_ip')}) 现已登出")
+                return res
+
+    def _login_armed(self, deadline: Deadline) -> Optional[dict[str, str]]:
+        """用预备的参数直接发送 srun_portal
+
+        Raises:
+            PortalTimeout: 超出总时限
+
+        Returns:
+            Optional[dict[str, str]]: 登录成功时为门户响应；没有可用参数或门户拒绝时为None，
+                由调用方改走完整流程
+        """
+        ip, _ = self.client.identity.get(self.client, deadline=deadline)
+        params = self.armed.take(ip)
+        if params is None:
+            return None
+        response = self.client.get("/cgi-bin/srun_portal", params=params, deadline=deadline)
+        res = dict(json.loads(response.text[6:-1])) if response.text.startswith("jsonp") else {}
+        if res.get("error") != "ok":
+            # 多为 challenge 过期或已被其他请求替换，不代表身份或密码有误
+            logger.debug(f"预备登录被拒绝({res.get('error')}: {res.get('error_msg')})，改用完整流程")
+            metrics.inc("bit_prearmed_login_total", result="rejected")
+            return None
+        metrics.inc("bit_prearmed_login_total", result="used")
+        res["username"] = self.username
+        return res
 
     # def verify(self) -> bool:
     #     user = User(self.username, self.password)
@@ -498,7 +1071,8 @@ class Operation:
     #         logger.warning("信息错误，使用-a mkjson参数重新填写")
     #         return False
 
-    def config(self, action: str) -> None:
+    @staticmethod
+    def config(action: str) -> None:
         """Manage configuration file operations.
         
         Args:
@@ -515,15 +1089,49 @@ class Operation:
             clear_config()
 
 
+_login_flight: "singleflight.SingleFlight[dict[str, str]]" = singleflight.SingleFlight()
+
+QUERY_STALE_AFTER = 3600.0
+
+
+def query_usage() -> int:
+    """从流量记录输出用量、速率与月底预测
+
+    没有记录或最新记录超过 QUERY_STALE_AFTER 秒时先向门户采样一次。
+
+    Returns:
+        int: 退出码
+    """
+    import traffic
+
+    store = traffic.TrafficStore()
+    tracker = traffic.UsageTracker.from_store(store)
+    if tracker.last is None or time.time() - tracker.last.time > QUERY_STALE_AFTER:
+        sample = traffic.fetch_sample(get_client())
+        if sample is not None:
+            store.append(sample)
+            tracker.update(sample)
+    projection = tracker.projection()
+    if projection is None:
+        logger.warning("当前未登录，且没有流量记录")
+        return 11
+    for line in traffic.describe(projection):
+        logger.info(line)
+    return 0
+
+
 def main() -> None:
     """读取命令，分析参数，回报执行状态
 
     Returns:
         - None
     """
+    import argparse
+
     arg_choices = [
         "login", "登录", "登陆", "上线",
         "logout",  "登出", "下线", "退出",
+        "status", "query", "relogin", "daemon",
         "chkjson", "mkjson", "clear",
         # "verify"
     ]
@@ -534,29 +1142,58 @@ def main() -> None:
         choices=arg_choices,
         help="login or logout"
     )
+    parser.add_argument(
+        "--monitor",
+        action="store_true",
+        help="daemon模式下同时运行自动重连监控"
+    )
+    parser.add_argument(
+        "--standalone",
+        action="store_true",
+        help="不连接守护进程，直接执行"
+    )
 
     for arg in sys.argv:
         sys.argv[sys.argv.index(arg)] = arg.lower()
     args = parser.parse_args()
 
     try:
-        handler = Operation()
         action = str(args.action)
+        if action == "daemon":
+            import daemon
+            daemon.Daemon(monitor=args.monitor).serve_forever()
+        if action in ["chkjson", "mkjson", "clear"]:
+            Operation.config(action)
+            exit(0)
+        if action == "query":
+            exit(query_usage())
+
+        handler = Operation()
 
         if action in ["login", "登录", "登陆", "上线"]:
             handler.login()
         elif action in ["logout", "登出", "下线", "退出"]:
             handler.logout()
+        elif action == "status":
+            is_logged_in, username = get_user_info(handler.client)
+            logger.info(f"在线: {username}" if is_logged_in else "当前未登录")
+        elif action == "relogin":
+            import recovery
+            state = recovery.RecoveryMachine(handler).run(force_logout=True)
+            logger.info(f"恢复结果: {state.value}")
+            if state is not recovery.State.ONLINE:
+                exit(14 if state is recovery.State.TIMEOUT else 11)
         # elif action == "verify":
         #     handler.verify()
-        elif action in ["chkjson", "mkjson", "clear"]:
-            handler.config(action)
         else:
             exit(13)
 
     except UnreachableError as e:
         logger.error(str(e))
         exit(10)
+    except PortalTimeout as e:
+        logger.error(str(e))
+        exit(14)
     except Exception as e:
         logger.error(str(e))
         exit(11)
@@ -568,6 +1205,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    os.system("chcp 65001>nul")
+    if sys.platform == "win32":
+        os.system("chcp 65001>nul")
     os.chdir(sys.path[0])
     main()
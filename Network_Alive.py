@@ -2,27 +2,28 @@
 # encoding = utf-8
 # Network_Alive
 
-# import logger
-import json
-import msvcrt
+"""控制台前端：监控核心见 monitor.py
+
+本文件只负责终端交互：Ctrl+C 强制重登或打断退避、定期清屏打印概况、
+缺少配置或登录脚本时提示输入。无界面运行请使用 python monitor.py。
+"""
 import os
-import subprocess
 import sys
 import time
 from datetime import datetime
-from typing import Literal
+from typing import Optional
 
 import AIO_login
+import config
 import log
+import monitor
 
 logger = log.setup_logger()
 
 
-# Configuration constants (can be overridden in BITer.json)
-DEFAULT_PING_TARGET: str = 'bilibili.com'
-DEFAULT_PING_INTERVAL: int = 1  # seconds
-ping_target: str = DEFAULT_PING_TARGET
-ping_interval: int = DEFAULT_PING_INTERVAL
+# 当前生效的配置(BITer.json)，运行中的修改由 monitor.Monitor 重新加载
+settings: config.Config = config.Config()
+CTRL_C_SLICE: float = 0.5
 
 
 class UnreachableError(SyntaxError):
@@ -67,7 +68,15 @@ def wait_for_keypress(msg: str) -> None:
         None
     """
     logger.info(msg)
-    msvcrt.getch()
+    if sys.platform == "win32":
+        import msvcrt
+        msvcrt.getch()
+    else:
+        input()
+
+
+def clear_screen() -> None:
+    os.system("cls" if sys.platform == "win32" else "clear")
 
 
 def time_convert() -> str:
@@ -84,89 +93,33 @@ def time_convert() -> str:
 
 
 # 创建全局Operation实例
-aio_handler = None
-
+aio_handler: Optional[AIO_login.Operation] = None
 
-def operation(operation: Literal[0, 1]) -> int:
-    """执行AIO脚本的各种操作。
 
-    Args:
-        operation: 操作类型
-            0: 登出操作
-            1: 登录操作
+def get_handler() -> AIO_login.Operation:
+    """获取全局Operation实例，首次调用时创建。
 
     Returns:
-        int: 操作的返回码
-            0: 成功
-            -1: 失败
+        AIO_login.Operation: 复用共享门户客户端的实例
     """
     global aio_handler
-    try:
-        if aio_handler is None:
-            aio_handler = AIO_login.Operation()
-
-        match operation:
-            case 0:
-                aio_handler.logout()
-                return 0
-            case 1:
-                aio_handler.login()
-                return 0
-            # case 2:
-            #     aio_handler.verify()
-                # return 0
-
-            case _:
-                return -1
-    except AIO_login.AlreadyLoggedOutException as e:
-        logger.info(f"登出状态: {e}")
-        return 0
-    except Exception as e:
-        logger.exception(f"操作执行失败: {e}")
-        return -1
-
-
-def relogin(interval: int = 2) -> None:
-    """执行重新登录操作，包含登出和登录两个步骤。
-
-    Args:
-        interval: 操作之间的等待时间(秒)。默认为2秒。
-
-    Returns:
-        None
-    """
-    try:
-        operation(0)
-    except KeyboardInterrupt:
-        logger.info("登出期间用户中断，继续执行")
-
-    try:
-        time.sleep(interval)
-    except KeyboardInterrupt:
-        logger.info("等待期间用户中断，继续执行")
+    if aio_handler is None:
+        aio_handler = AIO_login.Operation(AIO_login.get_client())
+    return aio_handler
 
-    try:
-        operation(1)
-    except KeyboardInterrupt:
-        logger.info("登入期间用户中断，继续执行")
 
-    try:
-        time.sleep(interval)
-    except KeyboardInterrupt:
-        logger.info("等待期间用户中断，继续执行")
-
-
-def summary(statistic: dict[str, int], fail_log: list[tuple[int, str]]) -> None:
-    """显示程序运行的统计信息和失败日志。
+def summary(mon: monitor.Monitor) -> None:
+    """显示程序运行的统计信息和今日离线记录。
 
     Args:
-        statistic: 包含各类操作计数的字典
-        fail_log: 失败记录列表，每个元素为(日期, 时间)的元组
+        mon: 监控核心，提供统计、离线历史与门户客户端
 
     Returns:
         None
     """
-    os.system("cls")
+    statistic = mon.statistic
+    log.flush()  # 先写出排队中的日志，避免清屏后才出现
+    clear_screen()
     rpd = date_log()
 
     print(45*'-')
@@ -177,13 +130,11 @@ def summary(statistic: dict[str, int], fail_log: list[tuple[int, str]]) -> None:
     print(45*'-')
     print(f"今日({rpd:02d}日)自动重登记录：")
     chk = 0
-    for log in fail_log:
-        if log[0] == rpd:
-            chk = 1
-            print(f"  - {log[1]}")
-        else:
-            fail_log.remove(log)
+    for record in mon.outages.today():
+        chk = 1
+        print(f"  - {record}")
     print("  - （无记录）") if not chk else 1
+    print(f"门户熔断器: {mon.handler.client.breaker!r}")
     print(45*'-')
     return
 
@@ -197,7 +148,7 @@ def entrance_protect() -> bool:
     logger.info("正在检查依赖脚本")
     while not check_component():
         continue
-    os.system("cls")
+    clear_screen()
     print(welcome_msg)
     main_loop()
     return True
@@ -211,25 +162,19 @@ def check_component() -> bool:
             True: 所有组件可用
             False: 存在不可用组件
     """
-    global aio_path, ping_target, ping_interval
+    global aio_path, settings
 
     if os.access(f"{aio_path}/AIO_login.py", os.R_OK):
-        # Load ping configuration from BITer.json if available
-        config_path = os.path.join(aio_path, "BITer.json")
         try:
-            with open(config_path, "r", encoding="utf8") as f:
-                config: dict[str, str] = json.load(f)
-                ping_target = config.get("ping_target", DEFAULT_PING_TARGET)
-                ping_interval = int(config.get("ping_interval", DEFAULT_PING_INTERVAL))
-                logger.debug(f"Loaded config: ping_target={ping_target}, ping_interval={ping_interval}")
+            settings = config.load()
+            logger.debug(f"Loaded config: {settings._replace(password='***')}")
         except FileNotFoundError:
-            logger.info(f"Config file not found at {config_path}. Creating new config.")
-            AIO_login.write_config()
-        except (json.JSONDecodeError, IOError) as e:
+            logger.info(f"Config file not found at {config.CONFIG_PATH}. Creating new config.")
             AIO_login.write_config()
-            logger.warning(f"Failed to load ping config: {e}, using defaults")
-            ping_target = DEFAULT_PING_TARGET
-            ping_interval = DEFAULT_PING_INTERVAL
+            return False
+        except config.ConfigError as e:
+            logger.warning(f"Failed to load config: {e}, using defaults")
+            settings = config.Config()
 
         return True
     else:
@@ -250,87 +195,61 @@ def check_component() -> bool:
             raise UnreachableError("无法理解的路径")
         logger.info(aio_path)
         return False
-    # if not operation(2):
-        # input("check_component:operation 2 check pass")
-        # return True
-    # else:
-        # input("check_component:operation 2 check fail")
-        # return False
 
 
 def main_loop() -> None:
     """程序主循环函数。
 
-    执行以下操作：
-    1. 定期ping目标地址检测网络连接状态
-    2. 在检测到断网时自动重新登录
-    3. 统计各类操作的次数
-    4. 记录失败日志
-    5. 响应用户的Ctrl+C操作
+    每一轮由 monitor.Monitor.step() 完成探测、诊断与恢复，本函数负责：
+    1. 按返回的时间休眠，网络变化时提前进入下一轮
+    2. 响应用户的Ctrl+C操作：探测或在线休眠期间强制重登，退避期间打断退避
+    3. 每5次检测清屏输出统计信息
     """
-    statistic = {'失败': 0, '成功': 0, '强制': 0, '跳过': 0}
-    fail_log: list[tuple[int, str]] = []  # 失败日志列表
-    t1, t2 = 0.0, 0.0  # 用于记录ping操作的开始时间和结束时间
-    command = ["ping", ping_target, "-n", "2"]  # ping命令的参数列表
+    mon = monitor.Monitor(get_handler(), settings)
+    mon.on_summary = summary
+    mon.start()
     while True:
         try:
-            logger.info(f"正在ping {ping_target}, [Ctrl+C] 强制重登")
             try:
-                t1 = time.time()
-                subprocess.run(command, stdout=subprocess.DEVNULL, check=True, timeout=5)
-                t2 = time.time()
-
+                pause = mon.step()
             except KeyboardInterrupt:
-                logger.info("[USER] [Ctrl+C] 强制重登")
-                statistic['强制'] += 1
-                time.sleep(0.2)
-                sys.stdout.write('\r\033[K')
-                relogin()
+                force_relogin(mon)
                 continue
 
-            except subprocess.TimeoutExpired:
-                logger.info("ping 超时：判定离线")
-                t2 = t1 + 5
-                pass
-
-            except subprocess.CalledProcessError:
-                logger.info(f"Expected Error: return_not_zero")
-                t2 = t1 + 5
-                pass
-
-            if t2 - t1 > 4.5:  # 如果ping操作超过4.5秒，判定为失败
-                statistic['失败'] += 1
-                fail_log.append((date_log(), report_time()))
-                logger.warning("ping 判定：离线")
-                relogin()
-
-                if (statistic["失败"] + statistic["成功"] + statistic["强制"]) % 5 == 0:
-                    summary(statistic, fail_log)  # 每5次检测，输出统计信息
-
-            else:  # 如果ping操作未超过4.5秒，判定为成功
-                statistic['成功'] += 1
-                logger.info("ping 判定：在线")
-
-                if (statistic["失败"] + statistic["成功"] + statistic["强制"]) % 5 == 0:
-                    summary(statistic, fail_log)
-                logger.info(f"休眠{ping_interval}秒， [Ctrl+C] 强制重登")
-
-                try:
-                    time.sleep(ping_interval)
-                except KeyboardInterrupt:
-                    logger.info("[USER] [Ctrl+C] 强制重登")
-                    statistic['强制'] += 1
-                    time.sleep(0.2)
-                    sys.stdout.write('\r\033[K')
-                    relogin()
-                    continue
+            try:
+                sleep(mon, pause.seconds)
+            except KeyboardInterrupt:
+                if pause.reason == "backoff":
+                    logger.info("[USER] [Ctrl+C] 打断退避")
+                else:
+                    force_relogin(mon)
         except Exception as e:
             logger.exception(f"An exception occurred: {e}")
             print()
             raise e
 
 
-ping_target: str = DEFAULT_PING_TARGET
+def sleep(mon: monitor.Monitor, seconds: float) -> None:
+    """等待下一轮，网络变化时提前返回
+
+    Windows 上阻塞在 Event 中时收不到 Ctrl+C，按 CTRL_C_SLICE 分段等待。
+    """
+    if sys.platform != "win32":
+        mon.sleep(seconds)
+        return
+    end = time.monotonic() + seconds
+    while (remaining := end - time.monotonic()) > 0:
+        if mon.sleep(min(remaining, CTRL_C_SLICE)):
+            return
+
+
+def force_relogin(mon: monitor.Monitor) -> None:
+    logger.info("[USER] [Ctrl+C] 强制重登")
+    time.sleep(0.2)
+    sys.stdout.write('\r\033[K')
+    mon.force_relogin()
+
+
 VERSION = 'v1.3.1'
 aio_path = sys.path[0]
 START_TIME = datetime.now()
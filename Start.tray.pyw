@@ -9,18 +9,14 @@ import sys
 import threading
 import time
 from subprocess import Popen
-from typing import Any
-
-import win32con
-import win32gui
-import win32process
-from PIL import Image
-from PIL.ImageFile import ImageFile
-from pystray import Menu, MenuItem
-from pystray._win32 import Icon
+from typing import TYPE_CHECKING, Any
 
 from log import setup_logger
 
+if TYPE_CHECKING:
+    from pystray._win32 import Icon
+
+# win32/PIL/pystray 在启动 Network_Alive 之后才导入，不拖慢上线
 logger = setup_logger()
 
 
@@ -33,6 +29,9 @@ def toggle_window_visibility(process: Popen[bytes]) -> None:
     Returns:
         None
     """
+    import win32con
+    import win32gui
+
     handle = get_window_by_pid(process)
     if win32gui.IsWindowVisible(handle):
         # Window is visible, hide it
@@ -53,6 +52,9 @@ def get_window_by_pid(process: Popen[bytes]) -> int:
     Returns:
         int: Window handle or 0 if not found
     """
+    import win32gui
+    import win32process
+
     windows: list[int] = []
 
     def enum_windows_callback(hWnd: int, lParam: int) -> None:
@@ -81,34 +83,45 @@ def on_tray_click(process: Popen[bytes]) -> None:
     toggle_window_visibility(process)
 
 
-class BitConnectIcon(Icon):
-    """Custom tray icon with double-click support.
+def icon_class() -> "type[Icon]":
+    """Build the tray icon class once pystray is imported.
 
-    Attributes:
-        WM_LBUTTONDBLCLK: Windows message code for left button double-click
-        process: Reference to subprocess handle
+    Returns:
+        type[Icon]: Custom tray icon with double-click support
     """
-    WM_LBUTTONDBLCLK = 0x0203
+    from PIL.ImageFile import ImageFile
+    from pystray._win32 import Icon
 
-    def __init__(self,  *args: ImageFile|str, **kwargs: Popen[bytes]|str) -> None:
-        process:Any = kwargs.pop('process', None)
-        if process and isinstance(process,Popen):
-            self.process: Popen[bytes] = process
-        super().__init__(*args, **kwargs)
+    class BitConnectIcon(Icon):
+        """Custom tray icon with double-click support.
 
-    def _on_notify(self, wparam: int, lparam: int) -> None:
-        """Handle tray icon notification events.
+        Attributes:
+            WM_LBUTTONDBLCLK: Windows message code for left button double-click
+            process: Reference to subprocess handle
+        """
+        WM_LBUTTONDBLCLK = 0x0203
 
-        Args:
-            wparam: Window message parameter
-            lparam: Additional message data
+        def __init__(self,  *args: ImageFile|str, **kwargs: Popen[bytes]|str) -> None:
+            process:Any = kwargs.pop('process', None)
+            if process and isinstance(process,Popen):
+                self.process: Popen[bytes] = process
+            super().__init__(*args, **kwargs)
 
-        Returns:
-            None
-        """
-        super()._on_notify(wparam, lparam)
-        if lparam == self.WM_LBUTTONDBLCLK and self.process:
-            toggle_window_visibility(self.process)
+        def _on_notify(self, wparam: int, lparam: int) -> None:
+            """Handle tray icon notification events.
+
+            Args:
+                wparam: Window message parameter
+                lparam: Additional message data
+
+            Returns:
+                None
+            """
+            super()._on_notify(wparam, lparam)
+            if lparam == self.WM_LBUTTONDBLCLK and self.process:
+                toggle_window_visibility(self.process)
+
+    return BitConnectIcon
 
 
 def create_tray_icon(process: Popen[bytes]) -> None:
@@ -120,8 +133,11 @@ def create_tray_icon(process: Popen[bytes]) -> None:
     Returns:
         None
     """
+    from PIL import Image
+    from pystray import Menu, MenuItem
+
     icon_image = Image.open("./Network_Alive.ico")
-    tray_instance = BitConnectIcon(
+    tray_instance = icon_class()(
         '双击显示/隐藏窗口',
         icon_image,
         title="BitNet Manager",
@@ -151,7 +167,7 @@ def create_tray_icon(process: Popen[bytes]) -> None:
     tray_instance.run()
 
 
-def terminate_program(process: Popen[bytes], tray_instance: BitConnectIcon) -> None:
+def terminate_program(process: Popen[bytes], tray_instance: "Icon") -> None:
     """Gracefully terminate the subprocess and tray icon.
 
     Args:
@@ -0,0 +1,59 @@
+# encoding = utf-8
+"""对比顺序登录与异步重叠登录的耗时
+
+门户使用 mock_portal，每个请求带固定延迟。
+
+用法：python benchmarks/bench_async_login.py --latency 0.05 --rounds 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AIO_login  # noqa: E402
+import mock_portal  # noqa: E402
+
+
+def run(rounds: int, latency: float) -> None:
+    server = mock_portal.serve(state=mock_portal.PortalState(latency=latency, seed=55))
+    client = AIO_login.PortalClient(base=f"http://127.0.0.1:{server.server_address[1]}")
+    # 预热连接池与身份缓存
+    client.identity.get(client)
+
+    sync_times: list[float] = []
+    async_times: list[float] = []
+    for _ in range(rounds):
+        user = AIO_login.User("bench", "bench", client)
+        t0 = time.perf_counter()
+        res = user.operation(AIO_login.Action.LOGIN)
+        sync_times.append(time.perf_counter() - t0)
+        user.operation(AIO_login.Action.LOGOUT)
+
+        user = AIO_login.AsyncUser("bench", "bench", client)
+        t0 = time.perf_counter()
+        async_res = asyncio.run(user.operation_async(AIO_login.Action.LOGIN))
+        async_times.append(time.perf_counter() - t0)
+        if res.get("error") != "ok" or async_res.get("error") != "ok":
+            raise RuntimeError(f"模拟门户拒绝了登录: {res} / {async_res}")
+        user.operation(AIO_login.Action.LOGOUT)
+
+    client.close()
+    server.shutdown()
+    server.server_close()
+    sync_mean = statistics.mean(sync_times) * 1000
+    async_mean = statistics.mean(async_times) * 1000
+    print(f"portal latency {latency * 1000:.0f} ms, {rounds} rounds")
+    print(f"  sequential login: {sync_mean:8.1f} ms")
+    print(f"  async login:      {async_mean:8.1f} ms  ({sync_mean / async_mean:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    run(args.rounds, args.latency)
@@ -0,0 +1,145 @@
+# encoding = utf-8
+"""稳定在线时监控进程的 CPU 时间与唤醒次数及预算
+
+在子进程中以无界面方式运行 monitor.Monitor.run()：探测目标是本地的 TCP 端口(始终在线)，
+门户是父进程中的模拟门户(其开销不计入)。预热一轮后统计 --seconds 秒内子进程的
+CPU 时间(用户+系统)与自愿上下文切换次数(线程阻塞后再被唤醒的次数，getrusage 覆盖所有线程)，
+折算为每小时的数值与预算比较，超出预算时以非零状态退出，可直接放进 CI。
+
+唤醒次数依赖 resource 模块，Windows 上只检查 CPU 时间。
+
+用法：
+    python benchmarks/bench_idle.py [--seconds 60] [--interval 1] [--net-events auto] [--scale 1.0]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, ROOT)
+
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+# 每小时预算，对应默认配置：1 秒探测间隔，监听网络变化时在线间隔放宽到 10 秒
+# (--net-events off 时固定 1 秒间隔，实测约 4s CPU、31000 次唤醒)
+CPU_BUDGET: float = 4.0  # CPU 秒，实测约 0.7s
+WAKEUP_BUDGET: int = 10000  # 自愿上下文切换次数，实测约 9 次/轮、4400 次
+
+
+def usage() -> tuple[float, Optional[int]]:
+    """
+    Returns:
+        tuple[float, Optional[int]]: (进程 CPU 秒, 自愿上下文切换次数)，后者在不支持的系统上为None
+    """
+    cpu = time.process_time()
+    try:
+        import resource
+    except ImportError:
+        return cpu, None
+    return cpu, resource.getrusage(resource.RUSAGE_SELF).ru_nvcsw
+
+
+def child(args: argparse.Namespace) -> None:
+    """在子进程中运行监控并输出一行 JSON 结果"""
+    import AIO_login
+    import config
+    import monitor
+
+    path = os.path.join(args.workdir, "BITer.json")
+    config.save({"username": USERNAME, "password": PASSWORD, "ping_target": args.target,
+                 "ping_interval": args.interval, "net_events": args.net_events}, path)
+    client = AIO_login.PortalClient(base=args.portal)
+    handler = AIO_login.Operation(client, credentials=(USERNAME, PASSWORD), interactive=False)
+    mon = monitor.Monitor(handler, config.load(path), config_path=path,
+                          traffic_path=os.path.join(args.workdir, "traffic.dat"))
+    mon.start()
+    mon.step()  # 预热：建立连接、准备登录参数
+
+    threading.Timer(args.seconds, mon.stop).start()
+    cpu, wakeups = usage()
+    rounds = mon.checks
+    start = time.monotonic()
+    mon.run()
+    elapsed = time.monotonic() - start
+    cpu_end, wakeups_end = usage()
+    mon.close()
+    print(json.dumps({
+        "seconds": elapsed,
+        "rounds": mon.checks - rounds,
+        "failed": mon.statistic["失败"],
+        "cpu": cpu_end - cpu,
+        "wakeups": None if wakeups is None or wakeups_end is None else wakeups_end - wakeups,
+    }))
+
+
+def measure(seconds: float, interval: int, net_events: str) -> dict[str, Any]:
+    """启动模拟门户并在子进程中运行监控
+
+    Returns:
+        dict[str, Any]: 子进程输出的结果
+    """
+    import mock_portal
+
+    state = mock_portal.PortalState(accounts={USERNAME: PASSWORD}, seed=55)
+    state.online["127.0.0.1"] = USERNAME
+    server = mock_portal.serve(state=state)
+    port = server.server_address[1]
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--child", "--workdir", workdir,
+                 "--portal", f"http://127.0.0.1:{port}", "--target", f"127.0.0.1:{port}",
+                 "--seconds", str(seconds), "--interval", str(interval), "--net-events", net_events],
+                cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                timeout=seconds + 60, env={**os.environ, "XDG_RUNTIME_DIR": workdir})
+            if proc.returncode != 0:
+                raise RuntimeError(f"子进程退出码 {proc.returncode}")
+            return json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=60.0, help="统计时长")
+    parser.add_argument("--interval", type=int, default=1, help="探测间隔(秒)")
+    parser.add_argument("--net-events", default="auto", help="网络变化事件源(auto/netlink/poll/off)")
+    parser.add_argument("--scale", type=float, default=1.0, help="预算倍率")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--portal", help=argparse.SUPPRESS)
+    parser.add_argument("--target", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return 0
+
+    result = measure(args.seconds, args.interval, args.net_events)
+    per_hour = 3600 / result["seconds"]
+    cpu = result["cpu"] * per_hour
+    ok = cpu <= CPU_BUDGET * args.scale and result["failed"] == 0
+    print(f"  探测{result['rounds']}轮 / {result['seconds']:.0f}s (间隔{args.interval}s起，事件源{args.net_events})，"
+          f"失败{result['failed']}轮")
+    print(f"  CPU   {cpu:8.1f}s/h   预算{CPU_BUDGET * args.scale:8.1f}s/h   "
+          f"每轮{result['cpu'] / max(result['rounds'], 1) * 1000:6.2f}ms")
+    if result["wakeups"] is None:
+        print("  唤醒  不支持(缺少 resource 模块)")
+    else:
+        wakeups = result["wakeups"] * per_hour
+        ok &= wakeups <= WAKEUP_BUDGET * args.scale
+        print(f"  唤醒  {wakeups:8.0f}/h    预算{WAKEUP_BUDGET * args.scale:8.0f}/h    "
+              f"每轮{result['wakeups'] / max(result['rounds'], 1):6.1f}次")
+    print(f"  {'OK' if ok else 'FAIL'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# encoding = utf-8
+"""日志调用在探测循环中的耗时：同步处理器 vs 队列 + 后台写出
+
+模拟 main_loop 每轮的三条 INFO（探测、判定、休眠），比较调用方线程上
+logger.info() 的 p50/p99/最大耗时，以及实际写入文件的行数。
+
+用法：
+    python benchmarks/bench_logging.py [--rounds 20000]
+"""
+import argparse
+import logging
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import time
+from logging.handlers import TimedRotatingFileHandler
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log  # noqa: E402
+
+
+def run(logger: logging.Logger, rounds: int) -> list[float]:
+    samples: list[float] = []
+    for i in range(rounds):
+        for msg, key in (("正在探测 bilibili.com(tcp)", "probe"),
+                         (f"探测判定：在线({i % 40}ms)", "online"),
+                         ("休眠1秒， [Ctrl+C] 强制重登", "sleep")):
+            start = time.perf_counter()
+            logger.info(msg, extra={"collapse": key})
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(name: str, samples: list[float], path: str) -> None:
+    q = statistics.quantiles(samples, n=100)
+    with open(path, encoding="utf-8") as f:
+        lines = sum(1 for _ in f)
+    print(f"  {name:8s} p50={q[49] * 1e6:6.1f}us  p99={q[98] * 1e6:7.1f}us  "
+          f"max={max(samples) * 1e3:6.2f}ms  写出{lines}行")
+
+
+def file_handler(path: str) -> logging.Handler:
+    handler = TimedRotatingFileHandler(path, when="midnight", encoding="utf-8")
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s | %(levelname)8s | %(filename)20s | %(message)s"))
+    return handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_path = os.path.join(tmp, "sync.log")
+        sync = logging.getLogger("bench-sync")
+        sync.propagate = False
+        sync.addHandler(file_handler(sync_path))
+        sync.setLevel(logging.DEBUG)
+        report("sync", run(sync, args.rounds), sync_path)
+        sync.handlers[0].close()
+
+        queued_path = os.path.join(tmp, "queued.log")
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(log.LOG_QUEUE_SIZE)
+        source = log.BoundedQueueHandler(log_queue)
+        sink = file_handler(queued_path)
+        listener = log.CollapsingListener(log_queue, sink, source=source)
+        queued = logging.getLogger("bench-queued")
+        queued.propagate = False
+        queued.addHandler(source)
+        queued.setLevel(logging.DEBUG)
+        listener.start()
+        samples = run(queued, args.rounds)
+        listener.stop()
+        sink.close()
+        report("queued", samples, queued_path)
+
+
+if __name__ == "__main__":
+    main()
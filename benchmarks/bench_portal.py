@@ -0,0 +1,101 @@
+# encoding = utf-8
+"""针对本地模拟门户的端到端登录延迟基准
+
+驱动 Operation.login()/logout() 与 relogin()，输出 p50/p95/p99 延迟与吞吐量。
+prearmed 一行是在线时已调用 Operation.prearm() 后的登录（准备耗时不计入）。
+relogin 一行直接运行 monitor.Monitor.relogin() 所使用的恢复状态机（force_logout=True）。
+
+用法：
+    python benchmarks/bench_portal.py --rounds 50 --latency 0.02 --error-rate 0.02
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AIO_login  # noqa: E402
+import mock_portal  # noqa: E402
+import recovery  # noqa: E402
+
+USERNAME = "bench"
+PASSWORD = "bench-password"
+
+
+def report(name: str, samples: list[float], failures: int, elapsed: float) -> None:
+    if len(samples) < 2:
+        print(f"  {name:10s} 样本不足 (成功{len(samples)}次, 失败{failures}次)")
+        return
+    q = statistics.quantiles(samples, n=100)
+    print(
+        f"  {name:10s} p50={q[49] * 1000:7.1f}ms  p95={q[94] * 1000:7.1f}ms  "
+        f"p99={q[98] * 1000:7.1f}ms  {len(samples) / elapsed:6.1f} ops/s  失败{failures}次"
+    )
+
+
+def measure(rounds: int, op: Callable[[], object], reset: Callable[[], object]) -> tuple[list[float], int, float]:
+    samples: list[float] = []
+    failures = 0
+    begin = time.perf_counter()
+    for _ in range(rounds):
+        reset()
+        start = time.perf_counter()
+        try:
+            op()
+        except Exception:
+            failures += 1
+            continue
+        samples.append(time.perf_counter() - start)
+    return samples, failures, time.perf_counter() - begin
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    state = mock_portal.PortalState(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        drop_rate=args.drop_rate, accounts={USERNAME: PASSWORD}, seed=55)
+    server = mock_portal.serve(state=state)
+    client = AIO_login.PortalClient(base=f"http://127.0.0.1:{server.server_address[1]}")
+    AIO_login._client = client
+    handler = AIO_login.Operation(client, credentials=(USERNAME, PASSWORD))
+    ip = "127.0.0.1"
+
+    def go_offline() -> None:
+        with state.lock:
+            state.online.pop(ip, None)
+
+    def go_online() -> None:
+        with state.lock:
+            state.online[ip] = USERNAME
+
+    def go_offline_prearmed() -> None:
+        go_online()
+        handler.prearm()
+        go_offline()
+
+    def relogin() -> None:
+        machine = recovery.RecoveryMachine(handler)
+        if machine.run(force_logout=True) is not recovery.State.ONLINE:
+            raise RuntimeError("recovery failed")
+
+    print(f"mock portal: latency={args.latency * 1000:.0f}ms jitter={args.jitter * 1000:.0f}ms "
+          f"error={args.error_rate:.1%} drop={args.drop_rate:.1%}, {args.rounds} rounds")
+    report("login", *measure(args.rounds, handler.login, go_offline))
+    report("prearmed", *measure(args.rounds, handler.login, go_offline_prearmed))
+    report("logout", *measure(args.rounds, handler.logout, go_online))
+    report("relogin", *measure(args.rounds, relogin, go_online))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# encoding = utf-8
+"""各入口的冷启动导入开销与预算
+
+以 `python -X importtime` 运行每个入口，累加解释器本身(`-c pass`)之外
+所有模块的 self 时间，取多次运行的最小值，并检查不应出现在启动路径上的模块。
+超出预算或出现禁用模块时以非零状态退出，可直接放进 CI。
+
+用法：
+    python benchmarks/bench_startup.py [--runs 5] [--scale 1.0]
+
+--scale 按机器性能放大/缩小所有预算。依赖 Windows 的入口在其他系统上
+因缺少 msvcrt/win32gui 等模块无法导入，会标记为跳过。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import NamedTuple, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Entry(NamedTuple):
+    name: str
+    argv: list[str]
+    budget_ms: float  # 解释器之外的导入 self 时间总和上限
+    forbidden: tuple[str, ...]  # 启动路径上不应导入的模块
+
+
+ENTRY_POINTS: list[Entry] = [
+    Entry("AIO_login.py (standalone)", ["AIO_login.py", "--help"], 60.0,
+          ("requests", "asyncio", "html.parser", "calendar", "getpass", "http.server", "sqlite3")),
+    Entry("AIO_login.py (daemon forward)", ["-c", "import daemon"], 30.0,
+          ("logging", "requests", "AIO_login")),
+    Entry("Network_Alive.py", ["-c", "import Network_Alive"], 100.0,
+          ("requests", "asyncio", "http.server", "sqlite3", "msvcrt")),
+    Entry("monitor.py (headless)", ["-c", "import monitor"], 100.0,
+          ("requests", "asyncio", "http.server", "sqlite3", "msvcrt")),
+    Entry("Start.tray.pyw", ["-c", "import runpy; runpy.run_path('Start.tray.pyw', run_name='bench')"],
+          40.0, ("PIL", "pystray", "win32gui", "requests")),
+]
+
+
+class Sample(NamedTuple):
+    self_ms: dict[str, float]  # 模块 -> self 时间(ms)
+    wall_ms: float
+    error: str
+
+
+def import_times(argv: list[str]) -> Sample:
+    """以 -X importtime 运行一次
+
+    Returns:
+        Sample: 各模块的 self 时间、进程总耗时与错误输出(成功时为空)
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        cwd=ROOT, capture_output=True, text=True, encoding="utf-8", errors="replace",
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    modules: dict[str, float] = {}
+    other: list[str] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # 表头
+        modules[fields[2].strip()] = int(fields[0]) / 1000
+    error = "" if proc.returncode == 0 else (other[-1] if other else f"exit {proc.returncode}")
+    return Sample(modules, wall_ms, error)
+
+
+def measure(entry: Entry, baseline: set[str], runs: int) -> tuple[Optional[Sample], float]:
+    """多次运行取最小的导入开销
+
+    Returns:
+        tuple[Optional[Sample], float]: (开销最小的一次, 其开销ms)，无法运行时为 (失败样本, inf)
+    """
+    best: Optional[Sample] = None
+    best_ms = float("inf")
+    for _ in range(runs):
+        sample = import_times(entry.argv)
+        if sample.error:
+            return sample, float("inf")
+        cost = sum(t for name, t in sample.self_ms.items() if name not in baseline)
+        if cost < best_ms:
+            best, best_ms = sample, cost
+    return best, best_ms
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="预算倍率")
+    args = parser.parse_args()
+
+    baseline = set(import_times(["-c", "pass"]).self_ms)
+    failed = False
+    for entry in ENTRY_POINTS:
+        sample, cost = measure(entry, baseline, args.runs)
+        assert sample is not None
+        if sample.error:
+            if "ModuleNotFoundError" in sample.error or "ImportError" in sample.error:
+                print(f"  {entry.name:32s} 跳过: {sample.error}")
+                continue
+            print(f"  {entry.name:32s} 失败: {sample.error}")
+            failed = True
+            continue
+
+        budget = entry.budget_ms * args.scale
+        banned = sorted(name for name in sample.self_ms
+                        if name.split(".")[0] in entry.forbidden or name in entry.forbidden)
+        ok = cost <= budget and not banned
+        failed |= not ok
+        print(f"  {entry.name:32s} 导入{cost:6.1f}ms / 预算{budget:5.0f}ms  "
+              f"进程{sample.wall_ms:6.1f}ms  {'OK' if ok else 'FAIL'}")
+        heaviest = sorted(
+            ((t, name) for name, t in sample.self_ms.items() if name not in baseline), reverse=True)[:5]
+        print("      最重: " + ", ".join(f"{name}={t:.1f}ms" for t, name in heaviest))
+        if banned:
+            print("      不应导入: " + ", ".join(banned))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
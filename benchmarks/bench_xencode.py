@@ -0,0 +1,142 @@
+# encoding = utf-8
+"""xencode/fkbase64 新旧实现的微基准
+
+用法：
+    python benchmarks/bench_xencode.py [--number N]
+
+正确性由 tests/test_xencode.py 中的黄金向量保证，此处只比较 ops/sec。
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import timeit
+from base64 import b64encode
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AIO_login  # noqa: E402
+
+
+# 以下为优化前的实现，仅作为参照
+
+def legacy_fkbase64(raw_s: str) -> str:
+    """base64掩码加密
+
+    Returns:
+        - str: encoded string
+    """
+    trans = str.maketrans(
+        "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/",
+        "LVoJPiCN2R8G90yg+hmFHuacZ1OWMnrsSTXkYpUq/3dlbfKwv6xztjI7DeBE45QA",
+    )
+    ret = b64encode(bytes(ord(i) & 0xFF for i in raw_s))
+    return ret.decode().translate(trans)
+
+
+def legacy_xencode(msg:str, key:str):
+    """加密算法，用于网络认证过程中的数据加密
+
+    该函数包含两个内部函数：
+    - sencode: 将消息和密钥转换为32位整数数组
+    - lencode: 将加密后的整数数组转换回字符串
+
+    Args:
+        msg (str): 需要加密的消息
+        key (str): 加密密钥
+
+    Returns:
+        str: 加密后的字符串
+    """
+    def sencode(msg:str, key:bool):
+        def ordat(msg:str, idx:int):
+            if len(msg) > idx:
+                return ord(msg[idx])
+            return 0
+
+        msg_len = len(msg)
+        pwd:list[int] = []
+        for i in range(0, msg_len, 4):
+            pwd.append(ordat(msg, i) | ordat(msg, i + 1) << 8 |
+                       ordat(msg, i + 2) << 16 | ordat(msg, i + 3) << 24)
+        if key:
+            pwd.append(msg_len)
+        return pwd
+
+    def lencode(msg: list[int], key: bool) -> str:
+        msg_len: int = len(msg)
+        ll: int = (msg_len - 1) << 2
+        if key:
+            m: int = msg[msg_len - 1]
+            if m < ll - 3 or m > ll:
+                return ""
+            ll = m
+        str_parts: list[str] = []
+        for num in msg:
+            byte0: str = chr(num & 0xFF)
+            byte1: str = chr((num >> 8) & 0xFF)
+            byte2: str = chr((num >> 16) & 0xFF)
+            byte3: str = chr((num >> 24) & 0xFF)
+            str_parts.append(byte0 + byte1 + byte2 + byte3)
+        full_str: str = "".join(str_parts)
+        if key:
+            return full_str[0:ll]
+        return full_str
+
+    if msg == "":
+        return ""
+    pwd = sencode(msg, True)
+    pwdk = sencode(key, False)
+    if len(pwdk) < 4:
+        pwdk = pwdk + [0] * (4 - len(pwdk))
+    n = len(pwd) - 1
+    z = pwd[n]
+    y = pwd[0]
+    c = 0x86014019 | 0x183639A0
+    m = 0
+    e = 0
+    d = 0
+    p = 0
+    q = math.floor(6 + 52 / (n + 1))
+    while 0 < q:
+        d = d + c & (0x8CE0D9BF | 0x731F2640)
+        e = d >> 2 & 3
+        p = 0
+        while p < n:
+            y = pwd[p + 1]
+            m = z >> 5 ^ y << 2
+            m = m + ((y >> 3 ^ z << 4) ^ (d ^ y))
+            m = m + (pwdk[(p & 3) ^ e] ^ z)
+            pwd[p] = pwd[p] + m & (0xEFB8D130 | 0x10472ECF)
+            z = pwd[p]
+            p = p + 1
+        y = pwd[0]
+        m = z >> 5 ^ y << 2
+        m = m + ((y >> 3 ^ z << 4) ^ (d ^ y))
+        m = m + (pwdk[(p & 3) ^ e] ^ z)
+        pwd[n] = pwd[n] + m & (0xBB390742 | 0x44C6F8BD)
+        z = pwd[n]
+        q = q - 1
+    return lencode(pwd, False)
+
+
+def bench(number: int = 2000) -> None:
+    # 与 _make_params 中实际加密的数据规模相当
+    msg = json.dumps({
+        "username": "1120200000", "password": "p@ssw0rd!", "acid": "1",
+        "ip": "10.62.100.100", "enc_ver": "srun_bx1"}, separators=(",", ":"))
+    token = "a" * 64
+    for name, enc, b64 in (
+        ("legacy", legacy_xencode, legacy_fkbase64),
+        ("current", AIO_login.xencode, AIO_login.fkbase64),
+    ):
+        seconds = timeit.timeit(lambda: b64(enc(msg, token)), number=number)
+        print(f"  {name:8s} {number / seconds:10.0f} ops/sec")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    bench(args.number)
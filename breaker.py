@@ -0,0 +1,161 @@
+# encoding = utf-8
+# breaker
+"""门户请求的熔断器
+
+    CLOSED ──连续失败 threshold 次──→ OPEN ──退避时间到──→ HALF_OPEN
+      ↑                                ↑                     │
+      └──────────试探成功──────────────┼─────────────────────┘
+                                       └──────试探失败(退避加倍)
+
+门户本身宕机时，OPEN 状态下的请求直接抛出 PortalUnavailable，不再发出，
+避免每次探测失败都对门户发起登出、登录。退避时间按连续打开次数指数增长并加随机抖动，
+上限 max_delay；HALF_OPEN 只放行一个试探请求，成功即恢复 CLOSED。
+
+连接失败、超时与 HTTP 5xx 计为失败，其余响应(包括门户返回的业务错误)计为成功。
+所有门户请求共用 PortalClient 上的同一个熔断器，登录、状态查询与恢复状态机共享其状态。
+"""
+import random
+import threading
+import time
+from enum import Enum
+from typing import Callable, Optional
+
+DEFAULT_THRESHOLD: int = 3
+DEFAULT_BASE_DELAY: float = 2.0
+DEFAULT_MAX_DELAY: float = 120.0
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class PortalUnavailable(ConnectionError):
+    """熔断器打开期间拒绝的门户请求
+
+    Attributes:
+        retry_in: 距离允许试探的秒数
+    """
+
+    def __init__(self, msg: str, retry_in: float = 0.0) -> None:
+        super().__init__(msg)
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """线程安全的三态熔断器
+
+    Attributes:
+        on_change: 状态变化时以新状态调用，用于记录指标
+    """
+
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD,
+                 base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY,
+                 clock: Callable[[], float] = time.monotonic,
+                 rng: Optional[random.Random] = None) -> None:
+        """
+        Args:
+            threshold: CLOSED 状态下连续失败多少次后打开
+            base_delay: 第一次打开的退避时间(秒)
+            max_delay: 退避时间上限(秒)
+            clock: 单调时钟，测试时可替换
+            rng: 抖动使用的随机数发生器
+        """
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.on_change: Optional[Callable[[BreakerState], None]] = None
+        self._state = BreakerState.CLOSED
+        self._failures = 0  # CLOSED 状态下的连续失败次数
+        self._opened = 0  # 连续打开次数，决定退避时间
+        self._retry_at = 0.0
+        self._trial = False  # HALF_OPEN 状态下是否已有试探请求在进行
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> BreakerState:
+        with self._lock:
+            return self._current()
+
+    def retry_in(self) -> float:
+        """距离允许试探的秒数，未打开时为0"""
+        with self._lock:
+            if self._current() is BreakerState.OPEN:
+                return self._retry_at - self.clock()
+            return 0.0
+
+    def backoff(self, opened: int) -> float:
+        """第 opened 次连续打开的退避时间，在 [delay/2, delay] 内均匀抖动"""
+        delay = min(self.base_delay * 2 ** min(opened - 1, 16), self.max_delay)
+        return delay / 2 + self.rng.random() * delay / 2
+
+    def before_request(self) -> None:
+        """发送请求前调用
+
+        Raises:
+            PortalUnavailable: 熔断器打开，或半开状态下已有试探请求
+        """
+        with self._lock:
+            state = self._current()
+            if state is BreakerState.OPEN:
+                retry_in = self._retry_at - self.clock()
+                raise PortalUnavailable(f"门户暂不可用，{retry_in:.0f}秒后再试", retry_in)
+            if state is BreakerState.HALF_OPEN:
+                if self._trial:
+                    raise PortalUnavailable("门户恢复试探中")
+                self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened = 0
+            self._trial = False
+            self._set(BreakerState.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            state = self._current()
+            self._trial = False
+            if state is BreakerState.OPEN:
+                return  # 打开前已发出的请求，不再延长退避
+            if state is BreakerState.CLOSED:
+                self._failures += 1
+                if self._failures < self.threshold:
+                    return
+            # 半开试探失败，或关闭状态下失败次数达到阈值
+            self._failures = 0
+            self._opened += 1
+            self._retry_at = self.clock() + self.backoff(self._opened)
+            self._set(BreakerState.OPEN)
+
+    def release(self) -> None:
+        """请求既未成功也未失败(如被用户中断)时调用，释放半开状态的试探名额"""
+        with self._lock:
+            self._trial = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures = self._opened = 0
+            self._trial = False
+            self._set(BreakerState.CLOSED)
+
+    def _current(self) -> BreakerState:
+        if self._state is BreakerState.OPEN and self.clock() >= self._retry_at:
+            self._set(BreakerState.HALF_OPEN)
+        return self._state
+
+    def _set(self, state: BreakerState) -> None:
+        if state is not self._state:
+            self._state = state
+            if self.on_change is not None:
+                self.on_change(state)
+
+    def __repr__(self) -> str:
+        state = self.state
+        if state is BreakerState.OPEN:
+            return f"{state.value}({self.retry_in():.0f}s)"
+        return state.value
@@ -0,0 +1,219 @@
+# encoding = utf-8
+# bulk
+"""批量登录、登出与状态检查
+
+为机房等多台主机代为操作：名单中每一项给出 (username, password, ip, ac_id)，
+门户协议本身在参数中显式携带 ip 与 ac_id，因此无需在各主机上运行脚本，
+也不解析首页。所有条目在有上限的线程池中并发执行，
+每个门户主机共用一个连接池、熔断器与令牌桶限速，结果输出为 JSON 报告。
+
+名单可以是 CSV(表头 username,password,ip,ac_id[,portal]) 或 JSON 对象列表，
+portal 可选，缺省为 10.0.0.55。
+
+用法：
+    python bulk.py roster.csv --action login --workers 16 --rate 50 --report result.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import AIO_login
+import log
+
+logger = log.setup_logger()
+
+ACTIONS = ("login", "logout", "check")
+DEFAULT_WORKERS: int = 16
+DEFAULT_RATE: float = 50.0  # 每个门户主机每秒请求数
+
+
+class RosterEntry(NamedTuple):
+    username: str
+    password: str
+    ip: str
+    ac_id: str
+    portal: str = AIO_login.API_BASE
+
+
+def read_roster(path: str) -> list[RosterEntry]:
+    """读取名单
+
+    Raises:
+        ValueError: 缺少字段或格式无法识别
+
+    Returns:
+        list[RosterEntry]: 名单条目
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            import csv
+            rows: list[Any] = list(csv.DictReader(f))
+        else:
+            rows = json.load(f)
+    if not isinstance(rows, list):
+        raise ValueError(f"{path}: 名单应为对象列表")
+    entries: list[RosterEntry] = []
+    for line, row in enumerate(rows, 1):
+        try:
+            entries.append(RosterEntry(
+                str(row["username"]), str(row["password"]), str(row["ip"]), str(row["ac_id"]),
+                str(row.get("portal") or AIO_login.API_BASE)))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"{path} 第{line}项缺少字段: {e}") from None
+    return entries
+
+
+class RateLimiter:
+    """令牌桶，调用时取一个令牌，不足时阻塞等待"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量，缺省与 rate 相同
+        """
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __call__(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        # 令牌已预先扣除，等待期间其他线程排在后面
+        if wait > 0:
+            time.sleep(wait)
+
+
+class BulkRunner:
+    """按门户主机分组复用客户端，并发执行名单中的操作"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, rate: float = DEFAULT_RATE,
+                 budget: float = AIO_login.LOGIN_BUDGET) -> None:
+        """
+        Args:
+            workers: 并发线程数上限
+            rate: 每个门户主机每秒请求数上限，0 为不限
+            budget: 每个条目的总时限(秒)
+        """
+        self.workers = workers
+        self.rate = rate
+        self.budget = budget
+        self.clients: dict[str, AIO_login.PortalClient] = {}
+        self.lock = threading.Lock()
+
+    def client(self, portal: str) -> AIO_login.PortalClient:
+        host = urlparse(portal).netloc or portal
+        with self.lock:
+            if host not in self.clients:
+                client = AIO_login.PortalClient(base=portal, pool_size=self.workers)
+                if self.rate > 0:
+                    client.limiter = RateLimiter(self.rate)
+                self.clients[host] = client
+            return self.clients[host]
+
+    def close(self) -> None:
+        for client in self.clients.values():
+            client.close()
+
+    def run_one(self, entry: RosterEntry, action: str) -> dict[str, Any]:
+        """对一个条目执行操作，异常记录在结果中
+
+        Returns:
+            dict[str, Any]: 单条结果
+        """
+        result: dict[str, Any] = {"username": entry.username, "ip": entry.ip, "ok": False}
+        start = time.monotonic()
+        client = self.client(entry.portal)
+        deadline = AIO_login.Deadline(self.budget)
+        try:
+            if action == "check":
+                online, username = AIO_login.get_user_info(client, deadline=deadline, ip=entry.ip)
+                result.update(ok=True, online=online, online_user=username)
+            else:
+                user = AIO_login.User(entry.username, entry.password, client,
+                                      deadline=deadline, identity=(entry.ip, entry.ac_id))
+                res = user.operation(AIO_login.Action(action))
+                if res.get("error", "ok") == "ok":
+                    result.update(ok=True, status=f"{action}_ok")
+                else:
+                    result.update(error=res.get("error_msg") or res.get("error"))
+        except AIO_login.AlreadyOnlineException:
+            result.update(ok=True, status="already_online")
+        except AIO_login.AlreadyLoggedOutException:
+            result.update(ok=True, status="already_offline")
+        except Exception as e:
+            result.update(error=f"{type(e).__name__}: {e}")
+        result["seconds"] = round(time.monotonic() - start, 3)
+        return result
+
+    def run(self, entries: Iterable[RosterEntry], action: str) -> dict[str, Any]:
+        """并发执行并生成报告
+
+        Args:
+            entries: 名单
+            action: login、logout 或 check
+
+        Raises:
+            ValueError: 未知操作
+
+        Returns:
+            dict[str, Any]: 报告，results 与名单顺序一致
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"未知操作: {action}，可选: {', '.join(ACTIONS)}")
+        entries = list(entries)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk") as pool:
+            results = list(pool.map(lambda entry: self.run_one(entry, action), entries))
+        succeeded = sum(r["ok"] for r in results)
+        return {
+            "action": action,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seconds": round(time.monotonic() - start, 3),
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
+        }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="批量登录/登出/检查")
+    parser.add_argument("roster", help="名单文件(.csv 或 .json)")
+    parser.add_argument("-a", "--action", choices=ACTIONS, default="login")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="并发数上限")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="每个门户每秒请求数，0为不限")
+    parser.add_argument("--budget", type=float, default=AIO_login.LOGIN_BUDGET, help="每个条目的时限(秒)")
+    parser.add_argument("--report", help="报告输出路径，缺省输出到标准输出")
+    args = parser.parse_args()
+
+    runner = BulkRunner(args.workers, args.rate, args.budget)
+    try:
+        report = runner.run(read_roster(args.roster), args.action)
+    finally:
+        runner.close()
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(text)
+        logger.info(f"报告已写入 {os.path.abspath(args.report)}")
+    else:
+        print(text)
+    logger.info(f"{args.action}: 成功{report['succeeded']}/{report['total']}，耗时{report['seconds']:.2f}s")
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+# encoding = utf-8
+# config
+"""BITer.json 配置
+
+所有模块都通过 load() 读取配置：按 (mtime, size) 缓存解析结果，
+文件未变化时只做一次 stat；解析后校验为类型确定的 Config，
+字段缺失时取默认值，类型或取值不对时抛出 ConfigError。
+
+save() 合并修改后以 JSON 写入同目录的临时文件再替换原文件，
+不会留下写了一半的配置，也不会丢掉未修改的字段。
+账号密码与其余字段分开处理：read_credentials()/save_credentials() 不因
+其他字段无效而失败，探测设置写错时不必重新填写账号，也不会丢失其余设置。
+ConfigWatcher 供监控循环每轮调用，文件变化且校验通过时返回新配置。
+"""
+import json
+import os
+import threading
+from typing import Any, NamedTuple, Optional
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "BITer.json")
+
+
+class ConfigError(ValueError):
+    """配置文件无法解析或字段取值无效"""
+
+
+class Config(NamedTuple):
+    username: str = ""
+    password: str = ""
+    ping_target: str | list[str] = "bilibili.com"  # 单个目标或目标列表
+    ping_interval: int = 1  # 探测间隔(秒)
+    ping_interval_max: int = 10  # 没有网络变化时探测间隔逐步放宽到此值(秒)，不大于 ping_interval 时不放宽
+    net_events: str = "auto"  # 网络变化通知，见 netevents.SOURCE_TYPES
+    passive_min_rate: float = 32768.0  # 入站速率不低于此值(字节/秒)时跳过主动探测，0 为关闭
+    probe_type: str = "tcp"  # 见 probe.PROBE_TYPES
+    probe_timeout: float = 2.0  # 单次探测超时(秒)，包含域名解析
+    probe_quorum: Optional[int] = None  # 判定离线所需的失败目标数，缺省为全部
+    metrics_port: int = 0  # 0 为不开启
+    history_db: Optional[str] = None
+    traffic_interval: float = 300.0  # 流量采样间隔(秒)，0 为关闭
+
+    @property
+    def targets(self) -> list[str]:
+        return [self.ping_target] if isinstance(self.ping_target, str) else list(self.ping_target)
+
+
+def _number(data: dict[str, Any], key: str, kind: type, minimum: float) -> Any:
+    value = data[key]
+    # bool 是 int 的子类，true/false 不应被当作数字
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ConfigError(f"{key} 应为数字，实际为 {value!r}")
+    if kind is int and value != int(value):
+        raise ConfigError(f"{key} 应为整数，实际为 {value!r}")
+    if value < minimum:
+        raise ConfigError(f"{key} 不能小于 {minimum}，实际为 {value!r}")
+    return kind(value)
+
+
+def validate(data: Any) -> Config:
+    """把解析出的 JSON 校验为 Config，未知字段忽略
+
+    Raises:
+        ConfigError: 顶层不是对象，或字段类型、取值无效
+
+    Returns:
+        Config: 缺失字段取默认值
+    """
+    if not isinstance(data, dict):
+        raise ConfigError("配置文件顶层应为对象")
+    fields: dict[str, Any] = {}
+    for key in ("username", "password", "probe_type", "net_events"):
+        if key in data:
+            if not isinstance(data[key], str):
+                raise ConfigError(f"{key} 应为字符串，实际为 {data[key]!r}")
+            fields[key] = data[key]
+
+    if "ping_target" in data:
+        target = data["ping_target"]
+        if isinstance(target, list):
+            if not target or not all(isinstance(t, str) and t for t in target):
+                raise ConfigError("ping_target 列表应为非空的域名/地址列表")
+            target = list(target)
+        elif not isinstance(target, str) or not target:
+            raise ConfigError(f"ping_target 应为字符串或字符串列表，实际为 {target!r}")
+        fields["ping_target"] = target
+
+    for key, kind, minimum in (("ping_interval", int, 1), ("ping_interval_max", int, 0),
+                               ("probe_timeout", float, 0.1),
+                               ("metrics_port", int, 0), ("traffic_interval", float, 0),
+                               ("passive_min_rate", float, 0)):
+        if key in data:
+            fields[key] = _number(data, key, kind, minimum)
+    if fields.get("metrics_port", 0) > 65535:
+        raise ConfigError(f"metrics_port 超出端口范围: {fields['metrics_port']}")
+
+    if data.get("probe_quorum") is not None:
+        quorum = _number(data, "probe_quorum", int, 1)
+        count = len(Config(**fields).targets)
+        if quorum > count:
+            raise ConfigError(f"probe_quorum({quorum}) 大于目标数({count})")
+        fields["probe_quorum"] = quorum
+    if data.get("history_db") is not None:
+        if not isinstance(data["history_db"], str):
+            raise ConfigError(f"history_db 应为路径字符串，实际为 {data['history_db']!r}")
+        fields["history_db"] = data["history_db"]
+    return Config(**fields)
+
+
+_lock = threading.Lock()
+_cache: dict[str, tuple[tuple[int, int], Config]] = {}  # path -> ((mtime_ns, size), 配置)
+
+
+def _signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load(path: Optional[str] = None) -> Config:
+    """读取配置，文件未变化时直接返回缓存
+
+    Args:
+        path: 配置文件路径，缺省为 CONFIG_PATH
+
+    Raises:
+        FileNotFoundError: 配置文件不存在
+        ConfigError: 无法解析或校验失败
+
+    Returns:
+        Config: 配置
+    """
+    path = path or CONFIG_PATH
+    signature = _signature(path)
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    try:
+        with open(path, "r", encoding="utf8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"无法解析 {os.path.basename(path)}: {e}") from None
+    config = validate(data)
+    with _lock:
+        _cache[path] = (signature, config)
+    return config
+
+
+def save(changes: dict[str, Any], path: Optional[str] = None, reset: bool = False) -> Config:
+    """合并修改并原子地写回配置文件
+
+    原文件不存在或无法解析时从空配置开始，其余字段原样保留。
+
+    Args:
+        changes: 要修改的字段
+        path: 配置文件路径，缺省为 CONFIG_PATH
+        reset: 丢弃原有字段，只写入 changes
+
+    Raises:
+        ConfigError: 合并后的配置校验失败，此时不写入
+
+    Returns:
+        Config: 写入后的配置
+    """
+    path = path or CONFIG_PATH
+    data = {} if reset else _read_raw(path)
+    data.update(changes)
+    config = validate(data)
+    _write(data, path, config)
+    return config
+
+
+def _read_raw(path: str) -> dict[str, Any]:
+    """读取未经校验的 JSON 对象，文件不存在或无法解析时为空"""
+    try:
+        with open(path, "r", encoding="utf8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write(data: dict[str, Any], path: str, config: Optional[Config]) -> None:
+    """原子地写入 data，config 为None(校验未通过)时清除缓存"""
+    import tempfile
+
+    # mkstemp 以 0600 创建，密码不会对其他用户可读
+    fd, tmp = tempfile.mkstemp(prefix=".BITer.", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    with _lock:
+        if config is None:
+            _cache.pop(path, None)
+        else:
+            _cache[path] = (_signature(path), config)
+
+
+def read_credentials(path: Optional[str] = None) -> tuple[str, str]:
+    """只读取账号密码，不校验其余字段
+
+    其他字段无效时登录仍可进行，不必因此重新填写账号密码。
+
+    Args:
+        path: 配置文件路径，缺省为 CONFIG_PATH
+
+    Raises:
+        FileNotFoundError: 配置文件不存在
+        ConfigError: 无法解析，或账号密码本身无效
+
+    Returns:
+        tuple[str, str]: (username, password)
+    """
+    path = path or CONFIG_PATH
+    try:
+        with open(path, "r", encoding="utf8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"无法解析 {os.path.basename(path)}: {e}") from None
+    if not isinstance(data, dict):
+        raise ConfigError("配置文件顶层应为对象")
+    credentials = data.get("username", ""), data.get("password", "")
+    if not all(isinstance(value, str) for value in credentials):
+        raise ConfigError("username/password 应为字符串")
+    return credentials
+
+
+def save_credentials(username: str, password: str, path: Optional[str] = None) -> Optional[Config]:
+    """写入账号密码，其余字段即使无效也原样保留
+
+    Args:
+        username: 账号
+        password: 密码
+        path: 配置文件路径，缺省为 CONFIG_PATH
+
+    Returns:
+        Optional[Config]: 写入后的配置，其余字段仍有无效值时为None
+    """
+    path = path or CONFIG_PATH
+    data = _read_raw(path)
+    data.update(username=username, password=password)
+    try:
+        config: Optional[Config] = validate(data)
+    except ConfigError:
+        config = None
+    _write(data, path, config)
+    return config
+
+
+class ConfigWatcher:
+    """检查配置文件是否变化，供循环中定期调用"""
+
+    def __init__(self, path: Optional[str] = None, current: Optional[Config] = None) -> None:
+        self.path = path or CONFIG_PATH
+        self.current = current
+        self.error: Optional[str] = None  # 最近一次无效修改的原因，避免重复报告
+
+    def poll(self) -> Optional[Config]:
+        """
+        Returns:
+            Optional[Config]: 文件变化且校验通过时返回新配置，否则为None
+        """
+        try:
+            config = load(self.path)
+        except (OSError, ConfigError) as e:
+            self.error = str(e)
+            return None
+        self.error = None
+        if config == self.current:
+            return None
+        self.current = config
+        return config
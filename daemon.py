@@ -0,0 +1,386 @@
+# encoding = utf-8
+# daemon
+"""常驻模式与本地控制通道
+
+守护进程持有门户客户端(连接池、身份缓存)以及可选的监控循环，
+在本地控制通道上应答一行 JSON 请求/一行 JSON 应答：
+
+    {"cmd": "login" | "logout" | "status" | "relogin", "token": "..."}
+    -> {"ok": true, "result": {...}} 或 {"ok": false, "error": "...", "type": "..."}
+
+控制通道只对当前用户开放：
+    - POSIX: Unix 套接字，位于 $XDG_RUNTIME_DIR/bit-connect 或 /tmp/bit-connect-<uid>，
+      目录权限 0700，连接与监听前都会检查目录属主与权限
+    - Windows: 127.0.0.1 上的随机端口，端口与随机令牌写在 %LOCALAPPDATA% 下，
+      请求必须带上令牌
+
+命令行 `AIO_login.py -a login` 等会先调用 forward_cli()，守护进程在运行时直接转发，
+此时不导入 requests、不初始化日志；连接不上时才独立执行。
+启动：python AIO_login.py -a daemon [--monitor]
+
+本模块顶层只依赖标准库，服务端所需的模块在 Daemon 中按需导入。
+"""
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import stat
+import sys
+import threading
+from datetime import datetime
+from typing import Any, Optional
+
+COMMANDS: dict[str, str] = {
+    **dict.fromkeys(["login", "登录", "登陆", "上线"], "login"),
+    **dict.fromkeys(["logout", "登出", "下线", "退出"], "logout"),
+    "status": "status",
+    "relogin": "relogin",
+}
+CONNECT_TIMEOUT: float = 0.5
+REQUEST_TIMEOUT: float = 1.0  # 守护进程等待客户端发出请求的时限
+REPLY_TIMEOUT: float = 30.0
+MAX_MESSAGE: int = 64 * 1024
+USE_UNIX_SOCKET: bool = hasattr(socket, "AF_UNIX")
+
+
+class ControlChannelError(OSError):
+    """控制通道不安全或不可用"""
+
+
+def runtime_dir(create: bool = False) -> str:
+    """获取控制通道所在的私有目录，并检查其属主与权限
+
+    Args:
+        create: 目录不存在时是否创建
+
+    Raises:
+        ControlChannelError: 目录不属于当前用户或对其他用户开放
+        FileNotFoundError: 目录不存在且 create 为 False
+
+    Returns:
+        str: 目录路径
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        path = os.path.join(base, "BIT-Connect")
+        if create:
+            os.makedirs(path, exist_ok=True)
+        elif not os.path.isdir(path):
+            raise FileNotFoundError(path)
+        return path
+
+    if runtime := os.environ.get("XDG_RUNTIME_DIR"):
+        path = os.path.join(runtime, "bit-connect")
+    else:
+        path = os.path.join("/tmp", f"bit-connect-{os.getuid()}")
+    if create:
+        try:
+            os.mkdir(path, 0o700)
+        except FileExistsError:
+            pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise ControlChannelError(f"控制目录{path}不属于当前用户")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        raise ControlChannelError(f"控制目录{path}权限过宽({stat.S_IMODE(info.st_mode):o})")
+    return path
+
+
+def socket_path(create: bool = False) -> str:
+    return os.path.join(runtime_dir(create), "control.sock")
+
+
+def endpoint_path(create: bool = False) -> str:
+    """Windows 上记录端口与令牌的文件"""
+    return os.path.join(runtime_dir(create), "daemon.json")
+
+
+def _connect() -> tuple[socket.socket, str]:
+    """连接守护进程
+
+    Raises:
+        OSError: 守护进程未运行或控制通道不安全
+
+    Returns:
+        tuple[socket.socket, str]: (已连接的套接字, 令牌)
+    """
+    if USE_UNIX_SOCKET:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address: Any = socket_path()
+        token = ""
+    else:
+        with open(endpoint_path(), "r", encoding="utf8") as f:
+            endpoint = json.load(f)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = ("127.0.0.1", int(endpoint["port"]))
+        token = str(endpoint["token"])
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock, token
+
+
+def _send(sock: socket.socket, message: dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message, ensure_ascii=False).encode() + b"\n")
+
+
+def _receive(sock: socket.socket) -> dict[str, Any]:
+    """读取一行 JSON 消息
+
+    Raises:
+        ValueError: 消息过长、不完整或不是 JSON 对象
+    """
+    with sock.makefile("rb") as stream:
+        line = stream.readline(MAX_MESSAGE + 1)
+    if not line.endswith(b"\n"):
+        raise ValueError("消息不完整或过长")
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError("消息不是 JSON 对象")
+    return message
+
+
+def request(cmd: str, timeout: float = REPLY_TIMEOUT) -> Optional[dict[str, Any]]:
+    """向守护进程发送一条命令
+
+    Args:
+        cmd: 命令，见 COMMANDS
+        timeout: 等待应答的时限(秒)
+
+    Raises:
+        TimeoutError: 守护进程在时限内没有应答
+
+    Returns:
+        Optional[dict[str, Any]]: 应答，守护进程未运行时为None
+    """
+    try:
+        sock, token = _connect()
+    except ControlChannelError as e:
+        _say("WARNING", f"{e}，不使用守护进程")
+        return None
+    except (OSError, ValueError, KeyError):
+        return None
+    with sock:
+        sock.settimeout(timeout)
+        _send(sock, {"cmd": cmd, "token": token})
+        try:
+            return _receive(sock)
+        except socket.timeout:
+            raise TimeoutError(f"守护进程{timeout:g}s内未应答") from None
+        except (OSError, ValueError) as e:
+            return {"ok": False, "error": f"应答无效: {e}", "type": type(e).__name__}
+
+
+def _say(level: str, msg: str) -> None:
+    # 与日志的控制台格式一致，但不初始化日志系统
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {level}: {msg}", flush=True)
+
+
+def describe(cmd: str, result: Any) -> str:
+    """把应答结果转换为与独立执行时相同的提示"""
+    match cmd:
+        case "login":
+            return f"用户{result.get('username')} IP({result.get('online_ip')}) 登录成功"
+        case "logout":
+            return f"用户{result.get('username')} IP({result.get('online_ip')}) 现已登出"
+        case "status":
+            text = f"在线: {result['username']}" if result["online"] else "当前未登录"
+            if result.get("breaker", "closed") != "closed":
+                text += f"(门户熔断器: {result['breaker']})"
+            return text
+        case "relogin":
+            return f"恢复结果: {result['state']}"
+        case _:
+            return json.dumps(result, ensure_ascii=False)
+
+
+def forward_cli(argv: list[str]) -> None:
+    """命令行入口的快速路径：守护进程在运行时转发命令并直接退出
+
+    参数不是可转发的命令、带有 --standalone 或守护进程未运行时直接返回，
+    由调用方继续独立执行。
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-a", "--action")
+    parser.add_argument("--standalone", action="store_true")
+    args, _ = parser.parse_known_args([arg.lower() for arg in argv])
+    cmd = COMMANDS.get(str(args.action))
+    if cmd is None or args.standalone:
+        return
+    try:
+        reply = request(cmd)
+    except TimeoutError as e:
+        _say("ERROR", str(e))
+        sys.exit(14)
+    if reply is None:
+        return
+    if not reply.get("ok"):
+        _say("ERROR", f"{reply.get('type')}: {reply.get('error')}")
+        sys.exit(14 if reply.get("type") == "PortalTimeout" else 11)
+    _say("INFO", describe(cmd, reply.get("result")))
+    sys.exit(0)
+
+
+class Daemon:
+    """常驻进程，串行处理控制请求"""
+
+    def __init__(self, monitor: bool = False, handler: Optional[Any] = None) -> None:
+        """
+        Args:
+            monitor: 是否同时在后台线程运行监控循环
+            handler: 使用的 AIO_login.Operation，缺省按配置文件创建
+        """
+        import AIO_login
+        import log
+
+        self.aio = AIO_login
+        self.logger = log.setup_logger()
+        # 守护进程没有可交互的终端，密码错误以错误应答返回而不是提示重新输入
+        self.handler = handler or AIO_login.Operation(AIO_login.get_client(), interactive=False)
+        self.monitor = monitor
+        self.token = secrets.token_urlsafe(32)
+        self.address = ""
+        self._stopped = threading.Event()
+        self._engine: Optional[Any] = None  # --monitor 时的 monitor.Monitor
+
+    def handle(self, cmd: str) -> dict[str, Any]:
+        """执行一条命令并生成应答
+
+        Returns:
+            dict[str, Any]: 应答
+        """
+        aio = self.aio
+        try:
+            match cmd:
+                case "login":
+                    result: Any = self.handler.login()
+                case "logout":
+                    result = self.handler.logout()
+                case "status":
+                    is_logged_in, username = aio.get_user_info(self.handler.client)
+                    result = {"online": is_logged_in, "username": username,
+                              "breaker": self.handler.client.breaker.state.value}
+                case "relogin":
+                    import recovery
+                    state = recovery.RecoveryMachine(self.handler).run(force_logout=True)
+                    if state is not recovery.State.ONLINE:
+                        return {"ok": False, "error": f"恢复结果: {state.value}",
+                                "type": "PortalTimeout" if state is recovery.State.TIMEOUT
+                                else "RecoveryFailed"}
+                    result = {"state": state.value}
+                case _:
+                    return {"ok": False, "error": f"未知命令: {cmd}", "type": "ValueError"}
+        except Exception as e:
+            return {"ok": False, "error": str(e), "type": type(e).__name__}
+        return {"ok": True, "result": result}
+
+    def bind(self) -> socket.socket:
+        """创建监听套接字
+
+        Raises:
+            RuntimeError: 已有守护进程在运行
+
+        Returns:
+            socket.socket: 正在监听的套接字
+        """
+        if request("status", timeout=1) is not None:
+            raise RuntimeError("守护进程已在运行")
+
+        if USE_UNIX_SOCKET:
+            path = socket_path(create=True)
+            if os.path.exists(path):
+                os.remove(path)  # 上次异常退出遗留
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            # 在 bind 时就以 0600 创建，避免先创建再 chmod 的窗口
+            umask = os.umask(0o177)
+            try:
+                server.bind(path)
+            finally:
+                os.umask(umask)
+            self.address = path
+        else:
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.bind(("127.0.0.1", 0))
+            path = endpoint_path(create=True)
+            temp = path + ".tmp"
+            with open(temp, "w", encoding="utf8") as f:
+                json.dump({"port": server.getsockname()[1], "token": self.token}, f)
+            os.replace(temp, path)
+            self.address = f"127.0.0.1:{server.getsockname()[1]}"
+        server.listen(8)
+        return server
+
+    def serve_forever(self, server: Optional[socket.socket] = None) -> None:
+        """处理控制请求直到 shutdown()
+
+        Args:
+            server: 已由 bind() 创建的监听套接字，缺省在此创建
+        """
+        server = server or self.bind()
+        if self.monitor:
+            threading.Thread(target=self._run_monitor, daemon=True, name="monitor").start()
+        self.logger.info(f"守护进程已启动: {self.address}")
+        with server:
+            while not self._stopped.is_set():
+                try:
+                    conn, _ = server.accept()
+                except OSError as e:
+                    self.logger.warning(f"控制连接失败: {e}")
+                    continue
+                with conn:
+                    if not self._stopped.is_set():
+                        self.serve_connection(conn)
+        if USE_UNIX_SOCKET:
+            try:
+                os.remove(self.address)
+            except OSError:
+                pass
+
+    def shutdown(self) -> None:
+        """停止 serve_forever()，用一次空连接唤醒阻塞中的 accept()"""
+        self._stopped.set()
+        if self._engine is not None:
+            self._engine.stop()
+        try:
+            _connect()[0].close()
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def serve_connection(self, conn: socket.socket) -> None:
+        """处理一个控制连接上的单条请求"""
+        try:
+            conn.settimeout(REQUEST_TIMEOUT)
+            message = _receive(conn)
+            if not USE_UNIX_SOCKET and not hmac.compare_digest(
+                    str(message.get("token", "")), self.token):
+                self.logger.warning("控制请求令牌无效，已拒绝")
+                _send(conn, {"ok": False, "error": "令牌无效", "type": "PermissionError"})
+                return
+            cmd = str(message.get("cmd", ""))
+            self.logger.debug(f"控制命令: {cmd}")
+            conn.settimeout(REPLY_TIMEOUT)
+            _send(conn, self.handle(cmd))
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"控制请求无效: {type(e).__name__}: {e}")
+
+    def _run_monitor(self) -> None:
+        """在后台线程以无界面方式运行监控核心，与控制通道共用门户客户端"""
+        import config
+        import monitor
+
+        try:
+            settings = config.load()
+        except (OSError, config.ConfigError) as e:
+            self.logger.warning(f"监控循环不可用: {e}")
+            return
+        self._engine = mon = monitor.Monitor(self.handler, settings)
+        mon.start()
+        try:
+            mon.run()
+        finally:
+            mon.close()
@@ -0,0 +1,132 @@
+# encoding = utf-8
+# history
+"""按天分桶的离线历史
+
+每天一个定长 deque，追加与过期均为 O(1)，超过保留天数的桶整体丢弃，
+内存占用上限为 retention_days * per_day 条记录。
+可选持久化到 SQLite，重启后载入保留期内的记录（仅此时导入 sqlite3）。
+"""
+import time
+from collections import OrderedDict, deque
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Iterator, Optional
+
+if TYPE_CHECKING:
+    import sqlite3
+
+DEFAULT_RETENTION_DAYS: int = 7
+DEFAULT_PER_DAY: int = 512
+
+
+class OutageRecord:
+    """一次离线
+
+    Attributes:
+        start: 判定离线的时间戳
+        end: 恢复在线的时间戳，尚未恢复为None
+        cause: 离线原因/处置方式(如 login、relogin、backoff、manual)
+        recovery: 执行恢复操作累计耗时(秒)
+    """
+    __slots__ = ("start", "end", "cause", "recovery")
+
+    def __init__(self, start: float, cause: str, end: Optional[float] = None,
+                 recovery: float = 0.0) -> None:
+        self.start = start
+        self.end = end
+        self.cause = cause
+        self.recovery = recovery
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+    def __str__(self) -> str:
+        started = datetime.fromtimestamp(self.start).strftime("%H:%M:%S")
+        if self.duration is None:
+            return f"{started} {self.cause} (未恢复)"
+        return f"{started} {self.cause} 离线{self.duration:.1f}s 恢复操作{self.recovery:.1f}s"
+
+
+class OutageHistory:
+    """离线历史存储"""
+
+    def __init__(self, retention_days: int = DEFAULT_RETENTION_DAYS,
+                 per_day: int = DEFAULT_PER_DAY, db_path: Optional[str] = None) -> None:
+        """
+        Args:
+            retention_days: 保留天数(含今天)
+            per_day: 每天最多保留的记录数，超出时丢弃当天最早的记录
+            db_path: SQLite 文件路径，为 None 时只保存在内存中
+        """
+        self.retention_days = retention_days
+        self.per_day = per_day
+        self.days: OrderedDict[date, deque[OutageRecord]] = OrderedDict()
+        self.db: "Optional[sqlite3.Connection]" = None
+        if db_path:
+            import sqlite3
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS outages "
+                "(start REAL PRIMARY KEY, end REAL, cause TEXT, recovery REAL)"
+            )
+            self._load()
+
+    def open(self, cause: str, start: Optional[float] = None) -> OutageRecord:
+        """记录一次新的离线
+
+        Returns:
+            OutageRecord: 新记录，恢复后传给 close()
+        """
+        record = OutageRecord(time.time() if start is None else start, cause)
+        self._append(record)
+        return record
+
+    def close(self, record: OutageRecord, end: Optional[float] = None) -> None:
+        """标记离线已恢复并持久化"""
+        record.end = time.time() if end is None else end
+        if self.db is not None:
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO outages VALUES (?, ?, ?, ?)",
+                    (record.start, record.end, record.cause, record.recovery),
+                )
+                self.db.execute(
+                    "DELETE FROM outages WHERE start < ?", (self._cutoff_timestamp(),))
+
+    def today(self) -> Iterator[OutageRecord]:
+        self._expire(date.today())
+        return iter(self.days.get(date.today(), ()))
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.days.values())
+
+    def _append(self, record: OutageRecord) -> None:
+        day = date.fromtimestamp(record.start)
+        self._expire(day)
+        bucket = self.days.get(day)
+        if bucket is None:
+            bucket = self.days[day] = deque(maxlen=self.per_day)
+        bucket.append(record)
+
+    def _expire(self, today: date) -> None:
+        oldest = today - timedelta(days=self.retention_days - 1)
+        while self.days and next(iter(self.days)) < oldest:
+            self.days.popitem(last=False)
+
+    def _cutoff_timestamp(self) -> float:
+        oldest = date.today() - timedelta(days=self.retention_days - 1)
+        return datetime.combine(oldest, datetime.min.time()).timestamp()
+
+    def _load(self) -> None:
+        assert self.db is not None
+        rows = self.db.execute(
+            "SELECT start, end, cause, recovery FROM outages WHERE start >= ? ORDER BY start",
+            (self._cutoff_timestamp(),),
+        )
+        for start, end, cause, recovery in rows:
+            self._append(OutageRecord(start, cause, end, recovery))
+
+    def shutdown(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
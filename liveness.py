@@ -0,0 +1,148 @@
+# encoding = utf-8
+# liveness
+"""被动存活判断：入站流量持续时跳过主动探测
+
+正在下载时网络显然是通的，没必要每轮再发起一次探测。每轮读取一次网卡计数器，
+与上一轮相比入站速率不低于 passive_min_rate(字节/秒)时，再隔 CONFIRM_WINDOW 秒读一次，
+确认此刻仍在收包(整轮平均可能来自中途已经停滞的下载)，两者都满足则这一轮视为在线、
+不做主动探测；流量一旦停滞，同一轮立即改做主动探测，判定断线的速度与没有被动判断时相同。
+空闲时第一次比较就不满足，不会多等。
+
+局域网里的广播、校内服务的流量在未登录时也会出现，所以：
+    - 速率阈值用来排除零星的广播与后台流量
+    - 距上次主动探测超过 MAX_SKIP 秒时无论流量如何都主动探测一次
+
+计数器读取是可替换的：Monitor 接受任意返回 Counters 的可调用对象，
+缺省在 Linux 上读取 /proc/net/dev，其他系统上不做被动判断。
+"""
+import os
+import time
+from typing import Callable, NamedTuple, Optional
+
+PROC_NET_DEV = "/proc/net/dev"
+DEFAULT_MIN_RATE: float = 32 * 1024  # 字节/秒
+MAX_SKIP: float = 60.0  # 最长连续跳过主动探测的时间(秒)
+CONFIRM_WINDOW: float = 0.2  # 确认当前仍在收包的采样间隔(秒)
+# 本机内部流量不代表外网可达
+VIRTUAL_PREFIXES = ("lo", "docker", "veth", "br-", "virbr")
+
+
+class Counters(NamedTuple):
+    rx_bytes: int
+    rx_packets: int
+    tx_bytes: int
+    tx_packets: int
+
+
+CounterReader = Callable[[], Optional[Counters]]
+
+
+class ProcNetDevReader:
+    """汇总 /proc/net/dev 中物理网卡的计数器"""
+
+    def __init__(self, path: str = PROC_NET_DEV,
+                 exclude: tuple[str, ...] = VIRTUAL_PREFIXES) -> None:
+        """
+        Args:
+            path: 计数器文件
+            exclude: 不计入的网卡名前缀
+        """
+        self.path = path
+        self.exclude = exclude
+
+    def __call__(self) -> Optional[Counters]:
+        """
+        Returns:
+            Optional[Counters]: 各网卡之和，文件不可读时为None
+        """
+        try:
+            with open(self.path, encoding="ascii") as f:
+                lines = f.readlines()[2:]  # 两行表头
+        except OSError:
+            return None
+        rx_bytes = rx_packets = tx_bytes = tx_packets = 0
+        for line in lines:
+            name, _, data = line.partition(":")
+            fields = data.split()
+            if len(fields) < 10 or name.strip().startswith(self.exclude):
+                continue
+            rx_bytes += int(fields[0])
+            rx_packets += int(fields[1])
+            tx_bytes += int(fields[8])
+            tx_packets += int(fields[9])
+        return Counters(rx_bytes, rx_packets, tx_bytes, tx_packets)
+
+    def __repr__(self) -> str:
+        return f"ProcNetDevReader({self.path!r})"
+
+
+def default_reader() -> Optional[CounterReader]:
+    """当前系统可用的计数器读取，没有时为None"""
+    return ProcNetDevReader() if os.access(PROC_NET_DEV, os.R_OK) else None
+
+
+class PassiveLiveness:
+    """根据相邻两次计数器判断入站流量是否仍在持续"""
+
+    def __init__(self, reader: CounterReader, min_rate: float = DEFAULT_MIN_RATE,
+                 max_skip: float = MAX_SKIP, window: float = CONFIRM_WINDOW,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], object] = time.sleep) -> None:
+        """
+        Args:
+            reader: 计数器读取
+            min_rate: 视为持续的最低入站速率(字节/秒)
+            max_skip: 最长连续跳过主动探测的时间(秒)
+            window: 确认当前仍在收包的采样间隔(秒)
+            clock: 单调时钟，测试时可替换
+            sleep: 等待函数，测试时可替换
+        """
+        self.reader = reader
+        self.min_rate = min_rate
+        self.max_skip = max_skip
+        self.window = window
+        self.clock = clock
+        self.sleep = sleep
+        self.last: Optional[tuple[float, Counters]] = None
+        self.last_probe = clock()
+
+    def check(self) -> Optional[float]:
+        """读取一次计数器，每轮调用一次
+
+        Returns:
+            Optional[float]: 可以跳过主动探测时为入站速率(字节/秒)，否则为None
+        """
+        previous, current = self.last, self._sample()
+        self.last = current
+        if current is None or previous is None or current[0] - self.last_probe >= self.max_skip:
+            return None
+        if self._rate(previous, current) < self.min_rate:
+            return None
+        self.sleep(self.window)
+        self.last = confirm = self._sample()
+        if confirm is None:
+            return None
+        rate = self._rate(current, confirm)
+        return rate if rate >= self.min_rate else None
+
+    def _sample(self) -> Optional[tuple[float, Counters]]:
+        counters = self.reader()
+        return (self.clock(), counters) if counters is not None else None
+
+    @staticmethod
+    def _rate(before: tuple[float, Counters], after: tuple[float, Counters]) -> float:
+        """入站速率(字节/秒)，期间没有收到数据包时为0"""
+        elapsed = after[0] - before[0]
+        received = after[1].rx_bytes - before[1].rx_bytes
+        packets = after[1].rx_packets - before[1].rx_packets
+        # 计数器回绕或网卡重建时差值为负
+        if elapsed <= 0 or received < 0 or packets <= 0:
+            return 0.0
+        return received / elapsed
+
+    def probed(self) -> None:
+        """记录一次主动探测"""
+        self.last_probe = self.clock()
+
+    def __repr__(self) -> str:
+        return f"PassiveLiveness({self.reader!r}, min_rate={self.min_rate:g})"
@@ -1,13 +1,161 @@
+"""日志系统
+
+日志器只挂一个 QueueHandler，调用方线程只做一次入队；
+控制台与文件的实际写入在 QueueListener 的后台线程中完成，
+不会在探测循环里阻塞在磁盘或控制台 I/O 上。
+
+    - 队列有界：超过 DEBUG_WATERMARK 时丢弃 DEBUG，队列满时丢弃 INFO，
+      WARNING 及以上最多等待 WARNING_PUT_TIMEOUT 秒；丢弃数量会定期汇总输出
+    - 带 extra={"collapse": key} 的记录按 key 折叠：每个窗口内只输出第一条，
+      窗口结束时输出 “<首条> ×N (最近Xs，最后一条: ...)” 的汇总
+"""
+import atexit
 import logging
 import os
-import sys
+import queue
+import threading
 import time
-from logging.handlers import TimedRotatingFileHandler
-
-os.chdir(sys.path[0])
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Optional
 
 # Configuration constants
 LOG_RETENTION_DAYS: int = 7
+# 日志目录固定在脚本所在文件夹，导入本模块不再改变工作目录
+LOG_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+LOG_QUEUE_SIZE: int = 4096
+DEBUG_WATERMARK: float = 0.5  # 队列占用超过该比例时丢弃 DEBUG
+WARNING_PUT_TIMEOUT: float = 0.1
+COLLAPSE_WINDOW: float = 3600.0  # 折叠窗口(秒)
+FLUSH_TIMEOUT: float = 0.5
+
+
+class BoundedQueueHandler(QueueHandler):
+    """有界队列的入队端，过载时按级别丢弃
+
+    Attributes:
+        dropped: 级别名 -> 自上次汇总以来丢弃的条数
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped: dict[str, int] = {}
+        self._watermark = int(log_queue.maxsize * DEBUG_WATERMARK)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        log_queue: "queue.Queue[logging.LogRecord]" = self.queue  # type: ignore[assignment]
+        try:
+            if record.levelno >= logging.WARNING:
+                log_queue.put(record, timeout=WARNING_PUT_TIMEOUT)
+                return
+            if record.levelno < logging.INFO and log_queue.qsize() >= self._watermark:
+                raise queue.Full
+            log_queue.put_nowait(record)
+        except queue.Full:
+            # 多线程下计数可能略有出入，只用于汇总提示
+            self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+    def take_dropped(self) -> dict[str, int]:
+        dropped, self.dropped = self.dropped, {}
+        return dropped
+
+
+class _Collapsed:
+    __slots__ = ("first", "last", "count", "since")
+
+    def __init__(self, record: logging.LogRecord, since: float) -> None:
+        self.first = record
+        self.last = record
+        self.count = 0  # 被折叠(未输出)的条数
+        self.since = since
+
+
+class CollapsingListener(QueueListener):
+    """在后台线程写出日志，折叠重复记录并汇总丢弃数量"""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]", *handlers: logging.Handler,
+                 source: Optional[BoundedQueueHandler] = None,
+                 window: float = COLLAPSE_WINDOW) -> None:
+        """
+        Args:
+            log_queue: 与 BoundedQueueHandler 共用的队列
+            handlers: 实际写出的处理器，按各自级别过滤
+            source: 入队端，用于读取丢弃计数
+            window: 折叠窗口(秒)
+        """
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.source = source
+        self.window = window
+        self.collapsed: dict[str, _Collapsed] = {}
+
+    def handle(self, record: logging.LogRecord) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        key: Optional[str] = getattr(record, "collapse", None)
+        # 折叠由调用方用 key 显式要求，不论级别：门户故障期间每轮都会出现的警告同样需要折叠，
+        # 第一条仍按原级别立即输出，汇总也使用该级别
+        if key is not None:
+            entry = self.collapsed.get(key)
+            if entry is not None:
+                entry.last = record
+                entry.count += 1
+                return
+            self.collapsed[key] = _Collapsed(record, now)
+        if self.source is not None and self.source.dropped:
+            self._report_dropped()
+        super().handle(record)
+
+    def flush_summaries(self) -> None:
+        """立即输出所有折叠汇总"""
+        self._expire(float("inf"))
+
+    def _expire(self, now: float) -> None:
+        for key, entry in list(self.collapsed.items()):
+            if now - entry.since < self.window:
+                continue
+            del self.collapsed[key]
+            if entry.count:
+                elapsed = min(now, time.monotonic()) - entry.since
+                self._emit(entry.first.levelno, f"{entry.first.getMessage()} ×{entry.count + 1} "
+                           f"(最近{elapsed:.0f}s，最后一条: {entry.last.getMessage()})", entry.first)
+
+    def _report_dropped(self) -> None:
+        assert self.source is not None
+        dropped = self.source.take_dropped()
+        if dropped:
+            self._emit(logging.WARNING, "日志队列过载，已丢弃 " + ", ".join(
+                f"{level} {n}条" for level, n in sorted(dropped.items())))
+
+    def _emit(self, level: int, msg: str, like: Optional[logging.LogRecord] = None) -> None:
+        record = logging.LogRecord(
+            "BitConnected", level, like.pathname if like else __file__,
+            like.lineno if like else 0, msg, None, None)
+        super().handle(record)
+
+    def enqueue_sentinel(self) -> None:
+        # 队列满时也要等到停止标记入队，不能丢弃
+        self.queue.put(self._sentinel)  # type: ignore[attr-defined]
+
+    def stop(self) -> None:
+        super().stop()
+        self.flush_summaries()
+        if self.source is not None and self.source.dropped:
+            self._report_dropped()
+
+
+_listener: Optional[CollapsingListener] = None
+
+
+def flush(timeout: float = FLUSH_TIMEOUT) -> None:
+    """等待队列中已有的日志写出，用于清屏或打印概况前
+
+    Args:
+        timeout: 最长等待时间(秒)
+    """
+    if _listener is None:
+        return
+    deadline = time.monotonic() + timeout
+    while not _listener.queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.005)
 
 
 def cleanup_old_logs(log_dir: str, retention_days: int) -> None:
@@ -41,9 +189,13 @@ def cleanup_old_logs(log_dir: str, retention_days: int) -> None:
 def setup_logger() -> logging.Logger:
     """初始化日志系统
 
+    旧日志清理在后台线程中进行，日志文件在第一次写入时才打开，
+    均不占用进程启动时间。控制台与文件处理器挂在后台的 CollapsingListener 上。
+
     Returns:
         logging.Logger: 配置好的日志器实例
     """
+    global _listener
     logger = logging.getLogger("BitConnected")
 
     if logger.handlers:
@@ -53,10 +205,13 @@ def setup_logger() -> logging.Logger:
     logger.setLevel(logging.DEBUG)
 
     # 确保日志目录存在
-    os.makedirs("logs", exist_ok=True)
+    os.makedirs(LOG_DIR, exist_ok=True)
     
     # Clean up old logs
-    cleanup_old_logs("logs", LOG_RETENTION_DAYS)
+    threading.Thread(
+        target=cleanup_old_logs, args=(LOG_DIR, LOG_RETENTION_DAYS),
+        daemon=True, name="log-cleanup"
+    ).start()
 
     # 控制台输出 INFO 及以上级别
     console_handler = logging.StreamHandler()
@@ -68,17 +223,22 @@ def setup_logger() -> logging.Logger:
 
     # 文件输出 DEBUG 及以上级别
     file_handler = TimedRotatingFileHandler(
-        "logs/BitConnected.log",
+        os.path.join(LOG_DIR, "BitConnected.log"),
         when="midnight",
         backupCount=7,
-        encoding="utf-8"
+        encoding="utf-8",
+        delay=True
     )
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(logging.Formatter(
         "%(asctime)s | %(levelname)8s | %(filename)20s | %(message)s"
     ))
 
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = BoundedQueueHandler(log_queue)
+    _listener = CollapsingListener(log_queue, console_handler, file_handler, source=queue_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    logger.addHandler(queue_handler)
 
     return logger
@@ -0,0 +1,215 @@
+# encoding = utf-8
+# metrics
+"""恢复延迟指标
+
+以单调时钟记录探测、门户请求、恢复各步骤以及检测/恢复耗时，
+聚合为直方图与计数器，并可通过本地 HTTP 端口导出：
+
+    GET /metrics        Prometheus 文本格式
+    GET /metrics.json   JSON
+
+在 BITer.json 中设置 metrics_port 启用（缺省不开启），
+http.server 只在启用导出时导入。
+"""
+import json
+import threading
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0
+)
+
+Labels = tuple[tuple[str, str], ...]
+
+HELP: dict[str, str] = {
+    "bit_probe_seconds": "Connectivity probe latency",
+    "bit_portal_request_seconds": "Portal request latency by step",
+    "bit_recovery_step_seconds": "Recovery state machine step duration",
+    "bit_time_to_detect_seconds": "Time from last successful probe to offline verdict",
+    "bit_time_to_recover_seconds": "Time from offline verdict to next successful probe",
+    "bit_probe_total": "Probe results",
+    "bit_recovery_total": "Recovery outcomes",
+    "bit_prearmed_login_total": "Logins sent with pre-armed parameters",
+    "bit_portal_breaker_state": "Portal circuit breaker state (0 closed, 1 half-open, 2 open)",
+    "bit_portal_breaker_transitions_total": "Portal circuit breaker state changes",
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> list[int]:
+        total = 0
+        result: list[int] = []
+        for n in self.counts:
+            total += n
+            result.append(total)
+        return result
+
+
+class Registry:
+    """线程安全的指标集合"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.gauges: dict[str, dict[Labels, float]] = {}
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.gauges.setdefault(name, {})[key] = value
+
+    def to_prometheus(self) -> str:
+        """导出为 Prometheus 文本格式
+
+        Returns:
+            str: 指标文本
+        """
+        lines: list[str] = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self.gauges.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, hists in sorted(self.histograms.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, hist in sorted(hists.items()):
+                    for bound, count in zip(hist.buckets, hist.cumulative()):
+                        lines.append(f"{name}_bucket{_format_labels(labels, le=f'{bound:g}')} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {hist.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {hist.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict[str, Any]:
+        """导出为可 JSON 序列化的字典
+
+        Returns:
+            dict[str, Any]: {"counters": ..., "gauges": ..., "histograms": ...}
+        """
+        with self.lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(labels), "value": value} for labels, value in series.items()]
+                    for name, series in self.counters.items()
+                },
+                "gauges": {
+                    name: [{"labels": dict(labels), "value": value} for labels, value in series.items()]
+                    for name, series in self.gauges.items()
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(labels),
+                            "buckets": dict(zip((f"{b:g}" for b in hist.buckets), hist.cumulative())),
+                            "sum": hist.sum,
+                            "count": hist.count,
+                        }
+                        for labels, hist in hists.items()
+                    ]
+                    for name, hists in self.histograms.items()
+                },
+            }
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+REGISTRY = Registry()
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+gauge = REGISTRY.set
+
+
+def handler_class(registry: Registry = REGISTRY) -> "type[BaseHTTPRequestHandler]":
+    """创建导出指定指标集合的请求处理类
+
+    Returns:
+        type[BaseHTTPRequestHandler]: 请求处理类
+    """
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args: object) -> None:
+            return
+
+        def do_GET(self) -> None:
+            if self.path == "/metrics":
+                body = registry.to_prometheus()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                body = json.dumps(registry.to_dict(), ensure_ascii=False)
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return MetricsHandler
+
+
+def serve(port: int, registry: Registry = REGISTRY) -> "ThreadingHTTPServer":
+    """在后台线程中启动指标导出端口(仅监听本机)
+
+    Args:
+        port: 监听端口
+        registry: 导出的指标集合
+
+    Returns:
+        ThreadingHTTPServer: 已启动的服务器
+    """
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler_class(registry))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
@@ -0,0 +1,265 @@
+# encoding = utf-8
+# mock_portal
+"""本地模拟的 SRUN 门户，用于离线测试与基准测试
+
+实现 /、ac_id 跳转页、/cgi-bin/get_challenge、/cgi-bin/srun_portal
+（校验 chksum 与 xencode/fkbase64 生成的 {SRBX1} info）
+以及纯文本/JSONP 两种形式的 /cgi-bin/rad_user_info。
+可注入延迟(全局或按路径)、抖动、HTTP 500 与直接断开连接。
+
+用法：
+    python mock_portal.py --port 8055 --latency 0.05 --error-rate 0.01 --account user:pass
+然后把 PortalClient 的 base 指向 http://127.0.0.1:8055
+"""
+import argparse
+import hmac
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+import AIO_login
+
+PORTAL_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>BIT-Web</title></head>
+<body>
+<form id="login-form">
+<input type="hidden" name="ac_id" id="ac_id" value="{ac_id}">
+<input type="hidden" name="user_ip" id="user_ip" value="{ip}">
+<input type="text" name="username" id="username">
+<input type="password" name="password" id="password">
+</form>
+{padding}
+</body>
+</html>
+"""
+
+
+class PortalState:
+    """模拟门户的账号、在线表、challenge表与故障注入设置"""
+
+    def __init__(self, ac_id: str = "1", latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, drop_rate: float = 0.0,
+                 accounts: Optional[dict[str, str]] = None,
+                 challenge_ttl: float = 60.0, seed: Optional[int] = None,
+                 path_latency: Optional[dict[str, float]] = None) -> None:
+        """
+        Args:
+            latency: 每个请求的固定延迟(秒)
+            path_latency: 路径 -> 该路径额外的固定延迟(秒)，用于模拟个别接口变慢
+            jitter: 在固定延迟上叠加的 [0, jitter) 随机延迟(秒)
+            error_rate: 返回 HTTP 500 的概率
+            drop_rate: 不回应直接断开连接的概率
+            accounts: 用户名 -> 密码，为 None 时接受任意账号（仍校验 chksum）
+            challenge_ttl: challenge 有效期(秒)
+        """
+        self.ac_id = ac_id
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.accounts = accounts
+        self.challenge_ttl = challenge_ttl
+        self.path_latency = path_latency or {}
+        self.random = random.Random(seed)
+        self.online: dict[str, str] = {}  # ip -> username
+        self.usage: dict[str, int] = {}  # ip -> 本月已用字节
+        self.challenges: dict[str, tuple[str, float]] = {}  # ip -> (challenge, 发放时间)
+        self.requests: dict[str, int] = {}  # path -> 请求计数
+        self.lock = threading.Lock()
+
+
+class PortalHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # 头部与正文分两次写出，避免 keep-alive 下的延迟确认
+    state: PortalState
+
+    def log_message(self, format: str, *args: object) -> None:
+        return
+
+    def _reply(self, body: str, status: int = 200,
+               headers: Optional[dict[str, str]] = None) -> None:
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    @staticmethod
+    def _jsonp(callback: str, payload: dict[str, object]) -> str:
+        return f"{callback}({json.dumps(payload)})"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        ip = query.get("ip", self.client_address[0])
+        callback = query.get("callback", "jsonp")
+        state = self.state
+
+        with state.lock:
+            state.requests[url.path] = state.requests.get(url.path, 0) + 1
+            roll = state.random.random()
+            delay = state.latency + state.path_latency.get(url.path, 0.0) + state.random.random() * state.jitter
+        if delay:
+            time.sleep(delay)
+        if roll < state.drop_rate:
+            self.close_connection = True
+            return
+        if roll < state.drop_rate + state.error_rate:
+            self._reply("internal error", 500)
+            return
+
+        if url.path == "/":
+            self._reply("", 302, {"Location": f"/srun_portal_pc?ac_id={state.ac_id}&theme=bit"})
+
+        elif url.path == "/srun_portal_pc":
+            self._reply(PORTAL_PAGE.format(
+                ac_id=state.ac_id, ip=self.client_address[0], padding="<!-- -->" * 2048))
+
+        elif url.path == "/cgi-bin/get_challenge":
+            challenge = secrets.token_hex(32)
+            with state.lock:
+                state.challenges[ip] = (challenge, time.monotonic())
+            self._reply(self._jsonp(callback, {
+                "challenge": challenge, "client_ip": ip, "error": "ok"}))
+
+        elif url.path == "/cgi-bin/srun_portal":
+            self._reply(self._jsonp(callback, self.srun_portal(query, ip)))
+
+        elif url.path == "/cgi-bin/rad_user_info":
+            with state.lock:
+                username = state.online.get(ip)
+                used = state.usage.get(ip, 0)
+            if username is None:
+                self._reply("not_online_error")
+            elif "callback" in query:
+                self._reply(self._jsonp(callback, {
+                    "error": "ok", "user_name": username, "online_ip": ip,
+                    "sum_bytes": used, "sum_seconds": 0, "remain_bytes": 0,
+                    "user_balance": 0, "wallet_balance": 0}))
+            else:
+                self._reply(f"{username},0,0,{used},0,0,0,0,{ip}")
+
+        else:
+            self._reply("not found", 404)
+
+    def srun_portal(self, query: dict[str, str], ip: str) -> dict[str, object]:
+        """校验并处理登录/登出请求
+
+        Returns:
+            dict[str, object]: 门户响应
+        """
+        state = self.state
+        username = query.get("username", "")
+        with state.lock:
+            token, issued_at = state.challenges.get(ip, ("", 0.0))
+            if not token or time.monotonic() - issued_at > state.challenge_ttl:
+                return {"error": "challenge_expire_error", "error_msg": "Challenge is expired.",
+                        "online_ip": ip}
+            if (error := self.verify(query, token)) is not None:
+                return {"error": "login_error", "error_msg": error, "online_ip": ip}
+
+            if query.get("action") == "login":
+                if ip in state.online:
+                    return {"error": "login_error", "error_msg": "E2620: You are already online.",
+                            "online_ip": ip}
+                state.online[ip] = username
+                return {"error": "ok", "suc_msg": "login_ok", "online_ip": ip}
+            if query.get("action") == "logout":
+                state.online.pop(ip, None)
+                return {"error": "ok", "suc_msg": "logout_ok", "online_ip": ip}
+        return {"error": "login_error", "error_msg": "Action is invalid.", "online_ip": ip}
+
+    def verify(self, query: dict[str, str], token: str) -> Optional[str]:
+        """按客户端 _make_params 的算法校验请求
+
+        Returns:
+            Optional[str]: 错误信息，校验通过为None
+        """
+        username, ac_id, ip = query.get("username", ""), query.get("ac_id", ""), query.get("ip", "")
+        hmd5 = hmac.new(token.encode(), b"", "MD5").hexdigest()
+        if query.get("password") != "{MD5}" + hmd5:
+            return "Password is error."
+
+        info = query.get("info", "")
+        chksum = sha1(
+            "{0}{1}{0}{2}{0}{3}{0}{4}{0}{5}{0}{6}{0}{7}".format(
+                token, username, hmd5, ac_id, ip, query.get("n", ""), query.get("type", ""), info
+            ).encode()
+        ).hexdigest()
+        if query.get("chksum") != chksum:
+            return "sign_error"
+
+        accounts = self.state.accounts
+        if accounts is not None:
+            if username not in accounts:
+                return "User not found."
+            data = json.dumps({
+                "username": username, "password": accounts[username],
+                "acid": ac_id, "ip": ip, "enc_ver": "srun_bx1",
+            }, separators=(",", ":"))
+            if info != "{SRBX1}" + AIO_login.fkbase64(AIO_login.xencode(data, token)):
+                return "Password is error."
+        return None
+
+
+class MockPortalServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request: object, client_address: object) -> None:
+        # 客户端流式读取首页后提前断开属于正常情况
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)  # type: ignore[arg-type]
+
+
+def serve(port: int = 0, state: Optional[PortalState] = None) -> MockPortalServer:
+    """在后台线程中启动模拟门户
+
+    Args:
+        port: 监听端口，0 表示随机端口
+        state: 门户状态，缺省新建
+
+    Returns:
+        MockPortalServer: 已启动的服务器，server_address 为实际地址
+    """
+    handler = type("BoundPortalHandler", (PortalHandler,), {"state": state or PortalState()})
+    server = MockPortalServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock SRUN portal")
+    parser.add_argument("--port", type=int, default=8055)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的延迟(秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外随机延迟上限(秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回HTTP 500的概率")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="直接断开连接的概率")
+    parser.add_argument("--account", action="append", default=[],
+                        help="user:password，可重复；不给出时接受任意账号")
+    args = parser.parse_args()
+
+    accounts = dict(a.split(":", 1) for a in args.account) if args.account else None
+    server = serve(args.port, PortalState(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        drop_rate=args.drop_rate, accounts=accounts))
+    print(f"Mock portal on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+# encoding = utf-8
+# monitor
+"""监控核心：探测、诊断与恢复，与平台和界面无关
+
+Monitor 持有探测器、离线历史、统计、流量采样与网络变化事件源。每次 step() 完成一轮
+“重新加载配置 → 探测 → 诊断/恢复”，并返回下一轮之前应等待多久，
+前端调用 sleep() 等待：
+
+    - 控制台(Network_Alive.py)：Ctrl+C 强制重登，定期清屏打印概况
+    - 无界面(python monitor.py)：收到 SIGTERM/SIGINT 时 stop()，只写日志；
+      守护进程的 --monitor 也以这种方式在后台线程中运行
+
+网络变化(见 netevents.py)会提前结束等待，下一轮立即探测并查询门户；
+没有变化时在线探测间隔从 ping_interval 逐轮加倍，直到 ping_interval_max。
+入站流量持续时(见 liveness.py)这一轮不做主动探测。
+
+本模块不导入 msvcrt 等平台相关模块，也不读取终端输入，可在 Linux 网关上常驻。
+
+用法：
+    python monitor.py [--config /path/to/BITer.json]
+"""
+import argparse
+import sys
+import threading
+import time
+from enum import Enum
+from typing import Callable, NamedTuple, Optional
+from urllib.parse import urlparse
+
+import AIO_login
+import breaker
+import config
+import history
+import liveness
+import log
+import metrics
+import netevents
+import probe
+import recovery
+import traffic
+
+logger = log.setup_logger()
+
+PROBE_SETTINGS = ("ping_target", "probe_type", "probe_timeout", "probe_quorum")
+
+# 分级检测：门户状态查询超时、门户显示在线时连续失败多少次才强制重登、退避上限
+PORTAL_CHECK_TIMEOUT: float = 1.0
+RELOGIN_AFTER_FAILURES: int = 3
+MAX_BACKOFF: int = 60
+SUMMARY_EVERY: int = 5  # 每多少次检测调用一次 on_summary
+EVENT_SETTLE: float = 0.5  # 收到网络变化后等待后续通知的时间(秒)
+PASSIVE_TARGET = "passive"  # 被动判断在线时 ProbeResult 的 target
+
+
+class Recovery(Enum):
+    """探测失败后的处置方式"""
+    LOGIN = "login"  # 门户显示已掉线，直接登录
+    RELOGIN = "relogin"  # 门户显示在线但持续不通，登出后重登
+    BACKOFF = "backoff"  # 上游或门户故障，重登无济于事，等待后再探测
+
+
+class Pause(NamedTuple):
+    seconds: float
+    reason: str  # online: 在线时的探测间隔；backoff: 判定为暂不重登后的退避
+
+
+class Monitor:
+    """监控循环的状态与单轮逻辑
+
+    Attributes:
+        statistic: 失败/成功/强制/跳过 的次数
+        outages: 离线历史
+        on_summary: 每 SUMMARY_EVERY 次检测调用一次，控制台据此刷新概况
+    """
+
+    def __init__(self, handler: AIO_login.Operation, settings: config.Config,
+                 config_path: Optional[str] = None, traffic_path: Optional[str] = None,
+                 events: Optional[netevents.EventSource] = None,
+                 counters: Optional[liveness.CounterReader] = None) -> None:
+        """
+        Args:
+            handler: 登录/登出使用的 Operation
+            settings: 启动时的配置
+            config_path: 监视的配置文件，缺省为 config.CONFIG_PATH
+            traffic_path: 流量记录文件，缺省为 traffic.DEFAULT_STORE
+            events: 网络变化事件源，缺省在 start() 时按 net_events 创建
+            counters: 网卡计数器读取，缺省见 liveness.default_reader()
+        """
+        self.handler = handler
+        self.settings = settings
+        self.traffic_path = traffic_path or traffic.DEFAULT_STORE
+        self.statistic = {'失败': 0, '成功': 0, '强制': 0, '跳过': 0}
+        self.outages = history.OutageHistory(db_path=settings.history_db)
+        self.outage: Optional[history.OutageRecord] = None  # 进行中的离线
+        self.failure_streak = 0  # 连续探测失败次数，仅在探测成功时清零
+        self.relogin_tried = False  # 本次离线是否已强制重登
+        self.last_ok_at = time.monotonic()  # 上次探测成功的时刻
+        self.offline_since: Optional[float] = None  # 本次离线被判定的时刻
+        self.prober = probe.create_prober(
+            settings.probe_type, settings.ping_target, settings.probe_timeout, settings.probe_quorum)
+        logger.debug(f"Probe: {self.prober!r}")
+        self.watcher = config.ConfigWatcher(config_path, current=settings)
+        self.sampler: Optional[traffic.TrafficSampler] = None
+        self.on_summary: Optional[Callable[["Monitor"], None]] = None
+        self.events = events
+        self.pending: list[netevents.NetworkEvent] = []  # 尚未处理的网络变化
+        self.quiet_rounds = 0  # 连续没有网络变化的在线轮数，决定放宽后的探测间隔
+        self.wake = threading.Event()  # 网络变化或 stop() 时设置，结束 sleep()
+        self.stopped = threading.Event()
+        self._events_lock = threading.Lock()
+        self.counters = counters
+        self.passive: Optional[liveness.PassiveLiveness] = None
+        self.set_passive_rate(settings.passive_min_rate)
+
+    @property
+    def checks(self) -> int:
+        return self.statistic["失败"] + self.statistic["成功"] + self.statistic["强制"]
+
+    def start(self) -> None:
+        """启动指标导出、流量采样与网络变化通知"""
+        if self.settings.metrics_port:
+            metrics.serve(self.settings.metrics_port)
+            logger.info(f"指标导出: http://127.0.0.1:{self.settings.metrics_port}/metrics")
+        self.set_traffic_interval(self.settings.traffic_interval)
+        if self.events is None:
+            host = urlparse(self.handler.client.base).hostname or AIO_login.API_BASE
+            try:
+                self.events = netevents.create_source(self.settings.net_events, host)
+            except ValueError as e:
+                logger.warning(f"{e}，不监听网络变化")
+        if self.events is not None:
+            self.events.start(self.notify)
+            logger.info(f"网络变化通知: {self.events!r}")
+
+    def close(self) -> None:
+        """停止采样与事件源并释放探测器与历史数据库"""
+        self.set_traffic_interval(0)
+        if self.events is not None:
+            self.events.close()
+        self.prober.close()
+        self.outages.shutdown()
+
+    def notify(self, event: netevents.NetworkEvent) -> None:
+        """事件源的回调，可在任意线程中调用"""
+        with self._events_lock:
+            self.pending.append(event)
+            self.wake.set()
+
+    def stop(self) -> None:
+        """结束 run()，可在任意线程或信号处理中调用"""
+        self.stopped.set()
+        self.wake.set()
+
+    def sleep(self, seconds: float) -> bool:
+        """等待下一轮，网络变化或 stop() 时提前返回
+
+        Args:
+            seconds: 最长等待(秒)
+
+        Returns:
+            bool: 是否因网络变化提前返回
+        """
+        if not self.wake.wait(seconds) or self.stopped.is_set():
+            return False
+        # 一次插拔或续租通常连续产生多条通知，稍等片刻一并处理
+        self.stopped.wait(EVENT_SETTLE)
+        return True
+
+    def run(self) -> None:
+        """无界面循环，直到 stop()"""
+        while not self.stopped.is_set():
+            try:
+                pause = self.step()
+            except Exception as e:
+                logger.exception(f"An exception occurred: {e}")
+                raise
+            self.sleep(pause.seconds)
+
+    def _take_events(self) -> list[netevents.NetworkEvent]:
+        with self._events_lock:
+            events, self.pending = self.pending, []
+            self.wake.clear()
+        return events
+
+    def step(self) -> Pause:
+        """执行一轮探测，必要时诊断并恢复
+
+        Returns:
+            Pause: 下一轮之前应等待的时间
+        """
+        self.reload_config()
+        events = self._take_events()
+        if events:
+            self.quiet_rounds = 0
+            metrics.inc("bit_net_events_total", len(events))
+            logger.info("网络变化，立即探测: " + "; ".join(e.detail for e in events),
+                        extra={"collapse": "netevents"})
+        rate = self.passive.check() if self.passive is not None and not events else None
+        if rate is not None:
+            result = probe.ProbeResult(True, 0.0, PASSIVE_TARGET)
+            metrics.inc("bit_probe_total", result=PASSIVE_TARGET)
+            logger.info(f"入站流量{rate / 1024:.0f}KiB/s，跳过主动探测", extra={"collapse": "passive"})
+        else:
+            result = self._probe()
+
+        if not result.ok:
+            pause = self._offline(result)
+        elif events and self._login_if_logged_out():
+            pause = Pause(0, "recovered")
+        else:
+            pause = self._online(result)
+        if self.on_summary is not None and self.checks % SUMMARY_EVERY == 0:
+            self.on_summary(self)
+        return pause
+
+    def _probe(self) -> probe.ProbeResult:
+        logger.info(f"正在探测 {self.prober.target}({self.settings.probe_type})",
+                    extra={"collapse": "probe"})
+        result = self.prober.probe()
+        if self.passive is not None:
+            self.passive.probed()
+        metrics.observe("bit_probe_seconds", result.latency)
+        metrics.inc("bit_probe_total", result="ok" if result.ok else "fail")
+
+        if isinstance(self.prober, probe.QuorumProbe):
+            logger.debug("各目标延迟: " + ", ".join(
+                f"{r.target}={r.latency * 1000:.0f}ms{'' if r.ok else '(失败)'}"
+                for r in self.prober.last_results.values()), extra={"collapse": "latency"})
+        return result
+
+    def _offline(self, result: probe.ProbeResult) -> Pause:
+        self.statistic['失败'] += 1
+        self.failure_streak += 1
+        self.quiet_rounds = 0
+        if self.offline_since is None:
+            self.offline_since = time.monotonic()
+            metrics.observe("bit_time_to_detect_seconds", self.offline_since - self.last_ok_at)
+        logger.warning(f"探测判定：离线({result.latency * 1000:.0f}ms, {result.error})")
+
+        verdict = self.diagnose()
+        if self.outage is None:
+            self.outage = self.outages.open(verdict.value)
+        elif verdict is not Recovery.BACKOFF:
+            self.outage.cause = verdict.value
+        recovery_start = time.monotonic()
+        match verdict:
+            case Recovery.LOGIN:
+                self.relogin(start=recovery.State.LOGIN)
+            case Recovery.RELOGIN:
+                self.relogin()
+                self.relogin_tried = True
+            case Recovery.BACKOFF:
+                self.statistic['跳过'] += 1
+                delay = self.backoff_delay()
+                logger.info(f"退避{delay}秒后重新探测")
+                return Pause(delay, "backoff")
+        self.outage.recovery += time.monotonic() - recovery_start
+        return Pause(0, "recovered")
+
+    def _online(self, result: probe.ProbeResult) -> Pause:
+        self.statistic['成功'] += 1
+        self.failure_streak = 0
+        self.relogin_tried = False
+        self.last_ok_at = time.monotonic()
+        if self.offline_since is not None:
+            metrics.observe("bit_time_to_recover_seconds", self.last_ok_at - self.offline_since)
+            logger.info(f"离线{self.last_ok_at - self.offline_since:.1f}秒后恢复")
+            self.offline_since = None
+        if self.outage is not None:
+            self.outages.close(self.outage)
+            self.outage = None
+        if result.target != PASSIVE_TARGET:
+            logger.info(f"探测判定：在线({result.latency * 1000:.0f}ms)", extra={"collapse": "online"})
+
+        # 趁在线时准备好登录参数，掉线后只需一次请求
+        self.handler.prearm()
+        interval = self.probe_interval()
+        self.quiet_rounds += 1
+        logger.info(f"休眠{interval}秒", extra={"collapse": "sleep"})
+        return Pause(interval, "online")
+
+    def probe_interval(self) -> int:
+        """在线时的探测间隔
+
+        有事件源时，网络变化会立即触发探测，每轮没有变化就把间隔加倍，
+        直到 ping_interval_max；没有事件源时固定为 ping_interval。
+
+        Returns:
+            int: 秒数
+        """
+        base, ceiling = self.settings.ping_interval, self.settings.ping_interval_max
+        if self.events is None or ceiling <= base:
+            return base
+        return min(base * 2 ** min(self.quiet_rounds, 16), ceiling)
+
+    def _login_if_logged_out(self) -> bool:
+        """网络变化后即使探测成功也查询门户：换了地址后门户上的会话可能已不属于本机
+
+        Returns:
+            bool: 门户显示已掉线并执行了登录
+        """
+        try:
+            is_logged_in, _ = AIO_login.get_user_info(
+                self.handler.client, timeout=PORTAL_CHECK_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"网络变化后查询门户失败: {type(e).__name__}: {e}")
+            return False
+        if is_logged_in:
+            return False
+        logger.info("网络变化后门户显示已掉线，直接登录")
+        self.relogin(start=recovery.State.LOGIN)
+        return True
+
+    def force_relogin(self) -> bool:
+        """用户要求的强制重登，计入统计
+
+        Returns:
+            bool: 是否恢复到在线状态
+        """
+        self.statistic['强制'] += 1
+        return self.relogin()
+
+    def diagnose(self) -> Recovery:
+        """探测失败后查询门户 rad_user_info 判断掉线原因。
+
+        每次离线至多强制重登一次，重登后仍不通则只退避，避免反复登出登录。
+
+        Returns:
+            Recovery: 应采取的处置方式
+        """
+        try:
+            is_logged_in, username = AIO_login.get_user_info(
+                self.handler.client, timeout=PORTAL_CHECK_TIMEOUT)
+        except breaker.PortalUnavailable as e:
+            logger.info(f"{e}，等待后重试", extra={"collapse": "breaker"})
+            return Recovery.BACKOFF
+        except Exception as e:
+            logger.warning(f"门户不可达({type(e).__name__})，等待后重试")
+            return Recovery.BACKOFF
+
+        if not is_logged_in:
+            logger.info("门户显示已掉线，直接登录")
+            return Recovery.LOGIN
+        if self.failure_streak >= RELOGIN_AFTER_FAILURES and not self.relogin_tried:
+            logger.info(f"门户显示{username}在线但已连续{self.failure_streak}次探测失败，强制重登")
+            return Recovery.RELOGIN
+        logger.info(f"门户显示{username}在线，判定为上游网络故障，暂不重登")
+        return Recovery.BACKOFF
+
+    def backoff_delay(self) -> int:
+        """计算退避等待时间(秒)，随连续失败次数指数增长。
+
+        Returns:
+            int: 等待秒数
+        """
+        return min(self.settings.ping_interval * 2 ** min(self.failure_streak, 16), MAX_BACKOFF)
+
+    def relogin(self, force_logout: bool = True,
+                start: recovery.State = recovery.State.DETECTED) -> bool:
+        """运行恢复状态机，条件满足即进入下一步，不再固定休眠。
+
+        Args:
+            force_logout: 门户显示在线时是否先登出再登录
+            start: 起始状态，已确认掉线时可从 LOGIN 开始
+
+        Returns:
+            bool: 是否恢复到在线状态
+        """
+        try:
+            machine = recovery.RecoveryMachine(self.handler)
+            state = machine.run(force_logout, start)
+        except KeyboardInterrupt:
+            logger.info("恢复期间用户中断，继续执行")
+            return False
+        except AIO_login.PortalTimeout as e:
+            logger.warning(f"恢复超时: {e}")
+            metrics.inc("bit_recovery_total", result=recovery.State.TIMEOUT.value)
+            return False
+        except Exception as e:
+            # 门户故障期间会反复出现，完整堆栈只写入调试日志
+            logger.warning(f"恢复执行失败: {type(e).__name__}: {e}", extra={"collapse": "relogin-error"})
+            logger.debug("恢复执行失败", exc_info=True)
+            return False
+        for step, seconds in machine.timings:
+            metrics.observe("bit_recovery_step_seconds", seconds, step=step.value)
+        metrics.inc("bit_recovery_total", result=state.value)
+        total = sum(t for _, t in machine.timings)
+        logger.info(f"恢复结果: {state.value}，耗时{total * 1000:.0f}ms")
+        return state is recovery.State.ONLINE
+
+    def set_passive_rate(self, rate: float) -> None:
+        """设置被动判断的速率阈值，0 或没有可用的计数器时关闭
+
+        Args:
+            rate: 视为流量持续的最低入站速率(字节/秒)
+        """
+        if rate <= 0:
+            self.passive = None
+        elif self.passive is not None:
+            self.passive.min_rate = rate
+        elif reader := self.counters or liveness.default_reader():
+            self.passive = liveness.PassiveLiveness(reader, rate)
+            logger.debug(f"被动判断: {self.passive!r}")
+
+    def set_traffic_interval(self, interval: float) -> None:
+        """按采样间隔启动、调整或停止流量采样，0 为停止
+
+        Args:
+            interval: 采样间隔(秒)
+        """
+        if interval <= 0:
+            if self.sampler is not None:
+                self.sampler.stop()
+                self.sampler = None
+        elif self.sampler is None:
+            self.sampler = traffic.TrafficSampler(
+                self.handler.client, traffic.TrafficStore(self.traffic_path), interval)
+            self.sampler.start()
+        else:
+            self.sampler.interval = interval
+
+    def reload_config(self) -> None:
+        """配置文件变化时应用新的探测与采样设置
+
+        只替换探测器，共享的门户客户端与其中的连接保持不变；
+        新配置无效时继续使用原配置，同一错误只报告一次。
+        """
+        settings, watcher = self.settings, self.watcher
+        previous_error = watcher.error
+        new = watcher.poll()
+        if watcher.error and watcher.error != previous_error:
+            logger.warning(f"配置修改无效，继续使用原配置: {watcher.error}")
+        if new is None:
+            return
+
+        if any(getattr(new, key) != getattr(settings, key) for key in PROBE_SETTINGS):
+            try:
+                replacement = probe.create_prober(
+                    new.probe_type, new.ping_target, new.probe_timeout, new.probe_quorum)
+            except ValueError as e:
+                logger.warning(f"探测设置无效，继续使用原探测器: {e}")
+                new = new._replace(**{key: getattr(settings, key) for key in PROBE_SETTINGS})
+            else:
+                self.prober.close()
+                self.prober = replacement
+                logger.info(f"已重新加载探测设置: {self.prober!r}")
+        if new.traffic_interval != settings.traffic_interval:
+            self.set_traffic_interval(new.traffic_interval)
+        if new.passive_min_rate != settings.passive_min_rate:
+            self.set_passive_rate(new.passive_min_rate)
+        for key in ("metrics_port", "history_db", "net_events"):
+            if getattr(new, key) != getattr(settings, key):
+                logger.info(f"{key} 的修改需要重启后生效")
+        self.settings = new
+
+
+def main() -> int:
+    """无界面入口，适合作为 systemd 服务运行"""
+    import signal
+
+    parser = argparse.ArgumentParser(description="无界面监控")
+    parser.add_argument("--config", help="配置文件路径，缺省为脚本所在目录的 BITer.json")
+    args = parser.parse_args()
+
+    path = args.config or config.CONFIG_PATH
+    try:
+        settings = config.load(path)
+    except FileNotFoundError:
+        logger.error(f"找不到配置文件{path}，先运行 python AIO_login.py -a mkjson 创建")
+        return 2
+    except config.ConfigError as e:
+        logger.error(f"配置无效: {e}")
+        return 2
+    if not (settings.username and settings.password):
+        logger.error(f"{path} 中缺少用户名或密码，先运行 python AIO_login.py -a mkjson 填写")
+        return 2
+
+    # 没有终端可交互，密码错误时记录错误而不是等待输入
+    handler = AIO_login.Operation(AIO_login.get_client(), credentials=(settings.username, settings.password),
+                                  interactive=False)
+    monitor = Monitor(handler, settings, config_path=path)
+
+    def stop(signum: int, frame: object) -> None:
+        # 主线程可能正持有 Event 内部的锁，在另一个线程中 stop() 以免死锁
+        threading.Thread(target=monitor.stop, name="stop").start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    monitor.start()
+    logger.info(f"无界面监控已启动，探测 {monitor.prober.target}，间隔{settings.ping_interval}秒")
+    try:
+        monitor.run()
+    finally:
+        monitor.close()
+    logger.info("无界面监控已停止")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
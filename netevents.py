@@ -0,0 +1,277 @@
+# encoding = utf-8
+# netevents
+"""网络变化通知
+
+监控循环平时按 ping_interval 探测，但网线插拔、Wi-Fi 重连、DHCP 续租换地址
+这类掉线原因操作系统是知道的。事件源在后台线程中等待这些通知，
+每条变化以 NetworkEvent 交给回调，监控据此立即探测并查询门户，
+没有变化时则可以放宽探测间隔。
+
+    - netlink: Linux 的 NETLINK_ROUTE 套接字，订阅网卡状态与地址变化，没有变化时不唤醒
+    - poll:    其他系统的退路，定期比较网卡列表与通往门户的本机地址，不发出任何数据包
+    - fake:    测试用，由 emit() 手动产生事件
+
+BITer.json 的 net_events 选择事件源：auto(默认，Linux 用 netlink，其他用 poll)、
+netlink、poll 或 off。
+"""
+import os
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+DEFAULT_POLL_INTERVAL: float = 5.0
+
+# linux/rtnetlink.h
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+RTM_NEWLINK, RTM_DELLINK, RTM_NEWADDR, RTM_DELADDR = 16, 17, 20, 21
+NLMSG_HEADER = struct.Struct("=LHHLL")  # 长度, 类型, 标志, 序号, 端口
+IFINFO = struct.Struct("=BxHiII")  # 地址族, 设备类型, 网卡序号, 标志, 变化的标志
+IFADDR = struct.Struct("=BBBBI")  # 地址族, 前缀长度, 标志, 作用域, 网卡序号
+IFF_UP = 0x1
+IFF_RUNNING = 0x40
+
+
+class NetworkEvent(NamedTuple):
+    kind: str  # link / address
+    detail: str
+    time: float  # time.monotonic()
+
+
+Callback = Callable[[NetworkEvent], None]
+
+
+class EventSource:
+    """事件源基类，子类实现 _run() 与 _wake()"""
+
+    name = ""
+
+    def __init__(self) -> None:
+        self.callback: Optional[Callback] = None
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self, callback: Callback) -> None:
+        """开始在后台线程中等待通知
+
+        Args:
+            callback: 每个事件调用一次，在事件源的线程中执行
+        """
+        self.callback = callback
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"netevents-{self.name}")
+        self.thread.start()
+
+    def close(self) -> None:
+        self.stopped.set()
+        self._wake()
+
+    def _emit(self, kind: str, detail: str) -> None:
+        if self.callback is not None and not self.stopped.is_set():
+            self.callback(NetworkEvent(kind, detail, time.monotonic()))
+
+    def _run(self) -> None:
+        raise NotImplementedError
+
+    def _wake(self) -> None:
+        """让阻塞中的 _run() 返回"""
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+def _ifname(index: int) -> str:
+    try:
+        return socket.if_indextoname(index)
+    except OSError:
+        return f"#{index}"
+
+
+def parse_netlink(data: bytes) -> list[tuple[str, str]]:
+    """解析一次 recv 得到的 netlink 消息
+
+    只关心网卡状态与地址变化，无线扩展等不改变网卡标志的 RTM_NEWLINK 被忽略。
+
+    Returns:
+        list[tuple[str, str]]: (类型, 描述) 列表
+    """
+    changes: list[tuple[str, str]] = []
+    offset = 0
+    while offset + NLMSG_HEADER.size <= len(data):
+        length, kind, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+        if length < NLMSG_HEADER.size:
+            break
+        body = offset + NLMSG_HEADER.size
+        if kind in (RTM_NEWLINK, RTM_DELLINK) and body + IFINFO.size <= len(data):
+            _, _, index, flags, change = IFINFO.unpack_from(data, body)
+            if kind == RTM_DELLINK:
+                changes.append(("link", f"{_ifname(index)} removed"))
+            elif change:
+                state = "up" if flags & IFF_UP and flags & IFF_RUNNING else "down"
+                changes.append(("link", f"{_ifname(index)} {state}"))
+        elif kind in (RTM_NEWADDR, RTM_DELADDR) and body + IFADDR.size <= len(data):
+            family, _, _, _, index = IFADDR.unpack_from(data, body)
+            version = "IPv6" if family == socket.AF_INET6 else "IPv4"
+            action = "added" if kind == RTM_NEWADDR else "removed"
+            changes.append(("address", f"{_ifname(index)} {version} address {action}"))
+        offset += (length + 3) & ~3  # NLMSG_ALIGN
+    return changes
+
+
+class NetlinkSource(EventSource):
+    """Linux 的 rtnetlink 通知，没有变化时线程一直阻塞"""
+
+    name = "netlink"
+
+    def __init__(self) -> None:
+        """
+        Raises:
+            OSError: 系统不支持 netlink 或无法订阅
+        """
+        super().__init__()
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)  # type: ignore[attr-defined]
+        try:
+            self.sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+        except OSError:
+            self.sock.close()
+            raise
+        # close() 向管道写入一个字节唤醒 select，不依赖超时轮询
+        self._pipe: tuple[int, ...] = os.pipe()
+
+    def _run(self) -> None:
+        try:
+            while not self.stopped.is_set():
+                readable, _, _ = select.select([self.sock, self._pipe[0]], [], [])
+                if self.sock not in readable:
+                    continue
+                try:
+                    data = self.sock.recv(65536)
+                except OSError:
+                    # 接收缓冲区溢出(ENOBUFS)说明有通知丢失，当作一次变化
+                    self._emit("link", "netlink overrun")
+                    continue
+                for kind, detail in parse_netlink(data):
+                    self._emit(kind, detail)
+        finally:
+            self._release()
+
+    def close(self) -> None:
+        super().close()
+        if self.thread is None:
+            self._release()
+
+    def _release(self) -> None:
+        self.sock.close()
+        pipe, self._pipe = self._pipe, ()
+        for fd in pipe:
+            os.close(fd)
+
+    def _wake(self) -> None:
+        if self._pipe:
+            try:
+                os.write(self._pipe[1], b"\0")
+            except OSError:
+                pass
+
+
+def local_address(host: str) -> Optional[str]:
+    """通往 host 时使用的本机地址
+
+    对 UDP 套接字 connect 只查询路由表，不发出数据包。
+
+    Returns:
+        Optional[str]: 没有可用路由时为None
+    """
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect((host, 80))
+            return sock.getsockname()[0]
+    except OSError:
+        return None
+
+
+class PollingSource(EventSource):
+    """定期比较网卡列表与通往门户的本机地址"""
+
+    name = "poll"
+
+    def __init__(self, host: str, interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        """
+        Args:
+            host: 门户地址，用于查询路由选择的本机地址
+            interval: 比较间隔(秒)
+        """
+        super().__init__()
+        self.host = host
+        self.interval = interval
+
+    def snapshot(self) -> tuple[tuple[str, ...], Optional[str]]:
+        """
+        Returns:
+            tuple[tuple[str, ...], Optional[str]]: (网卡名列表, 通往门户的本机地址)
+        """
+        try:
+            names = tuple(sorted(name for _, name in socket.if_nameindex()))
+        except (OSError, AttributeError):
+            names = ()
+        return names, local_address(self.host)
+
+    def _run(self) -> None:
+        last = self.snapshot()
+        while not self.stopped.wait(self.interval):
+            current = self.snapshot()
+            if current[0] != last[0]:
+                self._emit("link", f"interfaces {', '.join(current[0]) or '-'}")
+            if current[1] != last[1]:
+                self._emit("address", f"local address {last[1]} -> {current[1]}")
+            last = current
+
+    def __repr__(self) -> str:
+        return f"PollingSource({self.host!r}, interval={self.interval:g})"
+
+
+class FakeSource(EventSource):
+    """测试用事件源，emit() 在调用者线程中直接产生事件"""
+
+    name = "fake"
+
+    def start(self, callback: Callback) -> None:
+        self.callback = callback
+
+    def emit(self, kind: str = "link", detail: str = "fake") -> None:
+        self._emit(kind, detail)
+
+
+SOURCE_TYPES = ("auto", "netlink", "poll", "off")
+
+
+def create_source(kind: str, host: str) -> Optional[EventSource]:
+    """按配置创建事件源
+
+    Args:
+        kind: 见 SOURCE_TYPES
+        host: 门户地址，轮询时用于查询本机地址
+
+    Raises:
+        ValueError: 未知类型，或明确要求 netlink 但系统不支持
+
+    Returns:
+        Optional[EventSource]: off 时为None
+    """
+    if kind not in SOURCE_TYPES:
+        raise ValueError(f"未知的网络事件源: {kind}，可选: {', '.join(SOURCE_TYPES)}")
+    if kind == "off":
+        return None
+    if kind in ("auto", "netlink") and sys.platform.startswith("linux"):
+        try:
+            return NetlinkSource()
+        except (OSError, AttributeError) as e:
+            if kind == "netlink":
+                raise ValueError(f"无法订阅 netlink 通知: {e}") from None
+    elif kind == "netlink":
+        raise ValueError("netlink 只在 Linux 上可用，请改用 poll")
+    return PollingSource(host)
@@ -0,0 +1,363 @@
+# encoding = utf-8
+# probe
+"""进程内的连通性探测
+
+取代每秒一次的 `ping` 子进程，所有探测都在当前进程内完成，
+各自带有超时并记录延迟。通过 BITer.json 的 probe_type 选择：
+
+    - tcp:  TCP 连接目标的 80 端口（默认）
+    - http: HTTP HEAD 请求，2xx/3xx 视为在线（可指向 generate_204 类地址）
+    - dns:  解析目标域名
+    - icmp: 非特权 ICMP 套接字（需要系统允许，如 Linux 的 ping_group_range；Windows 不支持）
+    - ping: 调用系统 ping 命令（旧行为）
+
+ping_target 也可以是目标列表，此时并发探测所有目标，
+失败数达到 probe_quorum（默认为全部目标）才判定离线。
+
+域名解析（getaddrinfo）本身不支持超时，统一放到解析线程中执行，
+由 resolve() 按探测超时等待，超时的解析视为探测失败；tcp/http 用剩余时间连接解析得到的地址。
+http.client、ssl、subprocess 只在对应的探测器中导入。
+"""
+import os
+import socket
+import struct
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import NamedTuple, Optional
+from urllib.parse import urlparse
+
+DEFAULT_PROBE_TYPE: str = "tcp"
+DEFAULT_PROBE_TIMEOUT: float = 2.0
+RESOLVER_THREADS: int = 4
+
+# 卡住的解析会占用一个线程直到系统解析器放弃，线程数有上限，不会无限堆积
+_resolver = ThreadPoolExecutor(max_workers=RESOLVER_THREADS, thread_name_prefix="resolve")
+
+
+class ProbeError(OSError):
+    """非套接字层面的探测失败(HTTP 状态码、ping 返回非零等)"""
+
+
+class ProbeResult(NamedTuple):
+    ok: bool
+    latency: float  # 秒
+    target: str
+    error: str = ""
+
+
+class Probe:
+    """探测器基类，子类实现 _check()，失败时抛出异常"""
+
+    name = ""
+
+    def __init__(self, target: str, timeout: float = DEFAULT_PROBE_TIMEOUT) -> None:
+        self.target = target
+        self.timeout = timeout
+
+    def probe(self) -> ProbeResult:
+        """执行一次探测
+
+        Returns:
+            ProbeResult: 探测结果与耗时
+        """
+        start = time.perf_counter()
+        try:
+            self._check()
+        except OSError as e:
+            return ProbeResult(False, time.perf_counter() - start, self.target, str(e) or type(e).__name__)
+        return ProbeResult(True, time.perf_counter() - start, self.target)
+
+    def _check(self) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """释放探测器占用的线程等资源，替换探测器时调用"""
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.target!r}, timeout={self.timeout})"
+
+
+def resolve(host: str, timeout: float, port: Optional[int] = None,
+            family: int = socket.AF_UNSPEC) -> list[tuple[int, tuple[str, int]]]:
+    """在解析线程中解析域名，最多等待 timeout 秒
+
+    Args:
+        host: 域名或IP
+        timeout: 等待时限(秒)
+        port: 端口，仅用于填写结果中的地址
+        family: 地址族，缺省不限
+
+    Raises:
+        socket.timeout: 解析超时
+        OSError: 解析失败
+
+    Returns:
+        list[tuple[int, tuple[str, int]]]: (地址族, 套接字地址) 列表
+    """
+    future = _resolver.submit(
+        socket.getaddrinfo, host, port, family, socket.SOCK_STREAM)
+    try:
+        infos = future.result(timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise socket.timeout(f"resolving {host} timed out after {timeout}s") from None
+    return [(info[0], info[4][:2]) for info in infos]
+
+
+class TCPProbe(Probe):
+    name = "tcp"
+
+    def __init__(self, target: str, timeout: float = DEFAULT_PROBE_TIMEOUT) -> None:
+        super().__init__(target, timeout)
+        host, _, port = target.rpartition(":")
+        if host and port.isdigit():
+            self.address = (host, int(port))
+        else:
+            self.address = (target, 80)
+
+    def _check(self) -> None:
+        # 解析与连接共用同一个时限，依次尝试解析得到的地址
+        host, port = self.address
+        deadline = time.monotonic() + self.timeout
+        error: Optional[OSError] = None
+        for family, address in resolve(host, self.timeout, port):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                with socket.socket(family, socket.SOCK_STREAM) as sock:
+                    sock.settimeout(remaining)
+                    sock.connect(address)
+                    return
+            except OSError as e:
+                error = e
+        raise error or socket.timeout(f"connecting {self.target} timed out after {self.timeout}s")
+
+
+class HTTPProbe(Probe):
+    name = "http"
+
+    def __init__(self, target: str, timeout: float = DEFAULT_PROBE_TIMEOUT) -> None:
+        super().__init__(target, timeout)
+        url = urlparse(target if "://" in target else f"http://{target}/")
+        self.https = url.scheme == "https"
+        self.host = url.netloc
+        self.hostname = url.hostname or ""
+        self.port = url.port or (443 if self.https else 80)
+        self.path = url.path or "/"
+
+    def _check(self) -> None:
+        # http.client 自己调用 getaddrinfo 时不受超时限制，这里先在时限内解析，
+        # 再用剩余时间连接解析得到的地址，Host 头仍填写原域名
+        import http.client
+
+        deadline = time.monotonic() + self.timeout
+        error: Optional[OSError] = None
+        for family, address in resolve(self.hostname, self.timeout, self.port):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                sock = self._connect(family, address, remaining)
+            except OSError as e:
+                error = e
+                continue
+            conn = http.client.HTTPConnection(self.hostname, self.port, timeout=remaining)
+            conn.sock = sock
+            try:
+                conn.request("HEAD", self.path, headers={"Host": self.host})
+                status = conn.getresponse().status
+            except http.client.HTTPException as e:
+                raise ProbeError(str(e) or type(e).__name__) from e
+            finally:
+                conn.close()
+            if status >= 400:
+                raise ProbeError(f"HTTP {status}")
+            return
+        raise error or socket.timeout(f"connecting {self.target} timed out after {self.timeout}s")
+
+    def _connect(self, family: int, address: tuple[str, int], timeout: float) -> socket.socket:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            if self.https:
+                import ssl
+
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.hostname)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+
+class DNSProbe(Probe):
+    name = "dns"
+
+    def _check(self) -> None:
+        resolve(self.target, self.timeout)
+
+
+class ICMPProbe(Probe):
+    name = "icmp"
+
+    def _check(self) -> None:
+        deadline = time.monotonic() + self.timeout
+        address = resolve(self.target, self.timeout, family=socket.AF_INET)[0][1][0]
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP) as sock:
+            # 非特权ICMP套接字由内核填写标识符，这里只需给出类型、序号和校验和
+            seq = os.getpid() & 0xFFFF
+            header = struct.pack("!BBHHH", 8, 0, 0, 0, seq)
+            payload = b"BIT-Connect"
+            packet = struct.pack("!BBHHH", 8, 0, icmp_checksum(header + payload), 0, seq) + payload
+            sock.sendto(packet, (address, 0))
+            while True:
+                sock.settimeout(max(deadline - time.monotonic(), 0.001))
+                reply = sock.recv(1024)
+                if reply and reply[0] == 0:  # echo reply
+                    return
+
+
+class PingProbe(Probe):
+    name = "ping"
+
+    def _check(self) -> None:
+        import subprocess
+
+        count_flag = "-n" if sys.platform == "win32" else "-c"
+        try:
+            subprocess.run(
+                ["ping", self.target, count_flag, "1"],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                check=True, timeout=self.timeout
+            )
+        except subprocess.SubprocessError as e:
+            raise ProbeError(str(e) or type(e).__name__) from e
+
+
+class QuorumProbe(Probe):
+    """并发探测多个目标并按法定数判定
+
+    失败数达到 quorum 即判定离线，成功数超过 n - quorum 即判定在线，
+    一旦结论确定立即返回，不等待其余目标。quorum 等于目标数时即“任一成功即在线”。
+
+    Attributes:
+        last_results: 上一轮中已完成的各目标结果，可用于记录延迟
+    """
+
+    name = "quorum"
+
+    def __init__(self, probes: list[Probe], quorum: Optional[int] = None) -> None:
+        super().__init__(",".join(p.target for p in probes), max(p.timeout for p in probes))
+        self.probes = probes
+        self.quorum = min(max(quorum or len(probes), 1), len(probes))
+        self.last_results: dict[str, ProbeResult] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(probes), thread_name_prefix="probe")
+
+    def probe(self) -> ProbeResult:
+        start = time.perf_counter()
+        pending: set[Future[ProbeResult]] = {
+            self._executor.submit(p.probe) for p in self.probes}
+        results: dict[str, ProbeResult] = {}
+        failures = successes = 0
+        allowed_successes = len(self.probes) - self.quorum
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[result.target] = result
+                if result.ok:
+                    successes += 1
+                else:
+                    failures += 1
+            if failures >= self.quorum or successes > allowed_successes:
+                break
+        self.last_results = results
+        errors = "; ".join(f"{r.target}: {r.error}" for r in results.values() if not r.ok)
+        return ProbeResult(failures < self.quorum, time.perf_counter() - start, self.target, errors)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+def icmp_checksum(data: bytes) -> int:
+    """计算 ICMP 校验和
+
+    Returns:
+        int: 16位校验和
+    """
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def icmp_supported() -> bool:
+    """当前系统是否允许非特权 ICMP 套接字
+
+    Windows 没有 SOCK_DGRAM 形式的 ICMP 套接字；
+    Linux 需要当前组在 net.ipv4.ping_group_range 内。
+
+    Returns:
+        bool: 能否创建 ICMP 探测所需的套接字
+    """
+    if sys.platform == "win32":
+        return False
+    try:
+        socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP).close()
+    except OSError:
+        return False
+    return True
+
+
+PROBE_TYPES: dict[str, type[Probe]] = {
+    probe.name: probe for probe in (TCPProbe, HTTPProbe, DNSProbe, ICMPProbe, PingProbe)
+}
+
+
+def create_probe(probe_type: str, target: str, timeout: float = DEFAULT_PROBE_TIMEOUT) -> Probe:
+    """按类型创建探测器
+
+    Args:
+        probe_type: 探测类型，见 PROBE_TYPES
+        target: 探测目标
+        timeout: 单次探测超时(秒)
+
+    Raises:
+        ValueError: 未知的探测类型，或当前系统不支持该探测
+
+    Returns:
+        Probe: 探测器实例
+    """
+    try:
+        probe_class = PROBE_TYPES[probe_type]
+    except KeyError:
+        raise ValueError(f"未知的探测类型: {probe_type}，可选: {', '.join(PROBE_TYPES)}") from None
+    if probe_class is ICMPProbe and not icmp_supported():
+        raise ValueError("当前系统不支持非特权ICMP探测，请改用 tcp/http/ping")
+    return probe_class(target, timeout)
+
+
+def create_prober(probe_type: str, targets: str | list[str],
+                  timeout: float = DEFAULT_PROBE_TIMEOUT, quorum: Optional[int] = None) -> Probe:
+    """按配置创建探测器，多个目标时返回 QuorumProbe
+
+    Args:
+        probe_type: 探测类型，见 PROBE_TYPES
+        targets: 单个目标或目标列表
+        timeout: 单次探测超时(秒)
+        quorum: 判定离线所需的失败数，缺省为全部目标
+
+    Returns:
+        Probe: 探测器实例
+    """
+    if isinstance(targets, str):
+        targets = [targets]
+    if len(targets) == 1:
+        return create_probe(probe_type, targets[0], timeout)
+    return QuorumProbe([create_probe(probe_type, t, timeout) for t in targets], quorum)
@@ -0,0 +1,235 @@
+# encoding = utf-8
+# recovery
+"""断线恢复状态机
+
+    DETECTED → CHECK_STATE → [LOGOUT] → LOGIN → VERIFY → ONLINE
+                           ↘ (仍在线且无需强制登出) → VERIFY
+
+每一步在条件满足后立即进入下一步，不再固定休眠；
+每一步有独立的超时与重试次数，超出后进入 FAILED。
+步骤超时作为该步骤内所有门户请求的总时限(AIO_login.Deadline)。
+整个恢复另有总时限 RECOVERY_BUDGET，门户请求超时且剩余时间
+不够再试一次时不再重试，直接进入 TIMEOUT。
+"""
+import time
+from enum import Enum
+from typing import Callable, NamedTuple, Optional, TypeVar
+
+import AIO_login
+import breaker
+import log
+import singleflight
+
+logger = log.setup_logger()
+
+T = TypeVar("T")
+
+POLL_INTERVAL: float = 0.1
+RECOVERY_BUDGET: float = 15.0
+
+
+class State(Enum):
+    DETECTED = "detected"
+    CHECK_STATE = "check_state"
+    LOGOUT = "logout"
+    LOGIN = "login"
+    VERIFY = "verify"
+    ONLINE = "online"
+    FAILED = "failed"
+    TIMEOUT = "timeout"
+
+
+class StepPolicy(NamedTuple):
+    timeout: float  # 单次尝试的时限(秒)
+    retries: int = 0  # 失败后的重试次数
+    retry_delay: float = 0.2  # 重试前等待(秒)
+
+
+DEFAULT_POLICIES: dict[State, StepPolicy] = {
+    State.CHECK_STATE: StepPolicy(1.0, retries=2),
+    State.LOGOUT: StepPolicy(3.0, retries=1),
+    State.LOGIN: StepPolicy(5.0, retries=2, retry_delay=0.5),
+    State.VERIFY: StepPolicy(3.0, retries=0),
+}
+
+
+class StepFailed(Exception):
+    pass
+
+
+class StepTimedOut(StepFailed):
+    """门户请求超时，且恢复总时限不足以重试"""
+
+
+def wait_until(condition: Callable[[], bool], timeout: float,
+               interval: float = POLL_INTERVAL) -> None:
+    """轮询直到条件成立
+
+    剩余时间不足一个轮询间隔时不再检查，以免最后一次检查因时限将尽而超时。
+
+    Raises:
+        TimeoutError: 超时条件仍不成立
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() + interval >= deadline:
+            raise TimeoutError(f"condition not met in {timeout}s")
+        time.sleep(interval)
+
+
+_flight: "singleflight.SingleFlight[State]" = singleflight.SingleFlight()
+
+
+class RecoveryMachine:
+    """执行一次断线恢复
+
+    Attributes:
+        timings: 上一次 run() 中各步骤的 (状态, 耗时秒) 记录
+    """
+
+    def __init__(self, handler: "AIO_login.Operation",
+                 verify: Optional[Callable[[], bool]] = None,
+                 policies: Optional[dict[State, StepPolicy]] = None,
+                 budget: float = RECOVERY_BUDGET) -> None:
+        """
+        Args:
+            handler: 登录/登出使用的 Operation
+            verify: 登录后额外的连通性确认(如一次探测)，缺省只确认门户在线
+            policies: 覆盖默认的步骤策略
+            budget: 整个恢复的总时限(秒)
+        """
+        self.handler = handler
+        self.verify = verify
+        self.policies = {**DEFAULT_POLICIES, **(policies or {})}
+        self.budget = budget
+        self.deadline = AIO_login.Deadline(budget)
+        self.timings: list[tuple[State, float]] = []
+
+    def run(self, force_logout: bool = False, start: State = State.DETECTED) -> State:
+        """运行状态机直至 ONLINE 或 FAILED
+
+        同一进程内并发的恢复共享一次执行；执行期间持有跨进程登录锁，
+        等锁期间其他进程已完成登录时只做 VERIFY，不再登出重登。
+
+        Args:
+            force_logout: 门户显示在线时是否先登出再登录
+            start: 起始状态，调用方已确认门户状态时可直接从 LOGIN 开始
+
+        Returns:
+            State: ONLINE、FAILED 或 TIMEOUT
+        """
+        return _flight.do("recovery", lambda: self._run_locked(force_logout, start))
+
+    def _run_locked(self, force_logout: bool, start: State) -> State:
+        lock = singleflight.shared_lock()
+        if lock is None:
+            return self._run(force_logout, start)
+        requested_at = time.time()
+        if not lock.acquire(self.budget):
+            logger.warning(f"等待其他进程的登录超过{self.budget:g}s")
+            return State.TIMEOUT
+        try:
+            if lock.reusable_login(self.handler.username, requested_at):
+                logger.info("其他进程已完成登录，只确认在线状态")
+                start = State.VERIFY
+            return self._run(force_logout, start)
+        finally:
+            lock.release()
+
+    def _run(self, force_logout: bool, start: State) -> State:
+        self.timings = []
+        self.deadline = AIO_login.Deadline(self.budget)
+        state = start
+        while state not in (State.ONLINE, State.FAILED, State.TIMEOUT):
+            step_start = time.monotonic()
+            step = state
+            try:
+                state = self._step(state, force_logout)
+            except StepTimedOut as e:
+                logger.warning(f"恢复超时: {e}")
+                state = State.TIMEOUT
+            except StepFailed as e:
+                logger.warning(f"恢复失败: {e}")
+                state = State.FAILED
+            self.timings.append((step, time.monotonic() - step_start))
+        logger.debug("恢复步骤耗时: " + ", ".join(
+            f"{s.value}={t * 1000:.0f}ms" for s, t in self.timings))
+        return state
+
+    def _step(self, state: State, force_logout: bool) -> State:
+        match state:
+            case State.DETECTED:
+                return State.CHECK_STATE
+            case State.CHECK_STATE:
+                if self._attempt(state, self._logged_in):
+                    return State.LOGOUT if force_logout else State.VERIFY
+                return State.LOGIN
+            case State.LOGOUT:
+                self._attempt(state, self._logout)
+                return State.LOGIN
+            case State.LOGIN:
+                self._attempt(state, self._login)
+                return State.VERIFY
+            case State.VERIFY:
+                self._attempt(state, self._verify)
+                return State.ONLINE
+            case _:
+                raise AIO_login.UnreachableError(f"{state} is not a step")
+
+    def _attempt(self, state: State, step: Callable[[float], T]) -> T:
+        """按策略执行一个步骤，失败则重试
+
+        每次尝试的超时不超过恢复总时限的剩余时间；门户请求超时后，
+        若剩余时间已不够一次完整尝试则不再重试。
+
+        Raises:
+            StepTimedOut: 门户请求超时且无法重试，或总时限已用尽
+            StepFailed: 重试用尽，或门户熔断器打开(此时不重试)
+        """
+        policy = self.policies[state]
+        timed_out = False
+        for attempt in range(policy.retries + 1):
+            timeout = min(policy.timeout, self.deadline.remaining())
+            if timeout <= 0:
+                raise StepTimedOut(f"{state.value} 开始前恢复总时限{self.budget:g}s已用尽")
+            try:
+                return step(timeout)
+            except breaker.PortalUnavailable as e:
+                raise StepFailed(f"{state.value} 跳过: {e}") from e
+            except AIO_login.PortalTimeout as e:
+                timed_out = True
+                logger.info(f"{state.value} 第{attempt + 1}次尝试超时: {e}")
+                if self.deadline.remaining() < policy.timeout + policy.retry_delay:
+                    raise StepTimedOut(f"{state.value} 超时且剩余时间不足以重试") from e
+            except Exception as e:
+                timed_out = False
+                logger.info(f"{state.value} 第{attempt + 1}次尝试失败: {type(e).__name__}: {e}")
+            if attempt < policy.retries:
+                time.sleep(policy.retry_delay)
+        if timed_out:
+            raise StepTimedOut(f"{state.value} 重试{policy.retries}次后仍超时")
+        raise StepFailed(f"{state.value} 重试{policy.retries}次后仍失败")
+
+    def _logged_in(self, timeout: Optional[float] = None,
+                   deadline: Optional[AIO_login.Deadline] = None) -> bool:
+        return AIO_login.get_user_info(self.handler.client, timeout=timeout, deadline=deadline)[0]
+
+    def _logout(self, timeout: float) -> None:
+        deadline = AIO_login.Deadline(timeout)
+        try:
+            self.handler.logout(budget=timeout)
+        except AIO_login.AlreadyLoggedOutException:
+            return
+        wait_until(lambda: not self._logged_in(deadline=deadline), deadline.remaining())
+
+    def _login(self, timeout: float) -> None:
+        try:
+            self.handler.login(budget=timeout)
+        except AIO_login.AlreadyOnlineException:
+            logger.info("门户显示已在线，跳过登录")
+
+    def _verify(self, timeout: float) -> None:
+        deadline = AIO_login.Deadline(timeout)
+        wait_until(lambda: self._logged_in(deadline=deadline), deadline.remaining())
+        if self.verify is not None and not self.verify():
+            raise StepFailed("门户在线但连通性确认失败")
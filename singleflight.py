@@ -0,0 +1,231 @@
+# encoding = utf-8
+# singleflight
+"""登录合并：同一时刻只进行一次登录
+
+托盘、自动重连(探测失败与 Ctrl+C)、手动 `-a login` 可能同时发起登录，
+各自走完整流程会互相撞上 AlreadyOnlineException，甚至把对方登出。
+
+    - 进程内：SingleFlight 让同一 key 的并发调用共享一次执行及其结果
+    - 进程间：ProcessLock 是放在控制目录(见 daemon.runtime_dir)中的文件锁，
+      持有者在释放前写入最近一次结果(LastResult)；等锁的一方拿到锁后
+      若发现有一次登录在自己发起之后成功完成，直接复用，不再重复登录
+
+文件锁在进程退出时由系统释放，不会因崩溃残留。
+"""
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Generic, Hashable, NamedTuple, Optional, TypeVar
+
+T = TypeVar("T")
+
+LOCK_POLL_INTERVAL: float = 0.05
+
+
+class _Call(Generic[T]):
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight(Generic[T]):
+    """同一进程内对同一 key 的并发调用只执行一次
+
+    第一个调用者执行，执行期间到达的调用者等待并得到相同的结果或异常。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call[T]] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """
+        Args:
+            key: 合并的依据
+            fn: 实际执行的调用
+
+        Returns:
+            T: fn 的结果(可能来自其他线程的执行)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result  # type: ignore[return-value]
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._calls
+
+
+class LastResult(NamedTuple):
+    action: str  # login / logout
+    username: str
+    ok: bool
+    finished_at: float  # Unix 时间戳，跨进程比较
+    pid: int
+    response: dict[str, Any]
+
+
+class ProcessLock:
+    """跨进程的文件锁，同一线程可重入，并保存最近一次登录/登出结果"""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: 锁文件路径，结果记录在同目录的 last_result.json
+        """
+        self.path = path
+        self.record_path = os.path.join(os.path.dirname(path), "last_result.json")
+        self._mutex = threading.RLock()  # 进程内的互斥，文件锁只在最外层获取
+        self._depth = 0
+        self._owner: Optional[int] = None
+        self._fd: Optional[int] = None
+
+    def owned(self) -> bool:
+        """当前线程是否持有锁"""
+        return self._owner == threading.get_ident()
+
+    def acquire(self, timeout: float) -> bool:
+        """获取锁
+
+        Args:
+            timeout: 最长等待(秒)
+
+        Returns:
+            bool: 是否在时限内获得
+        """
+        deadline = time.monotonic() + timeout
+        if not self._mutex.acquire(timeout=max(timeout, 0.0)):
+            return False
+        if self._depth == 0:
+            try:
+                locked = self._lock_file(deadline)
+            except BaseException:
+                self._mutex.release()
+                raise
+            if not locked:
+                self._mutex.release()
+                return False
+        self._depth += 1
+        self._owner = threading.get_ident()
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            self._unlock_file()
+        self._mutex.release()
+
+    def _lock_file(self, deadline: float) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        while True:
+            try:
+                if sys.platform == "win32":
+                    import msvcrt
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd = fd
+                return True
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    return False
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def _unlock_file(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def last_result(self) -> Optional[LastResult]:
+        """读取最近一次结果，没有记录或记录损坏时为None"""
+        try:
+            with open(self.record_path, encoding="utf-8") as f:
+                return LastResult(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def record(self, action: str, username: str, ok: bool,
+               response: Optional[dict[str, Any]] = None) -> None:
+        """写入结果，应在持有锁时调用"""
+        result = LastResult(action, username, ok, time.time(), os.getpid(), response or {})
+        tmp = f"{self.record_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(result._asdict(), f, ensure_ascii=False)
+        os.replace(tmp, self.record_path)
+
+    def reusable_login(self, username: str, since: float) -> Optional[LastResult]:
+        """在 since 之后成功完成、且之后没有登出的同一用户登录
+
+        Args:
+            username: 用户名
+            since: 调用方发起操作的 Unix 时间戳
+
+        Returns:
+            Optional[LastResult]: 可复用的结果
+        """
+        last = self.last_result()
+        if last is not None and last.action == "login" and last.ok \
+                and last.username == username and last.finished_at >= since:
+            return last
+        return None
+
+
+_locks: dict[str, ProcessLock] = {}
+_locks_guard = threading.Lock()
+
+
+def shared_lock() -> Optional[ProcessLock]:
+    """当前用户控制目录中的登录锁
+
+    Returns:
+        Optional[ProcessLock]: 控制目录不可用(如权限不安全)时为None，此时只做进程内合并
+    """
+    import daemon
+
+    try:
+        path = os.path.join(daemon.runtime_dir(create=True), "login.lock")
+    except OSError:
+        return None
+    with _locks_guard:
+        if path not in _locks:
+            _locks[path] = ProcessLock(path)
+        return _locks[path]
@@ -0,0 +1,63 @@
+import atexit
+import os
+import sys
+from typing import Iterator, NamedTuple
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import AIO_login  # noqa: E402
+import log  # noqa: E402
+import mock_portal  # noqa: E402
+
+
+def fixture_text(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+USERNAME = "tester"
+PASSWORD = "tester-password"
+
+
+class Portal(NamedTuple):
+    state: "mock_portal.PortalState"
+    client: "AIO_login.PortalClient"
+    handler: "AIO_login.Operation"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def stop_log_listener() -> Iterator[None]:
+    """在 pytest 关闭捕获的输出流之前停止日志线程，折叠汇总不会在退出时写入已关闭的流"""
+    yield
+    listener = log._listener
+    if listener is not None:
+        atexit.unregister(listener.stop)
+        listener.stop()
+
+
+@pytest.fixture(autouse=True)
+def private_runtime_dir(tmp_path: os.PathLike[str], monkeypatch: pytest.MonkeyPatch) -> None:
+    """控制目录(登录锁、守护进程套接字)放在每个测试自己的临时目录中"""
+    path = os.path.join(tmp_path, "xdg")
+    os.mkdir(path, 0o700)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", path)
+
+
+@pytest.fixture
+def portal() -> Iterator[Portal]:
+    """本地模拟门户与指向它的 Operation"""
+    state = mock_portal.PortalState(accounts={USERNAME: PASSWORD}, seed=55)
+    server = mock_portal.serve(state=state)
+    client = AIO_login.PortalClient(base=f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        yield Portal(state, client, AIO_login.Operation(client, credentials=(USERNAME, PASSWORD)))
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from typing import Iterator
+
+import pytest
+
+import AIO_login
+import mock_portal
+from conftest import PASSWORD, USERNAME
+
+STATUS_LATENCY = 0.2
+CHALLENGE_LATENCY = 0.2
+
+
+@pytest.fixture
+def slow_portal() -> Iterator[tuple[mock_portal.PortalState, AIO_login.PortalClient]]:
+    """状态查询与 challenge 各带固定延迟的模拟门户"""
+    state = mock_portal.PortalState(accounts={USERNAME: PASSWORD}, seed=55, path_latency={
+        "/cgi-bin/rad_user_info": STATUS_LATENCY, "/cgi-bin/get_challenge": CHALLENGE_LATENCY})
+    server = mock_portal.serve(state=state)
+    client = AIO_login.PortalClient(base=f"http://127.0.0.1:{server.server_address[1]}")
+    client.identity.get(client)
+    try:
+        yield state, client
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_async_overlaps_status_and_challenge(
+        slow_portal: tuple[mock_portal.PortalState, AIO_login.PortalClient]) -> None:
+    state, client = slow_portal
+    start = time.monotonic()
+    sync_result = AIO_login.User(USERNAME, PASSWORD, client).operation(AIO_login.Action.LOGIN)
+    sync_elapsed = time.monotonic() - start
+    sync_online = dict(state.online)
+    AIO_login.User(USERNAME, PASSWORD, client).operation(AIO_login.Action.LOGOUT)
+    assert state.online == {}
+
+    user = AIO_login.AsyncUser(USERNAME, PASSWORD, client)
+    start = time.monotonic()
+    async_result = asyncio.run(user.operation_async(AIO_login.Action.LOGIN))
+    async_elapsed = time.monotonic() - start
+
+    assert sync_elapsed >= STATUS_LATENCY + CHALLENGE_LATENCY
+    assert async_elapsed < STATUS_LATENCY + CHALLENGE_LATENCY
+    assert async_result == sync_result and async_result["error"] == "ok"
+    assert state.online == sync_online == {"127.0.0.1": USERNAME}
+
+
+def test_async_matches_sync_when_already_online(
+        slow_portal: tuple[mock_portal.PortalState, AIO_login.PortalClient]) -> None:
+    state, client = slow_portal
+    state.online["127.0.0.1"] = USERNAME
+    with pytest.raises(AIO_login.AlreadyOnlineException):
+        AIO_login.User(USERNAME, PASSWORD, client).operation(AIO_login.Action.LOGIN)
+    with pytest.raises(AIO_login.AlreadyOnlineException):
+        asyncio.run(AIO_login.AsyncUser(USERNAME, PASSWORD, client).operation_async(AIO_login.Action.LOGIN))
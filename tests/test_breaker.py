@@ -0,0 +1,129 @@
+import random
+
+import pytest
+
+import AIO_login
+import breaker
+import metrics
+import recovery
+from breaker import BreakerState
+from conftest import Portal
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_breaker(clock: Clock, **kwargs: float) -> breaker.CircuitBreaker:
+    return breaker.CircuitBreaker(clock=clock, rng=random.Random(55), **kwargs)  # type: ignore[arg-type]
+
+
+def test_opens_after_threshold_consecutive_failures() -> None:
+    cb = make_breaker(Clock(), threshold=3)
+    cb.record_failure()
+    cb.record_failure()
+    cb.record_success()
+    cb.record_failure()
+    cb.record_failure()
+    assert cb.state is BreakerState.CLOSED
+    cb.record_failure()
+    assert cb.state is BreakerState.OPEN
+    with pytest.raises(breaker.PortalUnavailable) as info:
+        cb.before_request()
+    assert 0 < info.value.retry_in <= cb.base_delay
+
+
+def test_half_open_allows_single_trial() -> None:
+    clock = Clock()
+    cb = make_breaker(clock, threshold=1)
+    cb.record_failure()
+    clock.now = cb.base_delay
+    assert cb.state is BreakerState.HALF_OPEN
+    cb.before_request()
+    with pytest.raises(breaker.PortalUnavailable):
+        cb.before_request()
+    cb.record_success()
+    assert cb.state is BreakerState.CLOSED
+    cb.before_request()
+
+
+def test_failed_trial_doubles_backoff_with_jitter() -> None:
+    clock = Clock()
+    cb = make_breaker(clock, threshold=1, base_delay=2.0, max_delay=8.0)
+    delays = []
+    for _ in range(5):
+        cb.before_request()
+        cb.record_failure()
+        delays.append(cb.retry_in())
+        clock.now += delays[-1]
+    for delay, nominal in zip(delays, (2.0, 4.0, 8.0, 8.0, 8.0)):
+        assert nominal / 2 <= delay <= nominal
+
+
+def test_late_failure_does_not_extend_open_state() -> None:
+    clock = Clock()
+    cb = make_breaker(clock, threshold=1)
+    cb.record_failure()
+    retry_in = cb.retry_in()
+    cb.record_failure()
+    assert cb.retry_in() == retry_in
+
+
+def test_released_trial_can_be_retried() -> None:
+    clock = Clock()
+    cb = make_breaker(clock, threshold=1)
+    cb.record_failure()
+    clock.now = cb.base_delay
+    cb.before_request()
+    cb.release()
+    cb.before_request()
+
+
+def test_state_changes_reported_to_metrics(portal: Portal) -> None:
+    portal.state.error_rate = 1.0
+    for _ in range(portal.client.breaker.threshold):
+        assert portal.client.get("/").status_code == 500
+    assert portal.client.breaker.state is BreakerState.OPEN
+    assert metrics.REGISTRY.gauges["bit_portal_breaker_state"][()] == 2
+    portal.client.breaker.reset()
+    assert metrics.REGISTRY.gauges["bit_portal_breaker_state"][()] == 0
+
+
+def test_open_breaker_stops_portal_requests(portal: Portal) -> None:
+    clock = Clock()
+    portal.client.breaker = make_breaker(clock)
+    portal.state.error_rate = 1.0
+    for _ in range(portal.client.breaker.threshold):
+        with pytest.raises(Exception):
+            portal.handler.login()
+    assert portal.client.breaker.state is BreakerState.OPEN
+    sent = sum(portal.state.requests.values())
+
+    with pytest.raises(breaker.PortalUnavailable):
+        portal.handler.login()
+    machine = recovery.RecoveryMachine(portal.handler)
+    assert machine.run(force_logout=True) is recovery.State.FAILED
+    assert sum(portal.state.requests.values()) == sent
+
+    portal.state.error_rate = 0.0
+    clock.now += portal.client.breaker.max_delay
+    assert AIO_login.get_user_info(portal.client) == (False, None)
+    assert portal.client.breaker.state is BreakerState.CLOSED
+    assert machine.run() is recovery.State.ONLINE
+
+
+def test_first_login_after_half_open_succeeds(portal: Portal) -> None:
+    clock = Clock()
+    portal.client.breaker = make_breaker(clock, threshold=1)
+    portal.client.identity.get(portal.client)  # 首页已缓存，登录的第一个请求就是试探
+    portal.client.breaker.record_failure()
+    clock.now += portal.client.breaker.max_delay
+    assert portal.client.breaker.state is BreakerState.HALF_OPEN
+
+    res = portal.handler.login()
+    assert res["error"] == "ok"
+    assert portal.client.breaker.state is BreakerState.CLOSED
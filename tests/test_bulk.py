@@ -0,0 +1,99 @@
+import json
+import time
+from typing import Iterator
+
+import pytest
+
+import bulk
+import mock_portal
+
+SEATS = 24
+
+
+@pytest.fixture
+def lab() -> Iterator[tuple[mock_portal.PortalState, list[bulk.RosterEntry]]]:
+    """模拟门户与一份机房名单"""
+    accounts = {f"seat{i:02d}": f"pass-{i}" for i in range(SEATS)}
+    state = mock_portal.PortalState(accounts=accounts, latency=0.01, seed=55)
+    server = mock_portal.serve(state=state)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    roster = [bulk.RosterEntry(user, password, f"10.1.0.{i + 10}", "1", base)
+              for i, (user, password) in enumerate(accounts.items())]
+    try:
+        yield state, roster
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run(roster: list[bulk.RosterEntry], action: str, **kwargs: float) -> dict:
+    runner = bulk.BulkRunner(**kwargs)  # type: ignore[arg-type]
+    try:
+        return runner.run(roster, action)
+    finally:
+        runner.close()
+
+
+def test_login_check_logout_cycle(lab) -> None:
+    state, roster = lab
+    report = run(roster, "login", workers=8, rate=0)
+    assert report["succeeded"] == SEATS and report["failed"] == 0
+    assert state.online == {e.ip: e.username for e in roster}
+    assert [r["username"] for r in report["results"]] == [e.username for e in roster]
+
+    report = run(roster, "check", workers=8, rate=0)
+    assert all(r["online"] and r["online_user"] == e.username
+               for r, e in zip(report["results"], roster))
+
+    report = run(roster[:3], "login", workers=8, rate=0)
+    assert [r["status"] for r in report["results"]] == ["already_online"] * 3
+
+    report = run(roster, "logout", workers=8, rate=0)
+    assert report["succeeded"] == SEATS
+    assert state.online == {}
+    json.dumps(report)
+
+
+def test_failures_reported_per_entry(lab) -> None:
+    state, roster = lab
+    roster[1] = roster[1]._replace(password="wrong")
+    report = run(roster[:3], "login", workers=4, rate=0)
+    assert [r["ok"] for r in report["results"]] == [True, False, True]
+    assert report["results"][1]["error"] == "Password is error."
+    assert report["failed"] == 1
+    assert roster[1].ip not in state.online
+
+
+def test_concurrency_beats_sequential(lab) -> None:
+    _, roster = lab
+    start = time.monotonic()
+    run(roster, "check", workers=1, rate=0)
+    sequential = time.monotonic() - start
+    report = run(roster, "check", workers=12, rate=0)
+    assert report["seconds"] < sequential / 3
+
+
+def test_rate_limiter_bounds_request_rate() -> None:
+    limiter = bulk.RateLimiter(rate=100, burst=10)
+    start = time.monotonic()
+    for _ in range(40):
+        limiter()
+    assert time.monotonic() - start >= 0.29
+
+
+def test_read_roster_csv_and_json(tmp_path) -> None:
+    csv_path = tmp_path / "roster.csv"
+    csv_path.write_text("username,password,ip,ac_id\nu1,p1,10.0.0.1,1\nu2,p2,10.0.0.2,5\n",
+                        encoding="utf-8")
+    entries = bulk.read_roster(str(csv_path))
+    assert entries[1] == bulk.RosterEntry("u2", "p2", "10.0.0.2", "5")
+
+    json_path = tmp_path / "roster.json"
+    json_path.write_text(json.dumps([{"username": "u", "password": "p", "ip": "1.2.3.4",
+                                      "ac_id": 1, "portal": "http://portal"}]), encoding="utf-8")
+    assert bulk.read_roster(str(json_path)) == [
+        bulk.RosterEntry("u", "p", "1.2.3.4", "1", "http://portal")]
+
+    json_path.write_text(json.dumps([{"username": "u"}]), encoding="utf-8")
+    with pytest.raises(ValueError):
+        bulk.read_roster(str(json_path))
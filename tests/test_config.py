@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+
+import pytest
+
+import AIO_login
+import config
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    (tmp_path / "config").mkdir()
+    return str(tmp_path / "config" / "BITer.json")
+
+
+def write(path: str, data: object) -> None:
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(data, f)
+
+
+def test_defaults_for_missing_fields() -> None:
+    settings = config.validate({"username": "u", "password": "p"})
+    assert settings == config.Config("u", "p")
+    assert settings.targets == ["bilibili.com"]
+
+
+@pytest.mark.parametrize("data", [
+    [],
+    {"username": 1},
+    {"ping_interval": "1"},
+    {"ping_interval": 0},
+    {"ping_interval": 1.5},
+    {"ping_interval_max": -1},
+    {"net_events": 1},
+    {"probe_timeout": True},
+    {"ping_target": []},
+    {"ping_target": ["a", 2]},
+    {"ping_target": ["a", "b"], "probe_quorum": 3},
+    {"metrics_port": 70000},
+    {"history_db": 1},
+])
+def test_invalid_fields_rejected(data: object) -> None:
+    with pytest.raises(config.ConfigError):
+        config.validate(data)
+
+
+def test_load_is_cached_until_file_changes(path: str) -> None:
+    write(path, {"username": "u", "password": "p"})
+    first = config.load(path)
+    assert config.load(path) is first
+
+    write(path, {"username": "u", "password": "p", "ping_interval": 5})
+    assert config.load(path).ping_interval == 5
+
+
+def test_load_errors(path: str) -> None:
+    with pytest.raises(FileNotFoundError):
+        config.load(path)
+    with open(path, "w", encoding="utf8") as f:
+        f.write('{"username": "u",')
+    with pytest.raises(config.ConfigError):
+        config.load(path)
+
+
+def test_save_escapes_and_keeps_other_fields(path: str) -> None:
+    write(path, {"username": "old", "password": "old", "ping_target": ["a", "b"], "custom": 1})
+    password = 'p"a\\s,s}'
+    settings = config.save({"username": "新用户", "password": password}, path)
+    assert settings.password == password
+    assert settings.ping_target == ["a", "b"]
+    with open(path, encoding="utf8") as f:
+        data = json.load(f)
+    assert data["password"] == password and data["custom"] == 1
+    assert config.load(path) == settings
+    assert os.listdir(os.path.dirname(path)) == ["BITer.json"]
+    if sys.platform != "win32":
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_save_refuses_invalid_result(path: str) -> None:
+    write(path, {"username": "u", "password": "p"})
+    with pytest.raises(config.ConfigError):
+        config.save({"ping_interval": -1}, path)
+    assert config.load(path).ping_interval == 1
+    assert os.listdir(os.path.dirname(path)) == ["BITer.json"]
+
+
+def test_save_reset_discards_invalid_fields(path: str) -> None:
+    write(path, {"username": "u", "password": "p", "ping_interval": "x"})
+    settings = config.save({"username": "u", "password": "q"}, path, reset=True)
+    assert settings == config.Config("u", "q")
+
+
+def test_watcher_reports_each_valid_change_once(path: str) -> None:
+    write(path, {"ping_interval": 1})
+    watcher = config.ConfigWatcher(path, current=config.load(path))
+    assert watcher.poll() is None
+
+    write(path, {"ping_interval": 3, "padding": "x"})
+    changed = watcher.poll()
+    assert changed is not None and changed.ping_interval == 3
+    assert watcher.poll() is None
+
+    write(path, {"ping_interval": "fast"})
+    assert watcher.poll() is None
+    assert watcher.error is not None and "ping_interval" in watcher.error
+    assert watcher.current == changed
+
+
+def test_write_config_preserves_probe_settings(path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "CONFIG_PATH", path)
+    write(path, {"username": "u", "password": "p", "probe_type": "http"})
+    monkeypatch.setattr("builtins.input", lambda prompt="": "user")
+    monkeypatch.setattr("getpass.getpass", lambda prompt="": 'pa"ss')
+    assert AIO_login.write_config() == ("user", 'pa"ss')
+    assert AIO_login.read_config() == ("user", 'pa"ss')
+    assert config.load(path).probe_type == "http"
+
+
+def test_invalid_monitor_field_keeps_credentials_and_settings(path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config, "CONFIG_PATH", path)
+    data = {"username": "u", "password": "p", "ping_target": ["a.com", "b.com"], "probe_quorum": 3,
+            "metrics_port": 9155, "history_db": "x.db"}
+    write(path, data)
+
+    def no_prompt(prompt: str = "") -> str:
+        raise AssertionError("不应重新询问账号密码")
+
+    monkeypatch.setattr("builtins.input", no_prompt)
+    monkeypatch.setattr("getpass.getpass", no_prompt)
+    assert AIO_login.read_config() == ("u", "p")
+    assert AIO_login.Operation(client=object()).username == "u"  # type: ignore[arg-type]
+    with open(path, encoding="utf8") as f:
+        assert json.load(f) == data
+
+    monkeypatch.setattr("builtins.input", lambda prompt="": "user")
+    monkeypatch.setattr("getpass.getpass", lambda prompt="": "pass")
+    assert AIO_login.write_config() == ("user", "pass")
+    with open(path, encoding="utf8") as f:
+        assert json.load(f) == {**data, "username": "user", "password": "pass"}
+    with pytest.raises(config.ConfigError):
+        config.load(path)
@@ -0,0 +1,100 @@
+import builtins
+import os
+import stat
+import subprocess
+import sys
+import threading
+from typing import Iterator
+
+import pytest
+
+import AIO_login
+import daemon
+from conftest import PASSWORD, ROOT, USERNAME, Portal
+
+
+@pytest.fixture
+def runtime(tmp_path: os.PathLike[str], monkeypatch: pytest.MonkeyPatch) -> str:
+    path = os.path.join(tmp_path, "run")
+    os.mkdir(path, 0o700)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", path)
+    return path
+
+
+@pytest.fixture
+def server(runtime: str, portal: Portal) -> Iterator[daemon.Daemon]:
+    instance = daemon.Daemon(handler=AIO_login.Operation(
+        portal.client, credentials=(USERNAME, PASSWORD), interactive=False))
+    listener = instance.bind()
+    thread = threading.Thread(target=instance.serve_forever, args=(listener,), daemon=True)
+    thread.start()
+    yield instance
+    instance.shutdown()
+    thread.join(2)
+
+
+def test_no_daemon(runtime: str) -> None:
+    assert daemon.request("status") is None
+
+
+def test_socket_private(server: daemon.Daemon) -> None:
+    mode = os.stat(server.address).st_mode
+    assert stat.S_ISSOCK(mode)
+    assert stat.S_IMODE(mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(server.address)).st_mode) == 0o700
+
+
+def test_rejects_shared_directory(runtime: str) -> None:
+    os.chmod(runtime, 0o777)
+    os.mkdir(os.path.join(runtime, "bit-connect"), 0o700)
+    os.chmod(os.path.join(runtime, "bit-connect"), 0o755)
+    with pytest.raises(daemon.ControlChannelError):
+        daemon.runtime_dir()
+    assert daemon.request("status") is None
+
+
+def test_commands(server: daemon.Daemon, portal: Portal) -> None:
+    assert daemon.request("status") == {
+        "ok": True, "result": {"online": False, "username": None, "breaker": "closed"}}
+    reply = daemon.request("login")
+    assert reply is not None and reply["ok"]
+    assert reply["result"]["username"] == USERNAME
+    assert daemon.request("status")["result"]["online"]  # type: ignore[index]
+    assert daemon.request("relogin") == {"ok": True, "result": {"state": "online"}}
+    assert daemon.request("logout")["ok"]  # type: ignore[index]
+    assert portal.state.online == {}
+
+
+def test_unknown_command(server: daemon.Daemon) -> None:
+    reply = daemon.request("rm -rf")
+    assert reply is not None and not reply["ok"] and reply["type"] == "ValueError"
+
+
+def test_wrong_password_is_error_reply(server: daemon.Daemon, portal: Portal,
+                                       monkeypatch: pytest.MonkeyPatch) -> None:
+    def no_prompt(*args: object) -> str:
+        raise AssertionError("daemon must not prompt")
+
+    monkeypatch.setattr(builtins, "input", no_prompt)
+    server.handler.password = "wrong-password"
+    reply = daemon.request("login")
+    assert reply is not None and reply["type"] == "WrongUserInfo"
+    assert portal.state.online == {}
+
+
+def test_garbage_does_not_kill_daemon(server: daemon.Daemon) -> None:
+    sock, _ = daemon._connect()
+    with sock:
+        sock.sendall(b"\x80\x04not json\n")
+    assert daemon.request("status")["ok"]  # type: ignore[index]
+
+
+def test_cli_forwards_without_heavy_imports(server: daemon.Daemon, runtime: str) -> None:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(ROOT, "AIO_login.py"), "-a", "status"],
+        capture_output=True, text=True, timeout=10, env={**os.environ, "XDG_RUNTIME_DIR": runtime})
+    assert result.returncode == 0, result.stderr
+    assert "当前未登录" in result.stdout
+    imported = {line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines()}
+    assert "requests" not in imported
+    assert "logging" not in imported
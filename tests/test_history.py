@@ -0,0 +1,74 @@
+import os
+import sqlite3
+from datetime import date, datetime, time, timedelta
+
+import history
+
+
+def at(days_ago: int, hour: int) -> float:
+    return datetime.combine(date.today() - timedelta(days=days_ago), time(hour)).timestamp()
+
+
+def test_buckets_older_than_retention_expire() -> None:
+    def days_ago(*days: int) -> list[date]:
+        return [date.today() - timedelta(days=d) for d in days]
+
+    outages = history.OutageHistory(retention_days=3)
+    for day in (5, 3, 2, 1):
+        outages.open("login", start=at(day, 12))
+    assert list(outages.days) == days_ago(3, 2, 1)
+
+    assert list(outages.today()) == []
+    assert list(outages.days) == days_ago(2, 1)
+    outages.open("relogin", start=at(0, 1))
+    assert list(outages.days) == days_ago(2, 1, 0)
+    assert len(outages) == 3
+
+
+def test_per_day_cap_keeps_latest() -> None:
+    outages = history.OutageHistory(per_day=3)
+    for hour in range(5):
+        outages.open(f"cause{hour}", start=at(0, hour))
+    assert [r.cause for r in outages.today()] == ["cause2", "cause3", "cause4"]
+    assert len(outages) == 3
+
+
+def test_today_in_start_order() -> None:
+    outages = history.OutageHistory()
+    outages.open("yesterday", start=at(1, 23))
+    for hour, cause in ((8, "login"), (9, "backoff"), (10, "relogin")):
+        outages.open(cause, start=at(0, hour))
+    assert [r.cause for r in outages.today()] == ["login", "backoff", "relogin"]
+    assert [r.start for r in outages.today()] == sorted(r.start for r in outages.today())
+
+
+def test_close_flushes_and_new_instance_reloads(tmp_path: os.PathLike[str]) -> None:
+    path = os.path.join(tmp_path, "history.db")
+    outages = history.OutageHistory(db_path=path)
+    first = outages.open("login", start=at(0, 8))
+    first.recovery = 0.5
+    outages.close(first, end=at(0, 8) + 3)
+    outages.open("relogin", start=at(0, 9))  # 未恢复的记录不写入
+
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT start, end, cause, recovery FROM outages").fetchall() == [
+            (at(0, 8), at(0, 8) + 3, "login", 0.5)]
+    outages.shutdown()
+
+    reloaded = history.OutageHistory(db_path=path)
+    records = list(reloaded.today())
+    assert [(r.cause, r.duration, r.recovery) for r in records] == [("login", 3.0, 0.5)]
+    reloaded.shutdown()
+
+
+def test_close_drops_rows_outside_retention(tmp_path: os.PathLike[str]) -> None:
+    path = os.path.join(tmp_path, "history.db")
+    with sqlite3.connect(path) as db:
+        db.execute("CREATE TABLE outages (start REAL PRIMARY KEY, end REAL, cause TEXT, recovery REAL)")
+        db.execute("INSERT INTO outages VALUES (?, ?, 'old', 0)", (at(10, 12), at(10, 12) + 1))
+    outages = history.OutageHistory(retention_days=3, db_path=path)
+    assert len(outages) == 0
+    outages.close(outages.open("login"))
+    with sqlite3.connect(path) as db:
+        assert [row[0] for row in db.execute("SELECT cause FROM outages")] == ["login"]
+    outages.shutdown()
@@ -0,0 +1,115 @@
+from typing import Iterator, Optional
+
+import pytest
+
+import AIO_login
+from conftest import fixture_text
+
+FIXTURE_IPS = {
+    "srun_portal_pc.html": "10.62.101.17",
+    "reordered_attrs.html": "10.62.33.4",
+}
+
+
+def split(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeResponse:
+    def __init__(self, url: str, body: bytes, encoding: Optional[str] = "utf-8") -> None:
+        self.url = url
+        self.body = body
+        self.encoding = encoding
+        self.read = 0
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        for i in range(0, len(self.body), chunk_size):
+            chunk = self.body[i:i + chunk_size]
+            self.read += len(chunk)
+            yield chunk
+
+
+class FakeClient:
+    def __init__(self, response: FakeResponse) -> None:
+        self.response = response
+
+    def get(self, path: str, deadline: object = None, **kwargs: object) -> FakeResponse:
+        assert kwargs.get("stream") is True
+        return self.response
+
+
+def portal(name: str, query: str = "ac_id=1&theme=bit") -> FakeClient:
+    return FakeClient(FakeResponse(
+        f"http://10.0.0.55/srun_portal_pc?{query}", fixture_text(name).encode("utf-8")))
+
+
+@pytest.mark.parametrize("name", FIXTURE_IPS)
+def test_scan_whole_page(name: str) -> None:
+    assert AIO_login.scan_user_ip([fixture_text(name)])[0] == FIXTURE_IPS[name]
+
+
+@pytest.mark.parametrize("name", FIXTURE_IPS)
+def test_scan_every_chunk_boundary(name: str) -> None:
+    text = fixture_text(name)
+    tag = text.index("user_ip")
+    # 覆盖标签被切在任意位置的情况，以及若干常规分块大小
+    for size in list(range(1, 64)) + [127, 512, AIO_login.HOMEPAGE_CHUNK]:
+        assert AIO_login.scan_user_ip(split(text, size))[0] == FIXTURE_IPS[name], size
+    for cut in range(max(tag - 80, 0), min(tag + 80, len(text))):
+        assert AIO_login.scan_user_ip([text[:cut], text[cut:]])[0] == FIXTURE_IPS[name], cut
+
+
+def test_scan_stops_after_user_ip() -> None:
+    text = fixture_text("srun_portal_pc.html")
+    ip, page = AIO_login.scan_user_ip(split(text, 256))
+    assert ip == "10.62.101.17"
+    assert len(page) < len(text) // 2
+
+
+def test_scan_misses_quoted_gt() -> None:
+    # 属性值中的 ">" 会截断快速扫描，应交给 HTMLParser 兜底
+    ip, page = AIO_login.scan_user_ip([fixture_text("fallback_quoted_gt.html")])
+    assert ip is None
+    assert page == fixture_text("fallback_quoted_gt.html")
+
+
+def test_parse_homepage_streams() -> None:
+    client = portal("srun_portal_pc.html")
+    assert AIO_login.parse_homepage(client) == ("10.62.101.17", "1")  # type: ignore[arg-type]
+    assert client.response.read < len(client.response.body)
+
+
+def test_parse_homepage_reordered_attrs() -> None:
+    client = portal("reordered_attrs.html", "theme=bit&ac_id=8")
+    assert AIO_login.parse_homepage(client) == ("10.62.33.4", "8")  # type: ignore[arg-type]
+
+
+def test_parse_homepage_fallback() -> None:
+    client = portal("fallback_quoted_gt.html")
+    assert AIO_login.parse_homepage(client) == ("10.62.77.9", "1")  # type: ignore[arg-type]
+
+
+def test_parse_homepage_multibyte_split() -> None:
+    # 中文内容按字节分块，增量解码器不能在多字节字符中间出错
+    response = FakeResponse("http://10.0.0.55/srun_portal_pc?ac_id=1",
+                            fixture_text("srun_portal_pc.html").encode("utf-8"))
+    body = response.body
+    response.iter_content = lambda chunk_size: iter(  # type: ignore[method-assign]
+        body[i:i + 7] for i in range(0, len(body), 7))
+    assert AIO_login.parse_homepage(FakeClient(response)) == ("10.62.101.17", "1")  # type: ignore[arg-type]
+
+
+def test_parse_homepage_missing_ip() -> None:
+    with pytest.raises(Exception, match="failed to get ip"):
+        AIO_login.parse_homepage(portal("no_user_ip.html"))  # type: ignore[arg-type]
+
+
+def test_parse_homepage_missing_ac_id() -> None:
+    with pytest.raises(Exception, match="failed to get acid"):
+        AIO_login.parse_homepage(portal("srun_portal_pc.html", "theme=bit"))  # type: ignore[arg-type]
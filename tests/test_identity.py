@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+import AIO_login
+from conftest import USERNAME, Portal
+
+HOMEPAGE = "/srun_portal_pc"
+STATUS = "/cgi-bin/rad_user_info"
+
+
+def status(portal: Portal) -> tuple[bool, object]:
+    """构造 User(使用身份缓存)并查询一次在线状态"""
+    user = AIO_login.User(USERNAME, "", portal.client)
+    return AIO_login.get_user_info(portal.client, ip=user.target_ip)
+
+
+def hits(portal: Portal) -> tuple[int, int]:
+    return portal.state.requests.get(HOMEPAGE, 0), portal.state.requests.get(STATUS, 0)
+
+
+def test_cached_identity_saves_homepage_round_trips(portal: Portal) -> None:
+    for _ in range(5):
+        assert status(portal) == (False, None)
+    assert hits(portal) == (1, 5)
+    assert portal.client.identity.get(portal.client) == ("127.0.0.1", "1")
+    assert hits(portal) == (1, 5)
+
+
+def test_ttl_expiry_refetches(portal: Portal) -> None:
+    portal.client.identity.ttl = 0.05
+    status(portal)
+    status(portal)
+    assert hits(portal) == (1, 2)
+    time.sleep(0.1)
+    status(portal)
+    assert hits(portal) == (2, 3)
+
+
+def test_local_address_change_refetches(portal: Portal, monkeypatch: pytest.MonkeyPatch) -> None:
+    status(portal)
+    monkeypatch.setattr(AIO_login, "local_address", lambda base=AIO_login.API_BASE: "10.1.2.3")
+    status(portal)
+    status(portal)
+    assert hits(portal) == (2, 3)
+
+
+def test_refresh_forces_refetch(portal: Portal) -> None:
+    cache = portal.client.identity
+    cache.get(portal.client)
+    cache.get(portal.client, refresh=True)
+    cache.get(portal.client)
+    assert hits(portal)[0] == 2
+
+
+def test_portal_rejection_invalidates(portal: Portal) -> None:
+    handler = AIO_login.Operation(portal.client, credentials=(USERNAME, "wrong"), interactive=False)
+    with pytest.raises(AIO_login.WrongUserInfo):
+        handler.login()
+    assert hits(portal) == (1, 1)
+    assert portal.handler.login()["error"] == "ok"
+    assert hits(portal) == (2, 2)  # 被拒绝后重新解析首页，之后照常使用缓存
+    status(portal)
+    assert hits(portal) == (2, 3)
@@ -0,0 +1,80 @@
+import liveness
+
+PROC_NET_DEV = """\
+Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo: 5000000   40000    0    0    0     0          0         0  5000000   40000    0    0    0     0       0          0
+  eth0: 1000000    2000    0    0    0     0          0        10   300000    1500    0    0    0     0       0          0
+ wlan0:  500000    1000    0    0    0     0          0         0   100000     500    0    0    0     0       0          0
+docker0:  900000     900    0    0    0     0          0         0   900000     900    0    0    0     0       0          0
+"""
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class Scripted:
+    """按预设序列返回入站字节数，每 1000 字节算一个包"""
+
+    def __init__(self, *values: int) -> None:
+        self.values = list(values)
+
+    def __call__(self) -> liveness.Counters:
+        value = self.values.pop(0)
+        return liveness.Counters(value, value // 1000, 0, 0)
+
+
+def test_proc_net_dev_skips_virtual_interfaces(tmp_path) -> None:
+    path = tmp_path / "dev"
+    path.write_text(PROC_NET_DEV, encoding="ascii")
+    assert liveness.ProcNetDevReader(str(path))() == liveness.Counters(1500000, 3000, 400000, 2000)
+    assert liveness.ProcNetDevReader(str(tmp_path / "missing"))() is None
+
+
+def make(reader: Scripted, clock: Clock, max_skip: float = 60) -> liveness.PassiveLiveness:
+    return liveness.PassiveLiveness(reader, min_rate=10_000, max_skip=max_skip, window=0.5,
+                                    clock=clock, sleep=clock.sleep)
+
+
+def test_skips_while_traffic_flows_and_stops_when_it_stalls() -> None:
+    clock = Clock()
+    # 每轮读取：上一轮之后的累计值、确认窗口后的累计值
+    passive = make(Scripted(0, 100_000, 110_000, 200_000, 210_000, 210_000), clock)
+    assert passive.check() is None  # 还没有上一轮的样本
+    clock.now += 5
+    assert passive.check() == 20_000  # 0.5 秒收到 10000 字节
+    clock.now += 5
+    assert passive.check() == 20_000
+    clock.now += 5
+    # 整轮平均速率够高，但确认窗口内没有再收到数据
+    assert passive.check() is None
+
+
+def test_idle_link_probes_without_waiting() -> None:
+    clock = Clock()
+    passive = make(Scripted(0, 1_000), clock)
+    passive.check()
+    clock.now += 5
+    assert passive.check() is None
+    assert clock.now == 5  # 没有进入确认窗口
+
+
+def test_active_probe_forced_after_max_skip() -> None:
+    clock = Clock()
+    passive = make(Scripted(0, 100_000, 110_000, 200_000, 300_000, 310_000), clock, max_skip=8)
+    passive.check()
+    clock.now += 5
+    assert passive.check() is not None
+    clock.now += 5
+    assert passive.check() is None  # 距上次主动探测已超过 8 秒
+    passive.probed()
+    clock.now += 5
+    assert passive.check() is not None
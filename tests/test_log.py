@@ -0,0 +1,91 @@
+import logging
+import queue
+
+import log
+
+
+class ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.messages: list[tuple[str, str]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages.append((record.levelname, record.getMessage()))
+
+
+def pipeline(size: int = 1024, window: float = 3600.0) -> tuple[
+        logging.Logger, log.BoundedQueueHandler, log.CollapsingListener, ListHandler]:
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(size)
+    source = log.BoundedQueueHandler(log_queue)
+    sink = ListHandler()
+    listener = log.CollapsingListener(log_queue, sink, source=source, window=window)
+    logger = logging.getLogger(f"test-{id(sink)}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(source)
+    return logger, source, listener, sink
+
+
+def test_collapse_repeated_messages() -> None:
+    logger, _, listener, sink = pipeline()
+    listener.start()
+    for i in range(100):
+        logger.info(f"探测判定：在线({i}ms)", extra={"collapse": "online"})
+    logger.info("离线3.0秒后恢复")
+    listener.stop()
+    assert sink.messages[0] == ("INFO", "探测判定：在线(0ms)")
+    assert sink.messages[1] == ("INFO", "离线3.0秒后恢复")
+    level, summary = sink.messages[2]
+    assert level == "INFO" and "×100" in summary and "探测判定：在线(99ms)" in summary
+    assert len(sink.messages) == 3
+
+
+def test_window_expiry_emits_summary() -> None:
+    logger, _, listener, sink = pipeline(window=0.0)
+    listener.start()
+    logger.info("a", extra={"collapse": "k"})
+    logger.info("a", extra={"collapse": "k"})
+    listener.stop()
+    # 窗口为0时每条都立即过期，不会被折叠
+    assert [m for _, m in sink.messages] == ["a", "a"]
+
+
+def test_keyed_warnings_collapse() -> None:
+    logger, _, listener, sink = pipeline()
+    listener.start()
+    for i in range(5):
+        logger.warning(f"恢复执行失败: PortalUnavailable {i}", extra={"collapse": "relogin-error"})
+    for _ in range(2):
+        logger.warning("门户不可达")
+    listener.stop()
+    assert sink.messages[:3] == [("WARNING", "恢复执行失败: PortalUnavailable 0"),
+                                 ("WARNING", "门户不可达"), ("WARNING", "门户不可达")]
+    level, summary = sink.messages[3]
+    assert level == "WARNING" and "×5" in summary and "PortalUnavailable 4" in summary
+    assert len(sink.messages) == 4
+
+
+def test_overload_drops_debug_before_info() -> None:
+    logger, source, listener, sink = pipeline(size=8)
+    # 监听线程未启动，队列只进不出
+    for i in range(4):
+        logger.info(f"info {i}")
+    for i in range(3):
+        logger.debug(f"debug {i}")
+    assert source.dropped == {"DEBUG": 3}
+    for i in range(6):
+        logger.info(f"info {i + 4}")
+    assert source.dropped == {"DEBUG": 3, "INFO": 2}
+    listener.start()
+    logger.warning("still delivered")
+    listener.stop()
+    messages = [m for _, m in sink.messages]
+    # 丢弃汇总在下一条记录写出前报告
+    assert sink.messages[0][0] == "WARNING"
+    assert "DEBUG 3条" in messages[0] and "INFO 2条" in messages[0]
+    assert messages[1:9] == [f"info {i}" for i in range(8)]
+    assert messages[-1] == "still delivered"
+
+
+def test_flush_without_listener() -> None:
+    log.flush(0.01)
@@ -0,0 +1,82 @@
+import json
+import urllib.error
+import urllib.request
+from typing import Iterator
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry() -> metrics.Registry:
+    registry = metrics.Registry()
+    registry.inc("bit_probe_total", result="ok")
+    registry.inc("bit_probe_total", result="ok")
+    registry.inc("bit_probe_total", 3, result="fail")
+    registry.set("bit_portal_breaker_state", 1)
+    for value in (0.003, 0.02, 0.02, 7.5):
+        registry.observe("bit_probe_seconds", value, target="a")
+    return registry
+
+
+@pytest.fixture
+def server(registry: metrics.Registry) -> Iterator[str]:
+    server = metrics.serve(0, registry)
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_prometheus_text(registry: metrics.Registry) -> None:
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE bit_probe_total counter" in lines
+    assert 'bit_probe_total{result="ok"} 2' in lines
+    assert 'bit_probe_total{result="fail"} 3' in lines
+    assert "# TYPE bit_portal_breaker_state gauge" in lines
+    assert "bit_portal_breaker_state 1" in lines
+
+    assert "# TYPE bit_probe_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith("bit_probe_seconds_bucket")]
+    assert len(buckets) == len(metrics.DEFAULT_BUCKETS) + 1
+    assert 'bit_probe_seconds_bucket{target="a",le="0.005"} 1' in buckets
+    assert 'bit_probe_seconds_bucket{target="a",le="0.025"} 3' in buckets
+    assert 'bit_probe_seconds_bucket{target="a",le="5"} 3' in buckets
+    assert 'bit_probe_seconds_bucket{target="a",le="10"} 4' in buckets
+    assert buckets[-1] == 'bit_probe_seconds_bucket{target="a",le="+Inf"} 4'
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts)
+    assert 'bit_probe_seconds_sum{target="a"} 7.543000' in lines
+    assert 'bit_probe_seconds_count{target="a"} 4' in lines
+
+
+def test_dict_export(registry: metrics.Registry) -> None:
+    data = json.loads(json.dumps(registry.to_dict()))
+    assert sorted(data["counters"]["bit_probe_total"], key=lambda s: s["value"]) == [
+        {"labels": {"result": "ok"}, "value": 2},
+        {"labels": {"result": "fail"}, "value": 3},
+    ]
+    assert data["gauges"]["bit_portal_breaker_state"] == [{"labels": {}, "value": 1}]
+    [hist] = data["histograms"]["bit_probe_seconds"]
+    assert hist["labels"] == {"target": "a"}
+    assert hist["buckets"]["0.025"] == 3 and hist["buckets"]["300"] == 4
+    assert hist["count"] == 4 and hist["sum"] == pytest.approx(7.543)
+
+
+def test_serve_endpoints(server: str) -> None:
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))  # 不经过环境中的代理
+    with opener.open(f"{server}/metrics", timeout=5) as res:
+        assert res.status == 200
+        assert res.headers["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+        assert 'bit_probe_total{result="ok"} 2' in res.read().decode()
+
+    with opener.open(f"{server}/metrics.json", timeout=5) as res:
+        assert res.status == 200
+        assert res.headers["Content-Type"] == "application/json"
+        assert json.load(res)["histograms"]["bit_probe_seconds"][0]["count"] == 4
+
+    with pytest.raises(urllib.error.HTTPError) as info:
+        opener.open(f"{server}/other", timeout=5)
+    assert info.value.code == 404
@@ -0,0 +1,211 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+import pytest
+
+import config
+import liveness
+import monitor
+import netevents
+import probe
+from conftest import USERNAME, Portal
+
+IP = "127.0.0.1"
+
+
+class GrowingCounters:
+    """每次读取增加 step 字节的计数器，step 为 0 即流量停滞"""
+
+    def __init__(self, step: int) -> None:
+        self.step = step
+        self.total = 0
+
+    def __call__(self) -> liveness.Counters:
+        self.total += self.step
+        return liveness.Counters(self.total, self.total // 1000, 0, 0)
+
+
+class ScriptedProbe(probe.Probe):
+    """按预设结果依次返回的探测器，用完后保持最后一个结果"""
+
+    def __init__(self, *results: bool) -> None:
+        super().__init__("scripted", timeout=0.1)
+        self.results = list(results)
+        self.closed = False
+
+    def _check(self) -> None:
+        ok = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if not ok:
+            raise probe.ProbeError("scripted failure")
+
+    def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def make(portal: Portal, tmp_path: os.PathLike[str]) -> Iterator[Callable[..., monitor.Monitor]]:
+    """按给定配置创建 Monitor，探测器替换为 ScriptedProbe(True)"""
+    created: list[monitor.Monitor] = []
+
+    def make(events: Optional[netevents.EventSource] = None,
+             counters: Optional[liveness.CounterReader] = None, **settings: object) -> monitor.Monitor:
+        path = os.path.join(tmp_path, "BITer.json")
+        with open(path, "w", encoding="utf8") as f:
+            json.dump({"ping_target": "127.0.0.1:9", "ping_interval": 3, "traffic_interval": 0,
+                       "net_events": "off", "passive_min_rate": 0, **settings}, f)
+        m = monitor.Monitor(portal.handler, config.load(path), config_path=path,
+                            events=events, counters=counters)
+        m.prober = ScriptedProbe(True)
+        m.start()
+        created.append(m)
+        return m
+
+    yield make
+    for m in created:
+        m.close()
+
+
+@pytest.fixture
+def mon(make: Callable[..., monitor.Monitor]) -> monitor.Monitor:
+    return make()
+
+
+def test_online_round_waits_probe_interval(mon: monitor.Monitor, portal: Portal) -> None:
+    assert mon.step() == monitor.Pause(3, "online")
+    assert mon.statistic["成功"] == 1
+    assert mon.handler.armed.due() is False
+    assert "/cgi-bin/srun_portal" not in portal.state.requests
+
+
+def test_logged_out_portal_logs_in_and_closes_outage(mon: monitor.Monitor, portal: Portal) -> None:
+    mon.prober = ScriptedProbe(False, True)
+    assert mon.step() == monitor.Pause(0, "recovered")
+    assert portal.state.online == {IP: USERNAME}
+    assert mon.outage is not None and mon.outage.cause == "login"
+
+    assert mon.step().reason == "online"
+    assert mon.outage is None
+    assert [r.cause for r in mon.outages.today()] == ["login"]
+
+
+def test_upstream_failure_backs_off_then_relogs_once(mon: monitor.Monitor, portal: Portal) -> None:
+    portal.state.online[IP] = USERNAME
+    mon.prober = ScriptedProbe(False)
+    delays = [mon.step() for _ in range(monitor.RELOGIN_AFTER_FAILURES - 1)]
+    assert [p.reason for p in delays] == ["backoff"] * len(delays)
+    assert delays[0].seconds < delays[1].seconds <= monitor.MAX_BACKOFF
+
+    assert mon.step().reason == "recovered"
+    assert mon.relogin_tried
+    assert portal.state.requests["/cgi-bin/srun_portal"] == 2  # 登出 + 登录
+    assert mon.step().reason == "backoff"
+    assert mon.statistic["跳过"] == monitor.RELOGIN_AFTER_FAILURES - 1 + 1
+
+
+def test_probe_settings_reloaded_from_file(mon: monitor.Monitor) -> None:
+    old = mon.prober
+    config.save({"ping_target": ["127.0.0.1:9", "127.0.0.1:10"], "ping_interval": 5},
+                mon.watcher.path)
+    mon.reload_config()
+    assert isinstance(mon.prober, probe.QuorumProbe)
+    assert isinstance(old, ScriptedProbe) and old.closed
+    assert mon.settings.ping_interval == 5
+
+
+def test_headless_run_stops(mon: monitor.Monitor) -> None:
+    mon.settings = mon.settings._replace(ping_interval=60)
+    summaries: list[int] = []
+    mon.on_summary = lambda m: summaries.append(m.checks)
+    thread = threading.Thread(target=mon.run)
+    thread.start()
+    while mon.checks == 0:
+        time.sleep(0.01)
+    mon.stop()
+    thread.join(2)
+    assert not thread.is_alive()
+    assert mon.checks == 1 and summaries == []
+
+
+def test_interval_fixed_without_event_source(mon: monitor.Monitor) -> None:
+    assert [mon.step().seconds for _ in range(4)] == [3] * 4
+
+
+def test_interval_relaxes_until_network_changes(make: Callable[..., monitor.Monitor], portal: Portal) -> None:
+    portal.state.online[IP] = USERNAME
+    source = netevents.FakeSource()
+    mon = make(source, ping_interval=1, ping_interval_max=8)
+    assert [mon.step().seconds for _ in range(5)] == [1, 2, 4, 8, 8]
+
+    source.emit("address", "eth0 IPv4 address added")
+    start = time.monotonic()
+    assert mon.sleep(30)
+    assert time.monotonic() - start < 2
+    assert mon.step().seconds == 1
+    assert mon.pending == []
+
+
+def test_probe_failure_resets_relaxed_interval(make: Callable[..., monitor.Monitor], portal: Portal) -> None:
+    portal.state.online[IP] = USERNAME
+    mon = make(netevents.FakeSource(), ping_interval=1, ping_interval_max=8)
+    mon.prober = ScriptedProbe(True, True, True, False, True)
+    assert [mon.step().seconds for _ in range(3)] == [1, 2, 4]
+    assert mon.step().reason == "backoff"
+    assert mon.step().seconds == 1
+
+
+def test_network_change_checks_portal_even_if_probe_succeeds(
+        make: Callable[..., monitor.Monitor], portal: Portal) -> None:
+    source = netevents.FakeSource()
+    mon = make(source)
+    source.emit("link", "eth0 up")
+    assert mon.step() == monitor.Pause(0, "recovered")
+    assert portal.state.online == {IP: USERNAME}
+
+    source.emit("link", "eth0 up")
+    assert mon.step().reason == "online"
+    assert portal.state.requests["/cgi-bin/srun_portal"] == 1
+
+
+def test_stop_wakes_sleep(mon: monitor.Monitor) -> None:
+    threading.Timer(0.05, mon.stop).start()
+    start = time.monotonic()
+    assert mon.sleep(30) is False
+    assert time.monotonic() - start < 1
+
+
+def test_inbound_traffic_skips_active_probe(make: Callable[..., monitor.Monitor]) -> None:
+    counters = GrowingCounters(10 ** 6)
+    mon = make(counters=counters, passive_min_rate=1024)
+    assert mon.passive is not None
+    mon.passive.window = 0.01
+    mon.prober = ScriptedProbe(False)  # 主动探测一定失败
+    assert mon.passive.check() is None  # 第一次读取没有可比较的样本
+    for _ in range(3):
+        assert mon.step().reason == "online"
+    assert mon.statistic["成功"] == 3 and mon.statistic["失败"] == 0
+
+    counters.step = 0  # 流量停滞，同一轮立即主动探测
+    assert mon.step().reason != "online"
+    assert mon.statistic["失败"] == 1
+
+
+def test_network_change_always_probes(make: Callable[..., monitor.Monitor]) -> None:
+    source = netevents.FakeSource()
+    mon = make(source, counters=GrowingCounters(10 ** 6), passive_min_rate=1024)
+    assert mon.passive is not None
+    mon.passive.window = 0.01
+    mon.prober = ScriptedProbe(False)
+    mon.passive.check()
+    source.emit("link", "eth0 down")
+    assert mon.step().reason != "online"
+
+
+def test_passive_rate_zero_disables(make: Callable[..., monitor.Monitor]) -> None:
+    mon = make(counters=GrowingCounters(10 ** 6))
+    assert mon.passive is None
+    config.save({"passive_min_rate": 2048}, mon.watcher.path)
+    mon.reload_config()
+    assert mon.passive is not None and mon.passive.min_rate == 2048
@@ -0,0 +1,103 @@
+import socket
+import struct
+import sys
+import threading
+
+import pytest
+
+import netevents
+
+
+def message(kind: int, body: bytes) -> bytes:
+    length = netevents.NLMSG_HEADER.size + len(body)
+    padding = b"\0" * (-length % 4)
+    return netevents.NLMSG_HEADER.pack(length, kind, 0, 0, 0) + body + padding
+
+
+def link(kind: int, index: int, flags: int, change: int) -> bytes:
+    return message(kind, netevents.IFINFO.pack(socket.AF_UNSPEC, 1, index, flags, change))
+
+
+def address(kind: int, family: int, index: int) -> bytes:
+    # 带一个 5 字节的属性，检查 4 字节对齐
+    return message(kind, netevents.IFADDR.pack(family, 24, 0, 0, index) + struct.pack("=HHB", 5, 1, 0))
+
+
+def test_parse_link_and_address_changes() -> None:
+    up = netevents.IFF_UP | netevents.IFF_RUNNING
+    data = b"".join([
+        link(netevents.RTM_NEWLINK, 1000, up, netevents.IFF_RUNNING),
+        link(netevents.RTM_NEWLINK, 1000, up, 0),  # 无线扩展事件，标志未变
+        link(netevents.RTM_NEWLINK, 1000, netevents.IFF_UP, netevents.IFF_RUNNING),
+        address(netevents.RTM_NEWADDR, socket.AF_INET, 1000),
+        address(netevents.RTM_DELADDR, socket.AF_INET6, 1000),
+        link(netevents.RTM_DELLINK, 1000, 0, 0),
+    ])
+    assert netevents.parse_netlink(data) == [
+        ("link", "#1000 up"),
+        ("link", "#1000 down"),
+        ("address", "#1000 IPv4 address added"),
+        ("address", "#1000 IPv6 address removed"),
+        ("link", "#1000 removed"),
+    ]
+    assert netevents.parse_netlink(data[:10]) == []
+
+
+def test_polling_source_reports_changes(monkeypatch: pytest.MonkeyPatch) -> None:
+    snapshots = iter([(("eth0",), "10.1.2.3"), (("eth0",), "10.1.2.3"),
+                      (("eth0", "wlan0"), "10.1.2.3"), (("eth0", "wlan0"), "10.9.9.9")])
+    source = netevents.PollingSource("10.0.0.55", interval=0.01)
+    monkeypatch.setattr(source, "snapshot", lambda: next(snapshots, (("eth0", "wlan0"), "10.9.9.9")))
+    events: list[netevents.NetworkEvent] = []
+    got_both = threading.Event()
+
+    def collect(event: netevents.NetworkEvent) -> None:
+        events.append(event)
+        if len(events) == 2:
+            got_both.set()
+
+    source.start(collect)
+    assert got_both.wait(2)
+    source.close()
+    assert source.thread is not None
+    source.thread.join(1)
+    assert [(e.kind, e.detail) for e in events] == [
+        ("link", "interfaces eth0, wlan0"),
+        ("address", "local address 10.1.2.3 -> 10.9.9.9"),
+    ]
+
+
+def test_local_address_sends_nothing() -> None:
+    assert netevents.local_address("127.0.0.1") == "127.0.0.1"
+
+
+def test_create_source() -> None:
+    assert netevents.create_source("off", "10.0.0.55") is None
+    with pytest.raises(ValueError):
+        netevents.create_source("inotify", "10.0.0.55")
+    source = netevents.create_source("poll", "10.0.0.55")
+    assert isinstance(source, netevents.PollingSource)
+    source.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="netlink 只在 Linux 上可用")
+def test_netlink_source_closes_promptly() -> None:
+    try:
+        source = netevents.NetlinkSource()
+    except OSError as e:
+        pytest.skip(f"无法订阅 netlink: {e}")
+    source.start(lambda event: None)
+    source.close()
+    assert source.thread is not None
+    source.thread.join(1)
+    assert not source.thread.is_alive()
+
+
+def test_fake_source_silent_after_close() -> None:
+    events: list[netevents.NetworkEvent] = []
+    source = netevents.FakeSource()
+    source.start(events.append)
+    source.emit("link", "eth0 down")
+    source.close()
+    source.emit("link", "eth0 up")
+    assert [e.detail for e in events] == ["eth0 down"]
@@ -0,0 +1,48 @@
+from conftest import USERNAME, Portal
+
+IP = "127.0.0.1"
+
+
+def test_prearmed_login_sends_single_request(portal: Portal) -> None:
+    assert portal.handler.prearm()
+    assert not portal.handler.armed.due()
+    assert not portal.handler.prearm()
+    before = dict(portal.state.requests)
+
+    res = portal.handler.login()
+    assert res["error"] == "ok" and res["username"] == USERNAME
+    assert portal.state.online == {IP: USERNAME}
+    sent = {path: n - before.get(path, 0) for path, n in portal.state.requests.items()}
+    assert {path: n for path, n in sent.items() if n} == {"/cgi-bin/srun_portal": 1}
+
+
+def test_stale_challenge_falls_back_to_full_flow(portal: Portal) -> None:
+    assert portal.handler.prearm()
+    portal.state.challenges[IP] = ("replaced", portal.state.challenges[IP][1])
+
+    assert portal.handler.login()["error"] == "ok"
+    assert portal.state.online == {IP: USERNAME}
+    assert portal.state.requests["/cgi-bin/srun_portal"] == 2
+
+
+def test_expired_params_not_sent(portal: Portal) -> None:
+    assert portal.handler.prearm()
+    portal.handler.armed.ttl = 0.0
+
+    assert portal.handler.login()["error"] == "ok"
+    assert portal.state.requests["/cgi-bin/srun_portal"] == 1
+    assert portal.state.requests["/cgi-bin/get_challenge"] == 2
+
+
+def test_params_are_single_use(portal: Portal) -> None:
+    assert portal.handler.prearm()
+    portal.handler.login()
+    portal.handler.logout()
+    assert portal.handler.armed.due()
+    assert portal.handler.armed.take(IP) is None
+
+
+def test_prearm_failure_is_silent(portal: Portal) -> None:
+    portal.state.error_rate = 1.0
+    assert not portal.handler.prearm()
+    assert portal.handler.armed.due()
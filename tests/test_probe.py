@@ -0,0 +1,143 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import probe
+
+
+@pytest.fixture
+def hanging_resolver(monkeypatch: pytest.MonkeyPatch) -> threading.Event:
+    release = threading.Event()
+
+    def getaddrinfo(*args: object, **kwargs: object) -> list[object]:
+        release.wait(5)
+        raise socket.gaierror("released")
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    yield release
+    release.set()
+
+
+@pytest.mark.parametrize("probe_class", [probe.DNSProbe, probe.TCPProbe, probe.HTTPProbe])
+def test_resolve_bounded_by_timeout(probe_class: type[probe.Probe],
+                                    hanging_resolver: threading.Event) -> None:
+    start = time.monotonic()
+    result = probe_class("stuck.example", timeout=0.2).probe()
+    assert not result.ok
+    assert "timed out" in result.error
+    assert time.monotonic() - start < 1.0
+
+
+def test_tcp_probe_local_listener() -> None:
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        port = server.getsockname()[1]
+        assert probe.TCPProbe(f"127.0.0.1:{port}", timeout=1.0).probe().ok
+    assert not probe.TCPProbe(f"127.0.0.1:{port}", timeout=1.0).probe().ok
+
+
+def test_http_probe_sends_original_host() -> None:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    hosts: list[str] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self) -> None:
+            hosts.append(self.headers["Host"])
+            self.send_response(204 if self.path == "/generate_204" else 404)
+            self.end_headers()
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        assert probe.HTTPProbe(f"http://localhost:{port}/generate_204", timeout=1.0).probe().ok
+        result = probe.HTTPProbe(f"localhost:{port}", timeout=1.0).probe()
+        assert not result.ok and result.error == "HTTP 404"
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert hosts == [f"localhost:{port}"] * 2
+
+
+def test_icmp_rejected_when_unsupported(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(probe.sys, "platform", "win32")
+    with pytest.raises(ValueError, match="ICMP"):
+        probe.create_probe("icmp", "10.0.0.55")
+    with pytest.raises(ValueError, match="ICMP"):
+        probe.create_prober("icmp", ["10.0.0.55", "114.114.114.114"])
+
+
+def test_unknown_probe_type() -> None:
+    with pytest.raises(ValueError, match="未知的探测类型"):
+        probe.create_probe("carrier-pigeon", "10.0.0.55")
+
+
+class StubProbe(probe.Probe):
+    """按设定结果返回的子探测器，delay 秒后才完成"""
+
+    def __init__(self, target: str, ok: bool, delay: float = 0.0) -> None:
+        super().__init__(target, timeout=delay + 0.1)
+        self.ok = ok
+        self.delay = delay
+        self.finished = threading.Event()
+
+    def _check(self) -> None:
+        try:
+            time.sleep(self.delay)
+            if not self.ok:
+                raise probe.ProbeError("stub failure")
+        finally:
+            self.finished.set()
+
+
+def quorum_verdict(results: list[bool], quorum: int | None) -> bool:
+    prober = probe.QuorumProbe([StubProbe(f"t{i}", ok) for i, ok in enumerate(results)], quorum)
+    try:
+        return prober.probe().ok
+    finally:
+        prober.close()
+
+
+@pytest.mark.parametrize("results, quorum, online", [
+    ([True, False, False], 2, False),
+    ([True, True, False], 2, True),
+    ([False, False, False], 3, False),
+    ([True, False, False], 3, True),
+    ([True, False, False], None, True),   # 缺省为全部目标：任一成功即在线
+    ([False, False, False], None, False),
+    ([True, True, False], 1, False),      # 任一失败即离线
+    ([True, True, True], 1, True),
+    ([True, True, False], 9, True),       # 超出目标数时按全部目标计
+])
+def test_quorum_verdict(results: list[bool], quorum: int | None, online: bool) -> None:
+    assert quorum_verdict(results, quorum) is online
+
+
+def test_quorum_returns_before_slow_target() -> None:
+    slow = StubProbe("slow", False, delay=1.0)
+    prober = probe.QuorumProbe([StubProbe("fast", True), slow, StubProbe("fail", False)])
+    start = time.monotonic()
+    result = prober.probe()
+    assert result.ok
+    assert time.monotonic() - start < 0.5
+    assert not slow.finished.is_set()
+    assert "slow" not in prober.last_results
+    prober.close()
+
+
+def test_quorum_failure_verdict_does_not_wait() -> None:
+    slow = StubProbe("slow", True, delay=1.0)
+    prober = probe.QuorumProbe([StubProbe("a", False), StubProbe("b", False), slow], quorum=2)
+    start = time.monotonic()
+    result = prober.probe()
+    assert not result.ok and "stub failure" in result.error
+    assert time.monotonic() - start < 0.5
+    assert not slow.finished.is_set()
+    prober.close()
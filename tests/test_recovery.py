@@ -0,0 +1,53 @@
+import time
+
+import recovery
+from conftest import USERNAME, Portal
+
+IP = "127.0.0.1"
+
+
+def test_login_from_offline(portal: Portal) -> None:
+    machine = recovery.RecoveryMachine(portal.handler)
+    assert machine.run() is recovery.State.ONLINE
+    assert portal.state.online == {IP: USERNAME}
+    assert [s for s, _ in machine.timings] == [
+        recovery.State.DETECTED, recovery.State.CHECK_STATE,
+        recovery.State.LOGIN, recovery.State.VERIFY]
+
+
+def test_force_logout_when_online(portal: Portal) -> None:
+    portal.state.online[IP] = USERNAME
+    machine = recovery.RecoveryMachine(portal.handler)
+    assert machine.run(force_logout=True) is recovery.State.ONLINE
+    assert recovery.State.LOGOUT in [s for s, _ in machine.timings]
+    assert portal.state.requests["/cgi-bin/srun_portal"] == 2
+
+
+def test_login_step_bounded_by_policy_timeout(portal: Portal) -> None:
+    # 每个请求 0.2s，一次登录至少要 4 个请求，0.3s 的步骤时限必然超时
+    portal.state.latency = 0.2
+    machine = recovery.RecoveryMachine(portal.handler, policies={
+        recovery.State.LOGIN: recovery.StepPolicy(0.3, retries=0)})
+    start = time.monotonic()
+    assert machine.run(start=recovery.State.LOGIN) is recovery.State.TIMEOUT
+    assert time.monotonic() - start < 1.0
+    assert portal.state.online == {}
+
+
+def test_timeout_skips_retries_without_budget(portal: Portal) -> None:
+    portal.state.latency = 0.2
+    machine = recovery.RecoveryMachine(portal.handler, budget=0.5, policies={
+        recovery.State.LOGIN: recovery.StepPolicy(0.3, retries=5, retry_delay=0.0)})
+    start = time.monotonic()
+    assert machine.run(start=recovery.State.LOGIN) is recovery.State.TIMEOUT
+    assert time.monotonic() - start < 0.8
+    # 第一次尝试超时后剩余时间不足 0.3s，不会再发起第二次登录
+    assert portal.state.requests.get("/cgi-bin/get_challenge", 0) <= 1
+
+
+def test_non_timeout_failure_is_failed(portal: Portal) -> None:
+    # 门户拒绝登录但及时响应，确认在线失败属于 FAILED 而非 TIMEOUT
+    portal.state.accounts = {}
+    machine = recovery.RecoveryMachine(portal.handler, policies={
+        recovery.State.VERIFY: recovery.StepPolicy(0.5)})
+    assert machine.run(start=recovery.State.LOGIN) is recovery.State.FAILED
@@ -0,0 +1,152 @@
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+import pytest
+
+import AIO_login
+import recovery
+import singleflight
+from conftest import ROOT, USERNAME, Portal
+
+IP = "127.0.0.1"
+
+HOLDER = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+import singleflight
+lock = singleflight.shared_lock()
+assert lock.acquire(5)
+print("locked", flush=True)
+time.sleep(float(sys.argv[2]))
+if sys.argv[3] == "record":
+    lock.record("login", sys.argv[4], True, {"error": "ok", "online_ip": "127.0.0.1"})
+lock.release()
+"""
+
+
+@pytest.fixture
+def holder() -> Iterator:
+    """在另一个进程中持有登录锁"""
+    procs: list[subprocess.Popen[str]] = []
+
+    def start(hold: float, record: bool = False) -> subprocess.Popen[str]:
+        proc = subprocess.Popen(
+            [sys.executable, "-c", HOLDER, ROOT, str(hold), "record" if record else "-", USERNAME],
+            stdout=subprocess.PIPE, text=True)
+        assert proc.stdout is not None and proc.stdout.readline().strip() == "locked"
+        procs.append(proc)
+        return proc
+
+    yield start
+    for proc in procs:
+        proc.wait(5)
+
+
+def test_concurrent_calls_share_one_execution() -> None:
+    flight: singleflight.SingleFlight[int] = singleflight.SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def work() -> int:
+        calls.append(1)
+        gate.wait(2)
+        return 42
+
+    with ThreadPoolExecutor(6) as pool:
+        futures = [pool.submit(flight.do, "k", work) for _ in range(6)]
+        while not flight.in_flight("k"):
+            time.sleep(0.01)
+        time.sleep(0.1)
+        gate.set()
+        assert [f.result() for f in futures] == [42] * 6
+    assert len(calls) == 1
+    assert not flight.in_flight("k")
+
+
+def test_errors_reach_every_waiter() -> None:
+    flight: singleflight.SingleFlight[int] = singleflight.SingleFlight()
+    gate = threading.Event()
+
+    def fail() -> int:
+        gate.wait(2)
+        raise ValueError("portal down")
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flight.do, "k", fail) for _ in range(3)]
+        time.sleep(0.1)
+        gate.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_concurrent_logins_send_one_request(portal: Portal) -> None:
+    portal.state.latency = 0.05
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: portal.handler.login(), range(4)))
+    assert all(r["error"] == "ok" for r in results)
+    assert portal.state.requests["/cgi-bin/srun_portal"] == 1
+    assert portal.state.online == {IP: USERNAME}
+
+
+def test_login_during_recovery_does_not_deadlock(portal: Portal) -> None:
+    portal.state.latency = 0.05
+    machine = recovery.RecoveryMachine(portal.handler)
+    with ThreadPoolExecutor(2) as pool:
+        recovering = pool.submit(machine.run)
+        time.sleep(0.02)
+        logging_in = pool.submit(portal.handler.login)
+        assert recovering.result(10) is recovery.State.ONLINE
+        try:
+            logging_in.result(10)
+        except AIO_login.AlreadyOnlineException:
+            pass
+    assert portal.state.requests["/cgi-bin/srun_portal"] == 1
+
+
+def test_reuses_login_finished_by_other_process(portal: Portal, holder) -> None:
+    holder(0.3, record=True)
+    res = portal.handler.login()
+    assert res["error"] == "ok"
+    assert "/cgi-bin/srun_portal" not in portal.state.requests
+
+
+def test_recovery_only_verifies_after_other_process_login(portal: Portal, holder) -> None:
+    portal.state.online[IP] = USERNAME
+    holder(0.3, record=True)
+    machine = recovery.RecoveryMachine(portal.handler)
+    assert machine.run(force_logout=True) is recovery.State.ONLINE
+    assert [s for s, _ in machine.timings] == [recovery.State.VERIFY]
+    assert "/cgi-bin/srun_portal" not in portal.state.requests
+
+
+def test_earlier_login_is_not_reused(portal: Portal) -> None:
+    lock = singleflight.shared_lock()
+    assert lock is not None and lock.acquire(1)
+    lock.record("login", USERNAME, True, {"error": "ok"})
+    lock.release()
+    time.sleep(0.01)
+    portal.handler.login()
+    assert portal.state.requests["/cgi-bin/srun_portal"] == 1
+
+
+def test_logout_invalidates_record(portal: Portal) -> None:
+    portal.handler.login()
+    portal.handler.logout()
+    lock = singleflight.shared_lock()
+    assert lock is not None
+    last = lock.last_result()
+    assert last is not None and last.action == "logout" and last.ok
+    assert lock.reusable_login(USERNAME, 0) is None
+
+
+def test_waiting_for_other_process_counts_against_budget(portal: Portal, holder) -> None:
+    holder(1.0)
+    start = time.monotonic()
+    with pytest.raises(AIO_login.PortalTimeout):
+        portal.handler.login(budget=0.2)
+    assert time.monotonic() - start < 0.6
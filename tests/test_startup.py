@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+
+def imported_modules(code: str, cwd: str = ROOT) -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, capture_output=True, text=True, timeout=30,
+        env={**os.environ, "PYTHONPATH": ROOT})
+    assert result.returncode == 0, result.stderr
+    return {line.rsplit("|", 1)[-1].strip()
+            for line in result.stderr.splitlines() if line.startswith("import time:")}
+
+
+@pytest.mark.parametrize("module, forbidden", [
+    ("AIO_login", {"requests", "asyncio", "html.parser", "calendar", "getpass", "http.server"}),
+    ("daemon", {"logging", "requests", "AIO_login"}),
+    ("history", {"sqlite3"}),
+    ("metrics", {"http.server"}),
+    ("probe", {"http.client", "subprocess"}),
+    ("monitor", {"requests", "asyncio", "http.server", "sqlite3", "msvcrt"}),
+    ("Network_Alive", {"requests", "asyncio", "http.server", "sqlite3", "msvcrt"}),
+])
+def test_heavy_imports_deferred(module: str, forbidden: set[str]) -> None:
+    assert not imported_modules(f"import {module}") & forbidden
+
+
+def test_import_log_keeps_cwd(tmp_path: os.PathLike[str]) -> None:
+    result = subprocess.run(
+        [sys.executable, "-c", "import os, log; print(os.getcwd())"],
+        cwd=tmp_path, capture_output=True, text=True, timeout=30,
+        env={**os.environ, "PYTHONPATH": ROOT})
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == str(tmp_path)
+    assert not os.path.exists(os.path.join(tmp_path, "logs"))
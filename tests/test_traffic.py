@@ -0,0 +1,95 @@
+import os
+from datetime import datetime
+
+import pytest
+
+import traffic
+from conftest import Portal
+
+GIB = traffic.GIB
+
+
+def sample(ts: float, used: int) -> traffic.Sample:
+    return traffic.Sample(ts, used, 0, 3600, 10.0, 0.0)
+
+
+def test_store_append_and_tail(tmp_path) -> None:
+    store = traffic.TrafficStore(str(tmp_path / "traffic.dat"))
+    for i in range(5):
+        store.append(sample(1000.0 + i, i * 100))
+    assert len(store) == 5
+    assert [s.sum_bytes for s in store.tail(2)] == [300, 400]
+    assert store[0].time == 1000.0
+    assert store[-1] == sample(1004.0, 400)
+    assert len(traffic.TrafficStore(store.path)) == 5
+
+
+def test_partial_record_ignored_and_overwritten(tmp_path) -> None:
+    store = traffic.TrafficStore(str(tmp_path / "traffic.dat"))
+    store.append(sample(1000.0, 1))
+    with open(store.path, "ab") as f:
+        f.write(b"\x00" * (traffic.RECORD.size // 2))
+    assert len(store) == 1
+    assert store.tail(5) == [sample(1000.0, 1)]
+
+    store.append(sample(1001.0, 2))
+    assert os.path.getsize(store.path) == traffic.HEADER.size + 2 * traffic.RECORD.size
+    assert store.tail(2) == [sample(1000.0, 1), sample(1001.0, 2)]
+
+
+def test_foreign_file_rejected(tmp_path) -> None:
+    path = tmp_path / "traffic.dat"
+    path.write_bytes(b"not a traffic file")
+    with pytest.raises(ValueError):
+        traffic.TrafficStore(str(path))
+
+
+def test_tracker_rate_and_counter_reset() -> None:
+    tracker = traffic.UsageTracker(alpha=0.5)
+    tracker.update(sample(0.0, 0))
+    assert tracker.recent_rate is None
+    tracker.update(sample(10.0, 1000))
+    assert tracker.recent_rate == 100.0
+    tracker.update(sample(20.0, 3000))
+    assert tracker.recent_rate == 150.0
+    tracker.update(sample(30.0, 0))
+    assert tracker.recent_rate is None
+
+
+def test_from_store_reads_only_tail(tmp_path) -> None:
+    store = traffic.TrafficStore(str(tmp_path / "traffic.dat"))
+    for i in range(10):
+        store.append(sample(i * 10.0, i * 1000))
+    tracker = traffic.UsageTracker.from_store(store)
+    assert tracker.last == store[-1]
+    assert tracker.recent_rate == 100.0
+
+
+def test_projection_by_month_average() -> None:
+    start = datetime(2026, 4, 1).timestamp()  # 30 天
+    now = start + 10 * 86400
+    tracker = traffic.UsageTracker()
+    tracker.update(sample(now, 80 * GIB))
+    projection = tracker.projection()
+    assert projection is not None
+    assert projection.projected_bytes == pytest.approx(240 * GIB)
+    assert projection.over_quota
+    assert any("将超出" in line for line in traffic.describe(projection, now=now))
+
+
+def test_projection_without_samples() -> None:
+    assert traffic.UsageTracker().projection() is None
+
+
+def test_sampler_against_portal(portal: Portal, tmp_path) -> None:
+    store = traffic.TrafficStore(str(tmp_path / "traffic.dat"))
+    sampler = traffic.TrafficSampler(portal.client, store, interval=1.0)
+    assert sampler.sample_once() is None
+    assert len(store) == 0
+
+    portal.handler.login()
+    portal.state.usage["127.0.0.1"] = 5 * GIB
+    first = sampler.sample_once()
+    assert first is not None and first.sum_bytes == 5 * GIB
+    assert store.tail(1) == [first]
+    assert sampler.tracker.last == first
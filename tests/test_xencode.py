@@ -0,0 +1,21 @@
+import json
+import os
+
+import pytest
+
+import AIO_login
+from conftest import FIXTURES
+
+# 由优化前的 xencode/fkbase64 生成（见 benchmarks/bench_xencode.py 中保留的旧实现），
+# 覆盖空消息、空密钥、短密钥、非ASCII与1~160字节的随机消息
+with open(os.path.join(FIXTURES, "xencode_golden.json"), encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+@pytest.mark.parametrize("vector", GOLDEN, ids=range(len(GOLDEN)))
+def test_golden_vector(vector: dict[str, str]) -> None:
+    assert AIO_login.fkbase64(AIO_login.xencode(vector["msg"], vector["key"])) == vector["out"]
+
+
+def test_empty_message() -> None:
+    assert AIO_login.xencode("", "token") == ""
@@ -0,0 +1,248 @@
+# encoding = utf-8
+# traffic
+"""流量使用时间序列
+
+以较低频率轮询 rad_user_info，把每次采样追加到定长记录文件：
+
+    文件头 16 字节: b"BITTRAF1" + 记录长度(uint32) + 保留
+    每条记录 48 字节: 时间戳(double) sum_bytes remain_bytes sum_seconds(uint64)
+                      user_balance wallet_balance(double)
+
+只追加、不改写，异常退出留下的半条记录在读取时忽略。
+UsageTracker 逐条更新速率(EWMA)并给出月底用量预测，
+启动时只读取文件末尾的两条记录，不扫描历史。
+
+`AIO_login.py -a query` 直接从这里读取并输出，只有没有记录或记录过旧时才访问门户。
+Network_Alive 的采样间隔在 BITer.json 中以 traffic_interval(秒，0 为关闭) 设置。
+"""
+import calendar
+import os
+import re
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import AIO_login
+
+MAGIC = b"BITTRAF1"
+HEADER = struct.Struct("<8sI4x")
+RECORD = struct.Struct("<dQQQdd")
+DEFAULT_STORE: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traffic.dat")
+DEFAULT_INTERVAL: float = 300.0
+MONTHLY_QUOTA: int = 200 * 1024 ** 3  # 每月免费流量(字节)
+RATE_ALPHA: float = 0.3  # 近期速率 EWMA 的权重
+GIB = 1024 ** 3
+
+
+class Sample(NamedTuple):
+    time: float  # Unix 时间戳
+    sum_bytes: int  # 本月已用流量
+    remain_bytes: int
+    sum_seconds: int  # 本月在线时长
+    user_balance: float
+    wallet_balance: float
+
+
+class TrafficStore:
+    """定长记录的只追加文件"""
+
+    def __init__(self, path: str = DEFAULT_STORE) -> None:
+        """
+        Raises:
+            ValueError: 文件头不匹配
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, RECORD.size))
+        with open(path, "rb") as f:
+            magic, size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or size != RECORD.size:
+            raise ValueError(f"{path} 不是流量记录文件")
+
+    def __len__(self) -> int:
+        return (os.path.getsize(self.path) - HEADER.size) // RECORD.size
+
+    def append(self, sample: Sample) -> None:
+        data = RECORD.pack(*sample)
+        with self.lock, open(self.path, "r+b") as f:
+            # 从最后一条完整记录之后写入，覆盖可能残留的半条记录
+            f.seek(HEADER.size + len(self) * RECORD.size)
+            f.write(data)
+            f.truncate()
+
+    def tail(self, count: int = 1) -> list[Sample]:
+        """读取最后 count 条记录
+
+        Returns:
+            list[Sample]: 按时间先后排列
+        """
+        total = len(self)
+        count = min(count, total)
+        if count <= 0:
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(HEADER.size + (total - count) * RECORD.size)
+            data = f.read(count * RECORD.size)
+        return [Sample(*fields) for fields in RECORD.iter_unpack(data)]
+
+    def __getitem__(self, index: int) -> Sample:
+        total = len(self)
+        if index < 0:
+            index += total
+        if not 0 <= index < total:
+            raise IndexError(index)
+        with open(self.path, "rb") as f:
+            f.seek(HEADER.size + index * RECORD.size)
+            return Sample(*RECORD.unpack(f.read(RECORD.size)))
+
+
+class Projection(NamedTuple):
+    sample: Sample
+    recent_rate: Optional[float]  # 近期速率(字节/秒)，样本不足时为None
+    month_rate: float  # 本月平均速率(字节/秒)
+    projected_bytes: float  # 按本月平均速率推算的月底用量
+    quota: int
+
+    @property
+    def over_quota(self) -> bool:
+        return self.projected_bytes > self.quota
+
+
+def month_bounds(timestamp: float) -> tuple[float, float]:
+    """所在自然月的开始与结束时间戳(本地时间)"""
+    now = datetime.fromtimestamp(timestamp)
+    start = datetime(now.year, now.month, 1)
+    days = calendar.monthrange(now.year, now.month)[1]
+    return start.timestamp(), start.timestamp() + days * 86400
+
+
+class UsageTracker:
+    """逐条更新的速率与月底预测，不保留历史"""
+
+    def __init__(self, quota: int = MONTHLY_QUOTA, alpha: float = RATE_ALPHA) -> None:
+        self.quota = quota
+        self.alpha = alpha
+        self.last: Optional[Sample] = None
+        self.recent_rate: Optional[float] = None
+
+    @classmethod
+    def from_store(cls, store: TrafficStore, quota: int = MONTHLY_QUOTA) -> "UsageTracker":
+        """用文件末尾的记录恢复状态"""
+        tracker = cls(quota)
+        for sample in store.tail(2):
+            tracker.update(sample)
+        return tracker
+
+    def update(self, sample: Sample) -> None:
+        last = self.last
+        self.last = sample
+        if last is None or sample.time <= last.time:
+            return
+        if sample.sum_bytes < last.sum_bytes:
+            # 月初清零或门户重置计数
+            self.recent_rate = None
+            return
+        rate = (sample.sum_bytes - last.sum_bytes) / (sample.time - last.time)
+        if self.recent_rate is None:
+            self.recent_rate = rate
+        else:
+            self.recent_rate += self.alpha * (rate - self.recent_rate)
+
+    def projection(self) -> Optional[Projection]:
+        """按最新样本推算月底用量
+
+        Returns:
+            Optional[Projection]: 尚无样本时为None
+        """
+        sample = self.last
+        if sample is None:
+            return None
+        start, end = month_bounds(sample.time)
+        month_rate = sample.sum_bytes / max(sample.time - start, 1.0)
+        projected = sample.sum_bytes + month_rate * max(end - sample.time, 0.0)
+        return Projection(sample, self.recent_rate, month_rate, projected, self.quota)
+
+
+def fetch_sample(client: "AIO_login.PortalClient", timeout: Optional[float] = None) -> Optional[Sample]:
+    """查询一次 rad_user_info
+
+    Returns:
+        Optional[Sample]: 未登录时为None
+    """
+    import json
+
+    response = client.get("/cgi-bin/rad_user_info", params={"callback": "jsonp"}, timeout=timeout)
+    match = re.search(r"\{[\s\S]*\}", response.text)
+    if match is None:
+        return None
+    detail = json.loads(match.group())
+    if detail.get("error", "ok") != "ok":
+        return None
+    return Sample(
+        time.time(),
+        int(detail.get("sum_bytes") or 0),
+        int(detail.get("remain_bytes") or 0),
+        int(detail.get("sum_seconds") or 0),
+        float(detail.get("user_balance") or 0),
+        float(detail.get("wallet_balance") or 0),
+    )
+
+
+class TrafficSampler(threading.Thread):
+    """后台定期采样"""
+
+    def __init__(self, client: "AIO_login.PortalClient", store: TrafficStore,
+                 interval: float = DEFAULT_INTERVAL, tracker: Optional[UsageTracker] = None) -> None:
+        super().__init__(daemon=True, name="traffic")
+        self.client = client
+        self.store = store
+        self.interval = interval
+        self.tracker = tracker or UsageTracker.from_store(store)
+        self._stopped = threading.Event()
+
+    def sample_once(self) -> Optional[Sample]:
+        """采样一次并写入
+
+        Returns:
+            Optional[Sample]: 未登录或门户不可达时为None
+        """
+        try:
+            sample = fetch_sample(self.client, timeout=min(self.interval, 5.0))
+        except Exception:
+            return None
+        if sample is not None:
+            self.store.append(sample)
+            self.tracker.update(sample)
+        return sample
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            self.sample_once()
+            self._stopped.wait(self.interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def describe(projection: Projection, now: Optional[float] = None) -> list[str]:
+    """生成 -a query 的输出
+
+    Returns:
+        list[str]: 每行一条
+    """
+    sample = projection.sample
+    age = (time.time() if now is None else now) - sample.time
+    recent = "样本不足" if projection.recent_rate is None else f"{projection.recent_rate / 1024:.1f} KiB/s"
+    verdict = "将超出" if projection.over_quota else "不会超出"
+    return [
+        f"本月已用 {sample.sum_bytes / GIB:.2f} GiB / {projection.quota / GIB:.0f} GiB，"
+        f"在线 {sample.sum_seconds / 3600:.1f} 小时，余额 {sample.user_balance:.2f}+{sample.wallet_balance:.2f} 元",
+        f"近期速率 {recent}，本月平均 {projection.month_rate / 1024:.1f} KiB/s",
+        f"按本月平均速率，月底预计 {projection.projected_bytes / GIB:.2f} GiB，{verdict}免费额度",
+        f"数据来自 {age / 60:.0f} 分钟前的采样",
+    ]